@@ -0,0 +1,93 @@
+import os
+import re
+import pickle
+from typing import List, Optional
+from utils.utils import heavy_normalize_text
+
+# Key of the trie nodes holding the index of the CH word ending at this node
+_END = None
+
+
+class ChWordsIndex:
+    """Token trie over the heavy normalized CH words (swiss city names, postal
+    codes, and so on), used to find which CH word appears in a user.location
+    field.
+
+    A heavy normalized text is a sequence of alphanumeric tokens separated by
+    single spaces, so a CH word appears in the location field delimited by
+    non-alphanumeric characters iff its tokens appear consecutively in the
+    tokens of the field. All the CH words appearing in the field are found in
+    a single pass over its tokens, and the first one in the CH words list is
+    returned.
+
+    Parameters
+        ch_words | List[str]
+            The CH words, by order of priority
+    """
+
+    def __init__(self, ch_words: List[str]):
+        self.ch_words = ch_words
+        self.trie = dict()
+        for i, ch_word in enumerate(ch_words):
+            node = self.trie
+            for token in ChWordsIndex._tokens(heavy_normalize_text(ch_word)):
+                node = node.setdefault(token, dict())
+            # Keep the first occurrence of duplicated words
+            node.setdefault(_END, i)
+
+    @staticmethod
+    def _tokens(text_norm: str) -> List[str]:
+        return text_norm.split(" ") if text_norm else []
+
+    def find(self, location_field: str) -> Optional[str]:
+        """Returns the first CH word appearing in the location field, or None
+        """
+        tokens = ChWordsIndex._tokens(heavy_normalize_text(location_field))
+        # An empty CH word only matches an empty field, as the word-bounded
+        # regex did
+        best = self.trie.get(_END, None) if len(tokens) == 0 else None
+        for start in range(len(tokens)):
+            node = self.trie
+            for token in tokens[start:]:
+                node = node.get(token, None)
+                if node is None:
+                    break
+                index = node.get(_END, None)
+                if index is not None and (best is None or index < best):
+                    best = index
+        return None if best is None else self.ch_words[best]
+
+    @staticmethod
+    def read_ch_words(path: str) -> List[str]:
+        """Read the CH words file, keeping what is before the first tab of
+        each line"""
+        with open(path, "r", encoding="utf8") as f:
+            ch_words = f.readlines()
+        ch_words = [x for x in ch_words if x != "\n" and x != ""]
+        ch_words = [re.sub(r'\t[^\n]*\n', '', x) for x in ch_words]
+        return [x.replace("\n", "") for x in ch_words]
+
+    @staticmethod
+    def load(ch_words_path: str, index_path: str) -> "ChWordsIndex":
+        """Load the index persisted in 'index_path'. It is built from the CH
+        words file and persisted if missing, or if the CH words file changed
+        since it was built."""
+        stat = os.stat(ch_words_path)
+        source = (stat.st_size, stat.st_mtime_ns)
+        if os.path.exists(index_path):
+            try:
+                with open(index_path, "rb") as f:
+                    persisted = pickle.load(f)
+                if persisted["source"] == source:
+                    return persisted["index"]
+            except Exception:
+                print("Cannot load " + index_path + ", building it again")
+        index = ChWordsIndex(ChWordsIndex.read_ch_words(ch_words_path))
+        dir_path = os.path.dirname(index_path)
+        if dir_path:
+            os.makedirs(dir_path, exist_ok=True)
+        with open(index_path + ".tmp", "wb") as f:
+            pickle.dump({"source": source, "index": index}, f,
+                        pickle.HIGHEST_PROTOCOL)
+        os.replace(index_path + ".tmp", index_path)
+        return index
@@ -1,4 +1,6 @@
-# Map coordinates to swiss state
+# Map coordinates to swiss state. The coordinates are resolved offline from the
+# boundaries file (see 'regions_path' in config.yaml), only the ones close to a
+# border are sent to locationiq.
 
 import pandas as pd
 from geocoder import *
@@ -31,25 +33,41 @@ print(str(len(coords_to_state)) + " coordinates already processed")
 
 foreign_countries = set()
 
+def parse_coords(coord_str):
+    coord = coord_str.replace("(", "").replace(")", "").split(", ")
+    return (float(coord[0]), float(coord[1]))
+
+def set_state(coord_str, country, state):
+    if country != "ch":
+        foreign_countries.add(country)
+        state = None
+    coords_to_state[coord_str] = state
+
+# Resolve offline all the coordinates that are not close to a border
+remaining = [x for x in coords_str if not x in coords_to_state]
+results, uncertain = geocoder.reverse_geocode_states_offline(
+                                        [parse_coords(x) for x in remaining])
+for coord_str, (country, state), api_needed in zip(remaining, results,
+                                                   uncertain):
+    if not api_needed:
+        set_state(coord_str, country, state)
+remaining = [x for x, api_needed in zip(remaining, uncertain) if api_needed]
+save_obj(coords_to_state, coords_to_state_path)
+print(str(len(remaining)) + " coordinates need locationiq")
+
+# Send the others to locationiq
 count = 0
-for coord_str in list(coords_str):
-    if not coord_str in coords_to_state:
-        print("Reverse geocode " + str(coord_str))
-        coord = coord_str.replace("(", "").replace(")", "").split(", ")
-        lon = float(coord[0])
-        lat = float(coord[1])
-        country, state = geocoder.reverse_geocode_state(lon, lat)
-        if country != "ch":
-            foreign_countries.add(country)
-            state = None
-        print("  => " + str(state))
-        coords_to_state[coord_str] = state
-        time.sleep(1.1)
-        count+=1
-        if count > save_interval:
-            print("Saving current object state...")
-            save_obj(coords_to_state, coords_to_state_path)
-            count=0
+for coord_str in remaining:
+    print("Reverse geocode " + str(coord_str))
+    lon, lat = parse_coords(coord_str)
+    country, state = geocoder.reverse_geocode_state(lon, lat)
+    set_state(coord_str, country, state)
+    print("  => " + str(coords_to_state[coord_str]))
+    count+=1
+    if count > save_interval:
+        print("Saving current object state...")
+        save_obj(coords_to_state, coords_to_state_path)
+        count=0
 
 save_obj(coords_to_state, coords_to_state_path)
 print("All coordinates reverse geocoded successfully")
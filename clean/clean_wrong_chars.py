@@ -8,12 +8,13 @@ import pandas as pd
 from utils.utils import *
 import re
 from tqdm import tqdm
-from bert_lid import BertLid
+from lid.loader import load_lid
 import _thread
 import os
 
 ###  Settings  ################################################################
 dir_path = "twitter/final_dataset"
+config_path = "config.yaml"
 lid_threshold = 0.9
 ###############################################################################
 
@@ -43,7 +44,7 @@ for t in tqdm(tweets):
     cleaned.append(clean_chars(t[0]))
 
 print("Updating lid prediction...")
-lid = BertLid()
+lid = load_lid(load_yaml(config_path))
 preds = lid.predict_label(cleaned)
 
 print("Filter out low gsw prediction score...")
@@ -0,0 +1,91 @@
+from collections import Counter
+from typing import Any, Optional, Tuple
+
+
+def bounded_levenshtein(a: str, b: str, max_distance: int) -> int:
+    """Levenshtein distance between a and b, or max_distance + 1 as soon as
+    it is known to exceed max_distance"""
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            current[j] = min(previous[j] + 1,
+                             current[j-1] + 1,
+                             previous[j-1] + (a[i-1] != b[j-1]))
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous = current
+    return min(previous[-1], max_distance + 1)
+
+
+def trigrams(text: str):
+    padded = "$$" + text + "$"
+    return {padded[i:i+3] for i in range(len(padded) - 2)}
+
+
+class FuzzyMatcher:
+    """Typo tolerant lookup of normalized location strings (e.g. "zureich"
+    matches "zurich").
+
+    The keys are indexed by their character trigrams. The keys sharing the
+    most trigrams with a query are the candidates, and the closest one by edit
+    distance is returned if its similarity (1 - distance / length of the
+    longest string) is at least 'threshold'.
+
+    Parameters
+        threshold | float
+            The minimum similarity of a match
+        min_length | int
+            Queries shorter than this are not matched, because a single typo
+            makes a short word into another place name
+        max_candidates | int
+            The count of keys compared by edit distance for each query
+    """
+
+    def __init__(self, threshold=0.8, min_length=5, max_candidates=20):
+        self.threshold = threshold
+        self.min_length = min_length
+        self.max_candidates = max_candidates
+        self.keys = []
+        self.values = []
+        self.key_ids = dict()
+        self.index = dict()
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, key: str, value: Any):
+        """Add a key with its value. A key already present keeps its value."""
+        if len(key) < self.min_length or key in self.key_ids:
+            return
+        key_id = len(self.keys)
+        self.keys.append(key)
+        self.values.append(value)
+        self.key_ids[key] = key_id
+        for trigram in trigrams(key):
+            self.index.setdefault(trigram, []).append(key_id)
+
+    def match(self, query: str) -> Optional[Tuple[str, Any, float]]:
+        """Returns the key closest to the query along with its value and the
+        similarity, or None if no key is similar enough"""
+        if len(query) < self.min_length:
+            return None
+        if query in self.key_ids:
+            key_id = self.key_ids[query]
+            return (query, self.values[key_id], 1.0)
+        counts = Counter()
+        for trigram in trigrams(query):
+            counts.update(self.index.get(trigram, []))
+        best = None
+        for key_id, _ in counts.most_common(self.max_candidates):
+            key = self.keys[key_id]
+            length = max(len(key), len(query))
+            max_distance = int(length * (1 - self.threshold))
+            distance = bounded_levenshtein(query, key, max_distance)
+            if distance <= max_distance:
+                similarity = 1 - distance / length
+                if best is None or similarity > best[2]:
+                    best = (key, self.values[key_id], similarity)
+        return best
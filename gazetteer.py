@@ -0,0 +1,49 @@
+import csv
+from typing import Optional
+from utils.utils import heavy_normalize_text
+
+# Tokens referring to Switzerland, ignored when matching a location field
+# (e.g. "Zürich, Schweiz" matches "Zürich")
+COUNTRY_TOKENS = {"ch", "switzerland", "schweiz", "suisse", "svizzera",
+                  "svizra", "swiss", "schwiiz", "helvetia"}
+
+
+class Gazetteer:
+    """Local forward geocoder for swiss places (localities, municipalities,
+    postcodes and cantons), answering the location fields that exactly match
+    an entry once normalized.
+
+    The gazetteer is a tab-separated file with the columns name, lon, lat and
+    state (with the locationiq spelling), built by scripts/build_gazetteer.py.
+
+    Parameters
+        path | str
+            The path of the gazetteer file
+    """
+
+    def __init__(self, path):
+        self.entries = dict()
+        with open(path, "r", encoding="utf8", newline="") as f:
+            for row in csv.DictReader(f, delimiter="\t"):
+                key = Gazetteer.normalize(row["name"])
+                # Keep the first entry of names that normalize the same way
+                if key and key not in self.entries:
+                    self.entries[key] = {"lon": row["lon"],
+                                         "lat": row["lat"],
+                                         "state": row["state"],
+                                         "country": "ch"}
+
+    def __len__(self):
+        return len(self.entries)
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Heavy normalize a text and remove the tokens referring to
+        Switzerland"""
+        tokens = heavy_normalize_text(text).split(" ")
+        return " ".join(x for x in tokens if x and x not in COUNTRY_TOKENS)
+
+    def lookup(self, text: str) -> Optional[dict]:
+        """Returns the location (lon, lat, state and country) of a location
+        field, or None if it matches no entry"""
+        return self.entries.get(Gazetteer.normalize(text), None)
@@ -0,0 +1,214 @@
+import os
+import ast
+import time
+import sqlite3
+from typing import Iterator, List, Optional, Tuple
+
+def slim_location(loc: dict) -> dict:
+    """Reduce a locationiq result (as a dict) to the fields kept in the cache :
+    lon and lat (as strings, like locationiq returns them), the state and the
+    country code. An empty dict stays empty (location not found)."""
+    if not isinstance(loc, dict) or "lat" not in loc or "lon" not in loc:
+        return dict()
+    if "address" in loc:
+        address = loc["address"] or dict()
+        state = address.get("state", None)
+        country = address.get("country_code", None)
+    else:
+        state = loc.get("state", None)
+        country = loc.get("country", None)
+    return {"lon": loc["lon"], "lat": loc["lat"], "state": state,
+            "country": country}
+
+
+class GeocodeCache:
+    """Cache of the forward geocoding results, stored in a sqlite database.
+    Lookups only read the requested row, so opening the cache costs the same
+    whatever its size. It replaces the text file given by loc_to_coords_path.
+
+    The values are tuples (location, source) as returned by
+    Geocoder.forward_geocode, where location is a dict with the keys lon, lat,
+    state and country (country code), or an empty dict if the location was not
+    found.
+
+    The entries inferred by fuzzy matching (see fuzzy_matcher.py) record the
+    query or the gazetteer entry they were copied from in 'inferred_from'.
+
+    The database also holds the queue of the queries waiting to be geocoded by
+    the geocoding worker (see geocode_worker.py). A query leaves the queue
+    when its result is added to the cache.
+
+    Parameters
+        path | str
+            The path of the database
+        legacy_path | str
+            A text file in the previous format (the query and the result on
+            two lines), imported when the database is created
+        commit_interval | int
+            The count of new entries from which they are committed. 'flush'
+            commits the remaining ones.
+    """
+
+    def __init__(self, path, legacy_path=None, commit_interval=100):
+        self.path = path
+        self.commit_interval = commit_interval
+        self.uncommitted = 0
+        new_db = not os.path.exists(path)
+        dir_path = os.path.dirname(path)
+        if dir_path:
+            os.makedirs(dir_path, exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        # WAL such that other processes can read while we write
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS locations ("
+                                "query TEXT PRIMARY KEY, "
+                                "lon TEXT, "
+                                "lat TEXT, "
+                                "state TEXT, "
+                                "country TEXT, "
+                                "source TEXT NOT NULL, "
+                                "inferred_from TEXT)")
+        columns = [x[1] for x in self.connection.execute(
+                                        "PRAGMA table_info(locations)")]
+        if "inferred_from" not in columns:
+            # Database created before fuzzy matching
+            self.connection.execute("ALTER TABLE locations "
+                                    "ADD COLUMN inferred_from TEXT")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS pending ("
+                                "query TEXT PRIMARY KEY, "
+                                "added REAL NOT NULL)")
+        self.connection.commit()
+        if new_db and legacy_path is not None and os.path.exists(legacy_path):
+            self.import_text_file(legacy_path)
+
+    @staticmethod
+    def _to_tuple(row) -> Tuple[dict, str]:
+        lon, lat, state, country, source = row
+        loc = dict()
+        if lon is not None and lat is not None:
+            loc = {"lon": lon, "lat": lat, "state": state, "country": country}
+        return (loc, source)
+
+    def get(self, query: str) -> Optional[Tuple[dict, str]]:
+        """Returns the cached result of the query, or None if not cached"""
+        row = self.connection.execute("SELECT lon, lat, state, country, "
+                                      "source FROM locations WHERE query = ?",
+                                      (query,)).fetchone()
+        if row is None:
+            return None
+        return GeocodeCache._to_tuple(row)
+
+    def __contains__(self, query):
+        return self.get(query) is not None
+
+    def __getitem__(self, query):
+        loc_tuple = self.get(query)
+        if loc_tuple is None:
+            raise KeyError(query)
+        return loc_tuple
+
+    def __setitem__(self, query, loc_tuple):
+        self.put(query, loc_tuple)
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM locations"
+                                       ).fetchone()[0]
+
+    def _row(self, query, loc_tuple, inferred_from=None):
+        loc = slim_location(loc_tuple[0])
+        return (query, loc.get("lon", None), loc.get("lat", None),
+                loc.get("state", None), loc.get("country", None), loc_tuple[1],
+                inferred_from)
+
+    def put(self, query: str, loc_tuple: Tuple[dict, str],
+            inferred_from: Optional[str] = None):
+        """Add or replace the result of a query. 'inferred_from' is the entry
+        the result was copied from, if it was inferred by fuzzy matching."""
+        self.put_many([(query, loc_tuple, inferred_from)])
+
+    def put_many(self, items):
+        """Add or replace several (query, result) or
+        (query, result, inferred_from) at once"""
+        rows = [self._row(*item) for item in items]
+        self.connection.executemany("INSERT OR REPLACE INTO locations "
+                                    "(query, lon, lat, state, country, "
+                                    "source, inferred_from) "
+                                    "VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        self.connection.executemany("DELETE FROM pending WHERE query = ?",
+                                    [(row[0],) for row in rows])
+        self.uncommitted += len(rows)
+        if self.uncommitted >= self.commit_interval:
+            self.flush()
+
+    def inferred_from(self, query: str) -> Optional[str]:
+        """Returns the entry the result of a query was inferred from, or None
+        if it was not inferred"""
+        row = self.connection.execute("SELECT inferred_from FROM locations "
+                                      "WHERE query = ?", (query,)).fetchone()
+        return row[0] if row is not None else None
+
+    def resolved_queries(self) -> Iterator[str]:
+        """Iterate over the queries whose location was found, except the
+        inferred ones, the most recently added first"""
+        cursor = self.connection.execute("SELECT query FROM locations "
+                                         "WHERE lon IS NOT NULL "
+                                         "AND inferred_from IS NULL "
+                                         "ORDER BY rowid DESC")
+        for row in cursor:
+            yield row[0]
+
+    def enqueue(self, query: str):
+        """Add a query to the queue of the geocoding worker"""
+        self.connection.execute("INSERT OR IGNORE INTO pending VALUES (?, ?)",
+                                (query, time.time()))
+        self.uncommitted += 1
+        if self.uncommitted >= self.commit_interval:
+            self.flush()
+
+    def pending_queries(self, limit: int) -> List[str]:
+        """Returns the oldest queries of the queue"""
+        rows = self.connection.execute("SELECT query FROM pending "
+                                       "ORDER BY added LIMIT ?",
+                                       (limit,)).fetchall()
+        return [row[0] for row in rows]
+
+    def pending_count(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM pending"
+                                       ).fetchone()[0]
+
+    def flush(self):
+        """Commit the new entries"""
+        self.connection.commit()
+        self.uncommitted = 0
+
+    def compact(self):
+        """Rebuild the database file to reclaim the unused space"""
+        self.flush()
+        self.connection.execute("VACUUM")
+
+    def close(self):
+        self.flush()
+        self.connection.close()
+
+    def import_text_file(self, path, batch_size=10000):
+        """Import a text file in the previous format, where each query is
+        followed by its result on the next line"""
+        print("Importing geocoding cache from " + path + "...")
+        batch = []
+        count = 0
+        with open(path, "r", encoding="utf8") as f:
+            while True:
+                key = f.readline()
+                elem = f.readline()
+                if not key or not elem:
+                    break
+                batch.append((key[:-1] if key.endswith("\n") else key,
+                              ast.literal_eval(elem.strip())))
+                if len(batch) >= batch_size:
+                    self.put_many(batch)
+                    count += len(batch)
+                    batch = []
+        self.put_many(batch)
+        count += len(batch)
+        self.compact()
+        print(str(count) + " entries imported")
@@ -0,0 +1,233 @@
+# Deferred geocoding. With 'deferred_geocoding', the filter does not wait for
+# locationiq : the user.location fields that are not cached are queued in the
+# geocoding cache and the sentences are written with the source "Pending".
+# The worker resolves the queued queries at the pace allowed by locationiq,
+# and fills in the coordinates of the pending sentences, both in the outputs
+# of the filter (out_process) and in the dirty dataset. With the "qualified"
+# geocode_policy, the locations of the users that do not qualify yet are left
+# pending, and are only queued once the user qualifies.
+
+import os
+import time
+import logging
+import traceback
+import pandas as pd
+from typing import List, Tuple, Union, Any
+from utils.typecheck import *
+from geocoder import Geocoder
+from utils.utils import *
+
+
+class GeocodeWorker:
+    """Resolve the queued geocoding queries and backfill the pending
+    locations.
+
+    Parameters
+        config | Union[str, dict]
+            The config or the path of the config file
+        geocoder | Geocoder
+            The geocoder used to query locationiq. A new one is created if None.
+    """
+
+    @accepts(Any, Union[str, dict], Any)
+    @returns(None)
+    def __init__(self, config, geocoder=None):
+        self.config = load_yaml(config) if isinstance(config, str) else config
+        configure_typecheck(self.config)
+        self.geocoder = geocoder if geocoder is not None \
+                        else Geocoder(self.config)
+        self.cache = self.geocoder.loc_to_coords
+        # With the "qualified" geocode_policy, the users whose pending
+        # locations can be geocoded. Read again at each backfill.
+        self.qualified_users = None
+        # The files backfilled by the last pass, see _outputs_signature
+        self.backfilled_signature = None
+
+    @accepts(Any, int)
+    @returns(int)
+    def resolve_pending(self, max_count):
+        """Geocode at most 'max_count' queued queries. Returns the count of
+        queries resolved."""
+        count = 0
+        for query in self.cache.pending_queries(max_count):
+            try:
+                self.geocoder.resolve_query(query)
+                count += 1
+            except Exception:
+                # Try again at the next pass
+                logging.error("Cannot geocode '" + query + "'\n" +
+                              traceback.format_exc())
+                break
+        self.geocoder.clean()
+        return count
+
+    def _resolve_location(self, tweet):
+        """Returns (coords, geo_source) of a pending tweet, or None if its
+        location is still pending"""
+        location = ""
+        if "user" in tweet and tweet["user"].get("location", None):
+            location = tweet["user"]["location"]
+        query = Geocoder.normalize_query(location)
+        if len(query) < 2:
+            return ((0.0, 0.0), "")
+        cached = self.cache.get(query)
+        if cached is None and self.qualified_users is not None \
+        and str(tweet["user"].get("id_str", None)) not in self.qualified_users:
+            # Not queued until the user qualifies
+            return None
+        if cached is None:
+            # Make sure the query is queued, e.g. if the cache was reset
+            self.cache.enqueue(query)
+            return None
+        loc, source = cached
+        if len(loc.keys()) == 0:
+            return ((0.0, 0.0), "")
+        return ((float(loc["lon"]), float(loc["lat"])), source)
+
+    def _backfill_tweets(self, gsw_tweets) -> Tuple[List, List[int], int]:
+        """Fill in the location of the pending sentences of a list of
+        GSW_tweets. Returns the new list, the indices (in the given list) of
+        the sentences kept, and the count of locations filled in."""
+        keep_foreign = self.config["keep_foreign_location"]
+        new_tweets = []
+        filled_indices = []
+        for i, gsw_tweet in enumerate(gsw_tweets):
+            if gsw_tweet[3] == Geocoder.pending_source:
+                resolved = self._resolve_location(gsw_tweet[5])
+                if resolved is not None:
+                    filled_indices.append(i)
+                    coords, geo_source = resolved
+                    gsw_tweet = (gsw_tweet[0], coords, gsw_tweet[2],
+                                 geo_source, gsw_tweet[4], gsw_tweet[5])
+            new_tweets.append(gsw_tweet)
+        kept_indices = list(range(len(new_tweets)))
+        if not keep_foreign and len(filled_indices) > 0:
+            # The filled in locations are tested all at once
+            in_switzerland = self.geocoder.are_coords_in_switzerland_batch(
+                                    [new_tweets[i][1] for i in filled_indices])
+            dropped = {i for i, inside in zip(filled_indices, in_switzerland)
+                       if not inside}
+            kept_indices = [i for i in kept_indices if i not in dropped]
+            new_tweets = [new_tweets[i] for i in kept_indices]
+        return new_tweets, kept_indices, len(filled_indices)
+
+    @accepts(Any, str)
+    @returns(int)
+    def backfill_file(self, path):
+        """Backfill a pickle written by the filter. Returns the count of
+        locations filled in."""
+        gsw_tweets = load_obj(path)
+        new_tweets, _, filled_count = self._backfill_tweets(gsw_tweets)
+        if filled_count > 0:
+            save_obj(new_tweets, path + ".tmp")
+            os.replace(path + ".tmp", path)
+        return filled_count
+
+    @accepts(Any)
+    @returns(int)
+    def backfill_dataset(self):
+        """Backfill the dirty dataset, i.e. both the pickle of the tweets and
+        the csv of the sentences, which are aligned row by row. Returns the
+        count of locations filled in."""
+        tweets_path = self.config["path_dirty_gsw_tweets"]
+        sentences_path = self.config["path_dirty_gsw_sentences"]
+        if not os.path.exists(tweets_path) \
+        or not os.path.exists(sentences_path):
+            return 0
+        gsw_tweets = load_obj(tweets_path)
+        new_tweets, kept_indices, filled_count = \
+                                            self._backfill_tweets(gsw_tweets)
+        if filled_count == 0:
+            return 0
+        df = pd.read_csv(sentences_path)
+        assert(len(df) == len(gsw_tweets))
+        df = df.iloc[kept_indices].reset_index(drop=True)
+        df["coords"] = [str(x[1]) for x in new_tweets]
+        df["geo_source"] = [x[3] for x in new_tweets]
+        df.to_csv(sentences_path + ".tmp", index=False)
+        save_obj(new_tweets, tweets_path + ".tmp")
+        os.replace(sentences_path + ".tmp", sentences_path)
+        os.replace(tweets_path + ".tmp", tweets_path)
+        return filled_count
+
+    def _load_qualified_users(self):
+        """Returns the users whose pending locations can be geocoded, or None
+        if all of them can (see geocode_policy)"""
+        if self.config["geocode_policy"] != "qualified":
+            return None
+        min_count = self.config["geocode_qualification_count"]
+        counts = load_users_counts(self.config["sg_users_count_path"])
+        return {user_id for user_id, count in counts.items()
+                if count >= min_count}
+
+    def _outputs_signature(self):
+        """Returns the path, modification time and size of the files that can
+        hold pending locations, i.e. the outputs of the filter and the dirty
+        dataset. It changes whenever one of them is written."""
+        dir_path = self.config["out_dir_tweet_processing"]
+        paths = [self.config["path_dirty_gsw_tweets"]]
+        if os.path.exists(dir_path):
+            paths += [os.path.join(dir_path, x)
+                      for x in sorted(os.listdir(dir_path)) if x[-4:] == ".pkl"]
+        signature = []
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            signature.append((path, stat.st_mtime_ns, stat.st_size))
+        return signature
+
+    @accepts(Any, int)
+    @returns(int)
+    def backfill_if_needed(self, resolved):
+        """Backfill the pending locations, unless nothing can have changed
+        since the last pass : no query was resolved ('resolved' is 0), the
+        qualified users are the same and no output was written. This avoids
+        loading the whole dirty dataset, under the lock concat_out_process
+        needs, at each pass of an idle worker. Returns the count of locations
+        filled in."""
+        if resolved == 0 \
+        and self._load_qualified_users() == self.qualified_users \
+        and self._outputs_signature() == self.backfilled_signature:
+            return 0
+        filled_count = self.backfill()
+        self.backfilled_signature = self._outputs_signature()
+        return filled_count
+
+    @accepts(Any)
+    @returns(int)
+    def backfill(self):
+        """Backfill the outputs of the filter and the dirty dataset. Returns
+        the count of locations filled in."""
+        dir_path = self.config["out_dir_tweet_processing"]
+        filled_count = 0
+        self.qualified_users = self._load_qualified_users()
+        # concat_out_process moves the outputs of the filter into the dirty
+        # dataset, hold the same lock to not lose its changes or ours
+        with file_lock(self.config["path_dirty_gsw_tweets"] + ".lock"):
+            if os.path.exists(dir_path):
+                names = [x for x in sorted(os.listdir(dir_path))
+                         if x[-4:] == ".pkl"]
+                for name in names:
+                    filled_count += self.backfill_file(os.path.join(dir_path,
+                                                                    name))
+            filled_count += self.backfill_dataset()
+        self.cache.flush()
+        return filled_count
+
+    @accepts(Any)
+    @returns(None)
+    def run(self):
+        """Resolve the queued queries and backfill the pending locations
+        forever"""
+        while True:
+            resolved = self.resolve_pending(
+                                    self.config["geocode_worker_batch_size"])
+            filled = self.backfill_if_needed(resolved)
+            msg = f"{resolved} queries geocoded, {filled} locations filled " + \
+                  f"in, {self.cache.pending_count()} queries pending"
+            print(msg)
+            logging.info(msg)
+            if resolved == 0:
+                time.sleep(self.config["geocode_worker_interval"])
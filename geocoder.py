@@ -6,10 +6,16 @@ import re
 from shapely.geometry import Point
 from shapely.geometry.polygon import Polygon
 from typing import Tuple, Union, List
-from typechecker.typecheck import *
+from utils.typecheck import *
 from phrasal.norm_punc import normalize_text
 import logging
 from preprocessing.cleaner import *
+from geocode_cache import GeocodeCache, slim_location
+from ch_words_index import ChWordsIndex
+from utils.rate_limiter import TokenBucket
+from spatial import ReverseGeocoder, points_in_polygon, prepare
+from gazetteer import Gazetteer
+from fuzzy_matcher import FuzzyMatcher
 
 
 class Geocoder:
@@ -50,10 +56,10 @@ class Geocoder:
     state_to_code["Neuchâtel"] = "NE"
     state_to_code["Geneva"] = "GE"
 
-    location_good_chars = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
-    location_good_chars += "ÀÁÂÄÈÉÊËÍÌÎÏÓÒÔÖÚÙÛÜàáâäèéêëìíîïôöòóüùúûÿ"
-    location_good_chars += " -.0123456789&()/'"
-    location_good_chars = set(location_good_chars)
+    location_good_chars = LOCATION_CHARS
+
+    # Source of the locations waiting to be geocoded by the geocoding worker
+    pending_source = "Pending"
 
     @accepts(Any, Union[str, dict])
     @returns(None)
@@ -63,34 +69,46 @@ class Geocoder:
         self.config = load_yaml(config) if isinstance(config, str) else config
         credentials = load_yaml(self.config["credentials_path"])
 
-        # Load the dict mapping address to a geolocalization object
-        loc_to_coords_path = self.config["loc_to_coords_path"]
-        if not os.path.exists(loc_to_coords_path):
-            with open(loc_to_coords_path, "w", encoding="utf8"):
-                pass
-        self.loc_to_coords = load_dict_from_txt(loc_to_coords_path)
-        # This will contain the file to append new mapping
-        # This is stored as a text file, such that we can append easily each new
-        # element without worrying about the python dict object not being
-        # saved because of some Exception.
-        self.loc_to_coords_file = None
-
-        # Load the CH words (i.e. swiss city names, postal codes, and so on)
-        self.ch_words = None
-        with open(self.config["ch_words_path"], "r", encoding="utf8") as f:
-            self.ch_words = f.readlines()
-            self.ch_words = [x for x in self.ch_words if x != "\n" and x != ""]
-            # Take everything before the first tab
-            self.ch_words = [re.sub(r'\t[^\n]*\n', '', x) for x in self.ch_words]
-            self.ch_words = [x.replace("\n", "") for x in self.ch_words]
-
-        # Heavy normalize ch_words. We keep both list because we will need to
-        # check if a normalized ch word is contained in the normalized location
-        # field (user.location) of the twitter account. Then, we need the
-        # original ch word to query the location with the api.
-        self.ch_words_norm = [heavy_normalize_text(x) for x in self.ch_words]
+        # The cache mapping a query to a geolocalization object. The text file
+        # given by loc_to_coords_path (previous format) is imported when the
+        # database is created.
+        self.loc_to_coords = GeocodeCache(
+                    self.config["loc_to_coords_db_path"],
+                    legacy_path=self.config["loc_to_coords_path"],
+                    commit_interval=self.config["geocode_cache_commit_interval"])
+        # Results by raw query (before normalization), and by user id along
+        # with the user.location they were computed for. Both are kept in
+        # memory as long as the geocoder lives.
+        self.query_memo = LRUCache(self.config["geocoder_query_memo_size"])
+        self.user_locations = LRUCache(self.config["geocoder_user_cache_size"])
+
+        # Index of the CH words (i.e. swiss city names, postal codes, and so
+        # on). It is persisted and only built again when the CH words change.
+        self.ch_words_index = ChWordsIndex.load(self.config["ch_words_path"],
+                                            self.config["ch_words_index_path"])
+        self.ch_words = self.ch_words_index.ch_words
 
         self.ch_polygon = Polygon([tuple(x) for x in self.config["ch_polygon"]])
+        if prepare is not None:
+            # Speeds up the repeated point-in-polygon tests (shapely >= 2.0)
+            prepare(self.ch_polygon)
+
+        # Local forward geocoder for the swiss places. The gazetteer is built
+        # with scripts/build_gazetteer.py, without it only locationiq is used.
+        self.gazetteer = None
+        if os.path.exists(self.config["gazetteer_path"]):
+            self.gazetteer = Gazetteer(self.config["gazetteer_path"])
+
+        # Typo tolerant matching of the queries against the resolved entries of
+        # the cache and the gazetteer. Built at the first use, see fuzzy_match.
+        self.fuzzy_matcher = None
+        # Count of the cache entries indexed by the fuzzy matcher
+        self.fuzzy_cache_entries = 0
+
+        # Offline reverse geocoder. The boundaries file is built with
+        # scripts/build_regions.py, without it only locationiq is used. Loaded
+        # at the first use, see _get_reverse_geocoder.
+        self.reverse_geocoder = None
 
 
         # Configure the locationiq API
@@ -100,39 +118,38 @@ class Geocoder:
         # Defining host is optional and default to https://eu1.locationiq.com/v1
         loc_config.host = self.config["locationiq"]["host"]
 
-        # Enter a context with an instance of the API client
-        with locationiq.ApiClient(loc_config) as api_client:
-            self.api_instance = locationiq.SearchApi(api_client)
-            self.api_instance_rev = locationiq.ReverseApi(api_client)
-
-            self.gformat = self.config["locationiq"]["gformat"]
-            self.normalizecity = self.config["locationiq"]["normalizecity"]
-            self.addressdetails = self.config["locationiq"]["addressdetails"]
-            self.viewbox = self.config["locationiq"]["viewbox"]
-            self.bounded = self.config["locationiq"]["bounded"]
-            self.limit = self.config["locationiq"]["limit"]
-            self.accept_language = self.config["locationiq"]["accept_language"]
-            self.countrycodes = self.config["locationiq"]["countrycodes"]
-            self.namedetails = self.config["locationiq"]["namedetails"]
-            self.dedupe = self.config["locationiq"]["dedupe"]
-            self.extratags = self.config["locationiq"]["extratags"]
-            self.statecode = self.config["locationiq"]["statecode"]
-            self.matchquality = self.config["locationiq"]["matchquality"]
-            self.postaladdress = self.config["locationiq"]["postaladdress"]
-
+        # The client is kept open for the lifetime of the geocoder, such that
+        # its connections are reused from one request to the next
+        self.api_client = locationiq.ApiClient(loc_config)
+        self.api_instance = locationiq.SearchApi(self.api_client)
+        self.api_instance_rev = locationiq.ReverseApi(self.api_client)
+        # Shared by all the processes calling locationiq
+        self.rate_limiter = TokenBucket(
+                            self.config["locationiq_rate_limit_path"],
+                            self.config["locationiq_requests_per_minute"],
+                            burst=self.config["locationiq_burst"])
+
+        self.gformat = self.config["locationiq"]["gformat"]
+        self.normalizecity = self.config["locationiq"]["normalizecity"]
+        self.addressdetails = self.config["locationiq"]["addressdetails"]
+        self.viewbox = self.config["locationiq"]["viewbox"]
+        self.bounded = self.config["locationiq"]["bounded"]
+        self.limit = self.config["locationiq"]["limit"]
+        self.accept_language = self.config["locationiq"]["accept_language"]
+        self.countrycodes = self.config["locationiq"]["countrycodes"]
+        self.namedetails = self.config["locationiq"]["namedetails"]
+        self.dedupe = self.config["locationiq"]["dedupe"]
+        self.extratags = self.config["locationiq"]["extratags"]
+        self.statecode = self.config["locationiq"]["statecode"]
+        self.matchquality = self.config["locationiq"]["matchquality"]
+        self.postaladdress = self.config["locationiq"]["postaladdress"]
 
-    @accepts(Any)
-    @returns(None)
-    def open_mapping_file(self):
-        if self.loc_to_coords_file == None:
-            f = open(self.config["loc_to_coords_path"], 'a+', encoding="utf8")
-            self.loc_to_coords_file = f
 
     @accepts(Any)
     @returns(None)
     def clean(self):
-        self.loc_to_coords_file.close()
-        self.loc_to_coords_file = None
+        """Commit the new entries of the geocoding cache"""
+        self.loc_to_coords.flush()
 
     @accepts(Any, List[Union[int, float]], List[List[Union[int, float]]])
     @returns(bool)
@@ -161,47 +178,138 @@ class Geocoder:
         coords = Point(coords)
         return self.ch_polygon.contains(coords)
 
+    @accepts(Any, List[Tuple])
+    @returns(List[bool])
+    def are_coords_in_switzerland_batch(self, coords):
+        """Same as are_coords_in_switzerland for a list of coords
+        [long, lat], tested in a single vectorized call"""
+        if len(coords) == 0:
+            return []
+        inside = points_in_polygon(self.ch_polygon, [x[0] for x in coords],
+                                   [x[1] for x in coords])
+        return [bool(x) for x in inside]
+
     @accepts(Any, str)
     @returns(Any)
     def get_ch_location(self, location_field):
         """From the user.location field, check if the location is known to be
         in Switzerland. This is done by checking for each CH word or word
         combination (city name, states...) if the word appear in the
-        user.location field.
+        user.location field. If several words appear, the first one of the CH
+        words file is returned. See ChWordsIndex.
         """
+        return self.ch_words_index.find(location_field)
+
+    def _get_fuzzy_matcher(self):
+        """Returns the fuzzy matcher, indexing the gazetteer and the resolved
+        entries of the cache the first time. The index is held in memory, so
+        only the fuzzy_match_max_cache_entries most recent entries of the
+        cache are indexed."""
+        if self.fuzzy_matcher is None:
+            self.fuzzy_matcher = FuzzyMatcher(
+                            self.config["fuzzy_match_threshold"],
+                            min_length=self.config["fuzzy_match_min_length"])
+            if self.gazetteer is not None:
+                for key in self.gazetteer.entries:
+                    self.fuzzy_matcher.add(key, ("gazetteer", key))
+            self.fuzzy_cache_entries = 0
+            limit = self.config["fuzzy_match_max_cache_entries"]
+            for query in self.loc_to_coords.resolved_queries():
+                if limit is not None and self.fuzzy_cache_entries >= limit:
+                    break
+                self._add_fuzzy_entry(query)
+        return self.fuzzy_matcher
+
+    def _add_fuzzy_entry(self, query):
+        """Index a resolved entry of the cache for the fuzzy matching, unless
+        fuzzy_match_max_cache_entries entries are already indexed"""
+        limit = self.config["fuzzy_match_max_cache_entries"]
+        if limit is not None and self.fuzzy_cache_entries >= limit:
+            return
+        count = len(self.fuzzy_matcher)
+        self.fuzzy_matcher.add(Gazetteer.normalize(query), ("cache", query))
+        self.fuzzy_cache_entries += len(self.fuzzy_matcher) - count
+
+    def _get_reverse_geocoder(self):
+        """Returns the offline reverse geocoder, loading the boundaries file
+        the first time, or None if the file does not exist. The filter never
+        reverse geocodes, so it does not pay for the loading."""
+        if self.reverse_geocoder is None \
+        and os.path.exists(self.config["regions_path"]):
+            self.reverse_geocoder = ReverseGeocoder(
+                                    self.config["regions_path"],
+                                    self.config["regions_border_margin"])
+        return self.reverse_geocoder
 
-        location_field_norm = heavy_normalize_text(location_field)
-
-        # Check the city names and states
-        for i in range(len(self.ch_words_norm)):
-            ch_word_norm = self.ch_words_norm[i]
-            if ch_word_norm in location_field_norm:
-                # No alphanumeric character before or after the word
-                # the preceding is to filter before using the regex, which is
-                # much more time consuming than "ch_word in location_field_norm"
-                if re.search(r"(^|\W)" + ch_word_norm
-                             + r"(\W|$)", location_field_norm):
-                    return self.ch_words[i]
-        return None
+    @accepts(Any, str)
+    @returns(Any)
+    def fuzzy_match(self, query):
+        """Match a normalized query against the resolved entries of the cache
+        and the gazetteer, tolerating typos (e.g. "zureich" matches "zurich").
+        Returns the location of the closest entry along with the entry
+        (prefixed by "gazetteer:" for a gazetteer entry), or None if no entry
+        is similar enough."""
+        match = self._get_fuzzy_matcher().match(Gazetteer.normalize(query))
+        if match is None:
+            return None
+        kind, key = match[1]
+        if kind == "gazetteer":
+            return (self.gazetteer.entries[key], "gazetteer:" + key)
+        loc, _ = self.loc_to_coords[key]
+        return (loc, key)
+
+    def _cache_result(self, query, loc_tuple):
+        """Store the result of a query in the cache, and make it available to
+        the fuzzy matching if the location was found"""
+        self.loc_to_coords[query] = loc_tuple
+        if self.fuzzy_matcher is not None and len(loc_tuple[0]) > 0:
+            self._add_fuzzy_entry(query)
+
+    def call_locationiq(self, function, *args, **kwargs):
+        """Call a function of the locationiq api once the rate limiter allows
+        it. If locationiq answers 429 (too many requests), all the processes
+        wait for the time given by the Retry-After header, and the call is
+        retried."""
+        retries = self.config["locationiq_max_retries"]
+        for attempt in range(retries + 1):
+            self.rate_limiter.acquire()
+            try:
+                return function(*args, **kwargs)
+            except ApiException as e:
+                if e.status != 429 or attempt == retries:
+                    raise
+                retry_after = 60
+                headers = getattr(e, "headers", None)
+                if headers is not None \
+                and headers.get("Retry-After", None) is not None:
+                    try:
+                        retry_after = float(headers["Retry-After"])
+                    except ValueError:
+                        pass
+                msg = f"locationiq rate limit reached, retry in {retry_after} s"
+                print(msg)
+                logging.warning(msg)
+                self.rate_limiter.block(retry_after)
 
     def locationiq_search(self, query):
         """Simply call the search function of the locationIQ api
         """
-        loc = self.api_instance.search(query,
-                                       self.gformat,
-                                       self.normalizecity,
-                                       addressdetails=self.addressdetails,
-                                       viewbox=self.viewbox,
-                                       bounded=self.bounded,
-                                       limit=self.limit,
-                                       accept_language=self.accept_language,
-                                       countrycodes=self.countrycodes,
-                                       namedetails=self.namedetails,
-                                       dedupe=self.dedupe,
-                                       extratags=self.extratags,
-                                       statecode=self.statecode,
-                                       matchquality=self.matchquality,
-                                       postaladdress=self.postaladdress)
+        loc = self.call_locationiq(self.api_instance.search,
+                                   query,
+                                   self.gformat,
+                                   self.normalizecity,
+                                   addressdetails=self.addressdetails,
+                                   viewbox=self.viewbox,
+                                   bounded=self.bounded,
+                                   limit=self.limit,
+                                   accept_language=self.accept_language,
+                                   countrycodes=self.countrycodes,
+                                   namedetails=self.namedetails,
+                                   dedupe=self.dedupe,
+                                   extratags=self.extratags,
+                                   statecode=self.statecode,
+                                   matchquality=self.matchquality,
+                                   postaladdress=self.postaladdress)
         return loc
 
     @accepts(Any, float, float)
@@ -211,7 +319,8 @@ class Geocoder:
         """
 
         try:
-            api_response = self.api_instance_rev.reverse(lat, lon, "json", 1)
+            api_response = self.call_locationiq(self.api_instance_rev.reverse,
+                                                lat, lon, "json", 1)
             return (api_response.address.country_code,
                     api_response.address.state)
         except locationiq.exceptions.ApiException as e:
@@ -223,13 +332,45 @@ class Geocoder:
             raise
 
 
+    @accepts(Any, List[Tuple])
+    @returns(Tuple[List[Tuple], List[bool]])
+    def reverse_geocode_states_offline(self, coords):
+        """Reverse geocode a list of coordinates (lon, lat) with the offline
+        reverse geocoder. Returns the (country code, state) of each point, and
+        for each point whether it must be sent to locationiq instead (close to
+        a border, or outside the known regions). All the points must be sent
+        to locationiq if the boundaries file is not available."""
+        reverse_geocoder = self._get_reverse_geocoder()
+        if reverse_geocoder is None or len(coords) == 0:
+            return [(None, None)] * len(coords), [True] * len(coords)
+        results, uncertain = reverse_geocoder.lookup(
+                                                    [x[0] for x in coords],
+                                                    [x[1] for x in coords])
+        return results, [bool(x) for x in uncertain]
+
+    @accepts(Any, List[Tuple])
+    @returns(List[Tuple])
+    def reverse_geocode_states(self, coords):
+        """Reverse geocode a list of coordinates (lon, lat) into
+        (country code, state). The points are resolved offline, and only the
+        uncertain ones are sent to locationiq."""
+        results, uncertain = self.reverse_geocode_states_offline(coords)
+        for i in range(len(coords)):
+            if uncertain[i]:
+                results[i] = self.reverse_geocode_state(float(coords[i][0]),
+                                                        float(coords[i][1]))
+        return results
+
     @accepts(Any, str)
     @returns(Tuple[dict, str])
     def forward_geocode(self, query):
         """Forward geocode an address and store it in cache
 
         It will first check if the query is cached. If yes, return the address.
-        If not, forward geocode the query. If a result is found, return. If not,
+        If not, look for the query in the local gazetteer of swiss places. If
+        not found, look for a cached or gazetteer entry close enough to the
+        query (e.g. "zureich" for "zurich", see fuzzy_match). If not found,
+        forward geocode the query. If a result is found, return. If not,
         check if there are CH words (e.g. a city name in switzerland) in the
         query. If not, return. If yes, forward geocode with this word only.
 
@@ -242,84 +383,161 @@ class Geocoder:
         find location more globally, but in this case the swiss result may not
         appear in the results because of limitations in the response list size.
 
+        If 'deferred_geocoding' is set in the config, a query that is not
+        cached is not sent to locationiq. It is added to the queue of the
+        geocoding worker and the source "Pending" is returned along with an
+        empty location.
+
         query: str | address to geocode
         return: tuple | geographic information
         """
+        loc_tuple = self.query_memo.get(query)
+        if loc_tuple is None:
+            loc_tuple = self._forward_geocode(query)
+            # A pending query will be resolved by the worker
+            if loc_tuple[1] != Geocoder.pending_source:
+                self.query_memo.put(query, loc_tuple)
+        return loc_tuple
+
+    @accepts(Any, str, str)
+    @returns(Tuple[dict, str])
+    def geocode_user_location(self, user_id, location):
+        """Forward geocode the user.location field of a user. The result is
+        cached by user id, and computed again only if the location of the user
+        changed."""
+        cached = self.user_locations.get(user_id)
+        if cached is not None and cached[0] == location:
+            return cached[1]
+        loc_tuple = self.forward_geocode(location)
+        if loc_tuple[1] != Geocoder.pending_source:
+            self.user_locations.put(user_id, (location, loc_tuple))
+        return loc_tuple
+
+    @accepts(Any, Any, str)
+    @returns(Any)
+    def lookup_local(self, user_id, location):
+        """Returns the result that geocode_user_location (or forward_geocode if
+        user_id is None) would give, if it is known without calling locationiq,
+        i.e. from the caches or the gazetteer, and None otherwise. Nothing is
+        cached nor queued, and the fuzzy matching is not tried."""
+        if user_id is not None:
+            cached = self.user_locations.get(user_id)
+            if cached is not None and cached[0] == location:
+                return cached[1]
+        loc_tuple = self.query_memo.get(location)
+        if loc_tuple is not None:
+            return loc_tuple
+        query = Geocoder.normalize_query(location)
+        loc_tuple = self.loc_to_coords.get(query)
+        if loc_tuple is not None:
+            return loc_tuple
+        elif len(query) < 2:
+            return (dict(), "location not found")
+        elif self.gazetteer is not None \
+        and self.gazetteer.lookup(query) is not None:
+            return (self.gazetteer.lookup(query), "Gazetteer")
+        return None
+
+    @accepts(Any, str)
+    @returns(Tuple[dict, str])
+    def _forward_geocode(self, query):
+        """Normalize the query and forward geocode it, see forward_geocode"""
+        query = Geocoder.normalize_query(query)
+        cached = self.loc_to_coords.get(query)
+        if cached is not None:
+            return cached
+        elif len(query) < 2:
+            loc_tuple = (dict(), "location not found")
+            return loc_tuple
+        elif self.gazetteer is not None \
+        and self.gazetteer.lookup(query) is not None:
+            # A swiss place known locally, no need to ask locationiq
+            loc_tuple = (self.gazetteer.lookup(query), "Gazetteer")
+            self._cache_result(query, loc_tuple)
+            return loc_tuple
+        if self.config["fuzzy_matching"]:
+            match = self.fuzzy_match(query)
+            if match is not None:
+                # Not added to the fuzzy matcher, to not chain approximations
+                loc_tuple = (match[0], "Fuzzy_match")
+                self.loc_to_coords.put(query, loc_tuple, inferred_from=match[1])
+                return loc_tuple
+        if self.config["deferred_geocoding"]:
+            self.loc_to_coords.enqueue(query)
+            return (dict(), Geocoder.pending_source)
+        else:
+            return self.resolve_query(query)
+
+    @staticmethod
+    @accepts(str)
+    @returns(str)
+    def normalize_query(query):
+        """Normalize a location field into the query used as key of the
+        geocoding cache"""
         # Remove special characters that should not appear in a location field
         query = normalize_text(query)
         query = Cleaner.remove_not_good_chars(query,
                                               Geocoder.location_good_chars)
         query = re.sub(r"[/\r?\n|\r/]", " ", query)
         query = Cleaner.clean_spaces(query)
-        query = query.lower().strip()
-        if query in self.loc_to_coords:
-            return self.loc_to_coords[query]
-        elif len(query) < 2:
-            loc_tuple = (dict(), "location not found")
+        return query.lower().strip()
+
+    @accepts(Any, str)
+    @returns(Tuple[dict, str])
+    def resolve_query(self, query):
+        """Forward geocode a normalized query with locationiq and store the
+        result in the cache, see forward_geocode"""
+        try:
+            msg = "Request to locationiq : '" + query + "'"
+            print(msg)
+            logging.info(msg)
+            loc = self.locationiq_search(query)
+            loc = slim_location(loc[0].to_dict())
+            loc_type = "Geocoder_original"
+            loc_tuple = (loc, loc_type)
+            self._cache_result(query, loc_tuple)
             return loc_tuple
-        else:
-            try:
-                self.open_mapping_file()
-                msg = "Request to locationiq : '" + query + "'"
-                print(msg)
-                logging.info(msg)
-                time.sleep(1.1) # locationiq limits 60 requests/minute
-                loc = self.locationiq_search(query)
-                loc = loc[0].to_dict()
-                loc_type = "Geocoder_original"
-                loc_tuple = (loc, loc_type)
-                self.loc_to_coords[query] = loc_tuple
-                loc_str = query + "\n" + str(loc_tuple) + "\n"
-                self.loc_to_coords_file.write(loc_str)
-                return loc_tuple
-            except ApiException as e:
-                if e.status == 404:
-                    # Unable to find location, try to find CH words
-                    ch_loc = self.get_ch_location(query)
-                    if ch_loc is not None:
-                        try:
-                            print("Not found, request ch word instead : '"
-                                  + str(ch_loc) + "'")
-                            time.sleep(1) # locationiq limits 60 requests/minute
-                            loc = self.locationiq_search(ch_loc)
-                            loc = loc[0].to_dict()
-                            loc_type = "Geocoder_CH_word"
-                            loc_tuple = (loc, loc_type)
-                            self.loc_to_coords[query] = loc_tuple
-                            loc_str = query + "\n" + str(loc_tuple) + "\n"
-                            self.loc_to_coords_file.write(loc_str)
-                            return loc_tuple
-                        except ApiException as e:
-                            # Raise an exception if a ch word is found but no
-                            # localization can be found. This should never
-                            # happen (a city/state should always
-                            # be geocoded successfully)
-                            # update : not always true, the postal code list
-                            # is approximative, some of the number included do
-                            # not correspond to any city. So we simply print
-                            # the output for manual check.
-                            if e.status == 404:
-                                error_str = "CH word localization not found\n" \
-                                            + "Query: " + query + "\n" \
-                                            + "CH word: " + ch_loc
-                                print(error_str)
-                                loc_tuple = (dict(), "location not found")
-                                self.loc_to_coords[query] = loc_tuple
-                                loc_str = query + "\n" + str(loc_tuple) + "\n"
-                                self.loc_to_coords_file.write(loc_str)
-                                return loc_tuple
-                                #raise Exception(error_str)
-                            else:
-                                raise(e)
-                    else:
-                        loc_tuple = (dict(), "location not found")
-                        self.loc_to_coords[query] = loc_tuple
-                        loc_str = query + "\n" + str(loc_tuple) + "\n"
-                        self.loc_to_coords_file.write(loc_str)
+        except ApiException as e:
+            if e.status == 404:
+                # Unable to find location, try to find CH words
+                ch_loc = self.get_ch_location(query)
+                if ch_loc is not None:
+                    try:
+                        print("Not found, request ch word instead : '"
+                              + str(ch_loc) + "'")
+                        loc = self.locationiq_search(ch_loc)
+                        loc = slim_location(loc[0].to_dict())
+                        loc_type = "Geocoder_CH_word"
+                        loc_tuple = (loc, loc_type)
+                        self._cache_result(query, loc_tuple)
                         return loc_tuple
+                    except ApiException as e:
+                        # Raise an exception if a ch word is found but no
+                        # localization can be found. This should never
+                        # happen (a city/state should always
+                        # be geocoded successfully)
+                        # update : not always true, the postal code list
+                        # is approximative, some of the number included do
+                        # not correspond to any city. So we simply print
+                        # the output for manual check.
+                        if e.status == 404:
+                            error_str = "CH word localization not found\n" \
+                                        + "Query: " + query + "\n" \
+                                        + "CH word: " + ch_loc
+                            print(error_str)
+                            loc_tuple = (dict(), "location not found")
+                            self._cache_result(query, loc_tuple)
+                            return loc_tuple
+                            #raise Exception(error_str)
+                        else:
+                            raise(e)
                 else:
-                    self.clean()
-                    raise(e)
+                    loc_tuple = (dict(), "location not found")
+                    self._cache_result(query, loc_tuple)
+                    return loc_tuple
+            else:
+                self.clean()
+                raise(e)
 
     @accepts(Any, str)
     @returns(Any)
@@ -330,7 +548,6 @@ class Geocoder:
         if postcode == "-1":
             return None
         print(f"Request to locationiq : '{postcode}'")
-        time.sleep(1.1) # locationiq limits 60 requests/minute
         loc = self.locationiq_search(postcode)
         loc = loc[0].to_dict()
         state = loc["address"]["state"]
@@ -0,0 +1,40 @@
+from lid.service import LidClient
+from lid.pool import ShardedLid
+
+
+def load_lid(config):
+    """Returns the language identification model to use according to the
+    config. If 'use_lid_service' is set, this is a client of the LID service
+    (see scripts/lid_server.py), otherwise the model is loaded by the current
+    process (see load_local_lid).
+
+    The returned object has a 'predict_label(List[str])' method in any case.
+    """
+    if config["use_lid_service"]:
+        return LidClient(config["lid_socket_path"],
+                         timeout=config["lid_client_timeout"])
+    return load_local_lid(config)
+
+
+def load_local_lid(config):
+    """Load the model in the current process. If 'lid_workers' is greater
+    than 1, this is a pool of CPU worker processes each holding a replica,
+    otherwise a single BertLid model on the configured gpu."""
+    if config["lid_workers"] > 1:
+        return ShardedLid(config["lid_workers"],
+                          threads_per_worker=config["lid_threads_per_worker"],
+                          batch_size=config["lid_worker_batch_size"])
+
+    # imported here such that the clients of the service do not need torch
+    from bert_lid import BertLid
+    from torch import cuda
+
+    cuda.set_device(config["gpu_index_to_use"])
+    return BertLid()
+
+
+def lid_batches_itself(config):
+    """Returns True if the model returned by load_lid splits the sentences
+    into batches itself, in which case all sentences should be given at once.
+    This is the case of the service and of the pool of workers."""
+    return config["use_lid_service"] or config["lid_workers"] > 1
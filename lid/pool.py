@@ -0,0 +1,210 @@
+# Data-parallel language identification on CPU. Several worker processes each
+# hold their own model replica with a fixed count of threads. Sentences are
+# sorted by length and cut into batches (sentences of similar length are
+# cheaper to batch together), each worker receives a contiguous block of
+# batches, and a worker that has emptied its own queue steals batches from the
+# others. The predictions are reassembled in the original order.
+
+import os
+import queue
+import traceback
+import multiprocessing as mp
+from typing import List
+
+
+def load_cpu_bert_lid():
+    """Default model factory of the workers: a BertLid model on CPU"""
+    from bert_lid import BertLid
+    return BertLid()
+
+
+def _set_thread_count(threads):
+    """Pin the count of threads used by the math libraries of a worker. The
+    environment variables must be set before torch is imported."""
+    for var in ["OMP_NUM_THREADS", "MKL_NUM_THREADS"]:
+        os.environ[var] = str(threads)
+    # Make sure the replicas are not loaded on the gpu
+    os.environ["CUDA_VISIBLE_DEVICES"] = ""
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ModuleNotFoundError:
+        pass
+
+
+def _next_task(worker_index, task_queues, timeout=0.05):
+    """Take the next task from the worker's own queue, or steal one from the
+    queue of another worker. Returns None if no task is available."""
+    try:
+        return task_queues[worker_index].get_nowait()
+    except queue.Empty:
+        pass
+    count = len(task_queues)
+    for offset in range(1, count):
+        try:
+            return task_queues[(worker_index + offset) % count].get_nowait()
+        except queue.Empty:
+            pass
+    try:
+        return task_queues[worker_index].get(timeout=timeout)
+    except queue.Empty:
+        return None
+
+
+def _worker_main(worker_index, threads, model_factory, task_queues,
+                 result_queue, stop):
+    _set_thread_count(threads)
+    try:
+        model = model_factory()
+    except Exception:
+        result_queue.put(("init_error", worker_index, traceback.format_exc()))
+        return
+    result_queue.put(("ready", worker_index, None))
+    while not stop.is_set():
+        task = _next_task(worker_index, task_queues)
+        if task is None:
+            continue
+        job_id, batch_id, sentences = task
+        try:
+            predictions = [float(x) for x in model.predict_label(sentences)]
+            result_queue.put(("done", (job_id, batch_id), predictions))
+        except Exception:
+            result_queue.put(("error", (job_id, batch_id),
+                              traceback.format_exc()))
+
+
+class ShardedLid:
+    """A pool of worker processes, each one holding a replica of the language
+    identification model. It exposes the same 'predict_label' method as
+    BertLid.
+
+    Parameters
+        workers | int
+            The count of worker processes
+        threads_per_worker | int
+            The count of threads of each worker. Default to the cpu count
+            divided by the count of workers.
+        batch_size | int
+            The count of sentences per batch given to a worker
+        model_factory | callable
+            A picklable function returning the model in a worker
+        poll_interval | float
+            Time (s) between two checks that the workers are alive while
+            waiting for their results
+    """
+
+    def __init__(self, workers, threads_per_worker=None, batch_size=32,
+                 model_factory=load_cpu_bert_lid, poll_interval=1.0):
+        if workers < 1:
+            raise ValueError("'workers' must be at least 1")
+        if threads_per_worker is None:
+            threads_per_worker = max(1, (os.cpu_count() or 1) // workers)
+        self.workers = workers
+        self.threads_per_worker = threads_per_worker
+        self.batch_size = batch_size
+        self.model_factory = model_factory
+        self.poll_interval = poll_interval
+        self.job_id = 0
+        self.processes = []
+        self._start()
+
+    def _start(self):
+        """Start the worker processes and wait for their model to be loaded"""
+        # spawn rather than fork, torch does not support being forked once
+        # initialized
+        context = mp.get_context("spawn")
+        self.task_queues = [context.Queue() for _ in range(self.workers)]
+        self.result_queue = context.Queue()
+        self.stop = context.Event()
+        self.processes = []
+        for i in range(self.workers):
+            process = context.Process(target=_worker_main,
+                                      args=(i,
+                                            self.threads_per_worker,
+                                            self.model_factory,
+                                            self.task_queues,
+                                            self.result_queue,
+                                            self.stop),
+                                      daemon=True)
+            process.start()
+            self.processes.append(process)
+
+        # Wait for all the replicas to be loaded
+        for _ in range(self.workers):
+            status, worker_index, error = self._next_result(restart=False)
+            if status == "init_error":
+                self.close()
+                raise Exception(f"LID worker {worker_index} failed to load " +
+                                f"the model:\n{error}")
+
+    def _next_result(self, restart=True):
+        """Wait for the next result of the workers. If a worker died (e.g.
+        out of memory), an exception is raised such that the caller does not
+        wait forever, and the pool is started again if 'restart' is set."""
+        while True:
+            try:
+                return self.result_queue.get(timeout=self.poll_interval)
+            except queue.Empty:
+                pass
+            dead = [i for i, process in enumerate(self.processes)
+                    if not process.is_alive()]
+            if len(dead) > 0:
+                exit_codes = [self.processes[i].exitcode for i in dead]
+                self.close()
+                if restart:
+                    self._start()
+                raise Exception(f"LID workers {dead} died (exit codes " +
+                                f"{exit_codes})" +
+                                (", the pool was restarted" if restart else ""))
+
+    def _drain(self):
+        """Remove the tasks left in the queues, e.g. the remaining batches of
+        a job that failed. Their results would be ignored anyway."""
+        for task_queue in self.task_queues:
+            while True:
+                try:
+                    task_queue.get_nowait()
+                except queue.Empty:
+                    break
+
+    def predict_label(self, sentences: List[str]) -> List[float]:
+        """Returns the gsw prediction for each sentence"""
+        sentences = list(sentences)
+        if len(sentences) == 0:
+            return []
+        self.job_id += 1
+
+        # Sort by length such that each batch has sentences of similar length
+        order = sorted(range(len(sentences)), key=lambda i: len(sentences[i]))
+        batches = [order[left:left+self.batch_size]
+                   for left in range(0, len(order), self.batch_size)]
+        # Give a contiguous block of batches to each worker, the work
+        # stealing balances the load if some workers are faster
+        for batch_id, batch in enumerate(batches):
+            worker_index = batch_id * self.workers // len(batches)
+            texts = [sentences[i] for i in batch]
+            self.task_queues[worker_index].put((self.job_id, batch_id, texts))
+
+        predictions = [None] * len(sentences)
+        remaining = len(batches)
+        while remaining > 0:
+            status, (job_id, batch_id), result = self._next_result()
+            if job_id != self.job_id:
+                # Left over from a previous job that failed
+                continue
+            if status == "error":
+                self._drain()
+                raise Exception("LID worker failed:\n" + result)
+            for i, prediction in zip(batches[batch_id], result):
+                predictions[i] = prediction
+            remaining -= 1
+        return predictions
+
+    def close(self):
+        """Stop the worker processes"""
+        self.stop.set()
+        for process in self.processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        self.processes = []
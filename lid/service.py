@@ -0,0 +1,275 @@
+# Local language identification service. A single process owns the BertLid
+# model and serves predictions on a unix socket, so that the stream filter,
+# the backfills and the ad-hoc scripts can share one warm model instead of
+# loading their own copy.
+#
+# Requests coming from all clients are coalesced into micro-batches. A batch is
+# sent to the model as soon as it is full, or when the oldest request waiting
+# in it reaches its deadline (arrival time + max_delay).
+
+import os
+import json
+import queue
+import socket
+import socketserver
+import struct
+import threading
+import time
+import logging
+import traceback
+from typing import List
+
+# Each message is a json object prefixed by its size (4 bytes, big-endian)
+_HEADER = struct.Struct("!I")
+
+
+def send_message(sock, obj):
+    """Serialize 'obj' as json and send it on the socket with its size"""
+    payload = json.dumps(obj).encode("utf8")
+    sock.sendall(_HEADER.pack(len(payload)) + payload)
+
+
+def _recv_exactly(sock, size):
+    """Read exactly 'size' bytes from the socket. Returns None if the
+    connection has been closed before the first byte"""
+    chunks = []
+    remaining = size
+    while remaining > 0:
+        chunk = sock.recv(min(remaining, 1 << 16))
+        if not chunk:
+            if remaining == size:
+                return None
+            raise ConnectionError("Connection closed in the middle of a " +
+                                  "message")
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b"".join(chunks)
+
+
+def recv_message(sock):
+    """Read one message from the socket. Returns None if the connection has
+    been closed by the peer"""
+    header = _recv_exactly(sock, _HEADER.size)
+    if header is None:
+        return None
+    payload = _recv_exactly(sock, _HEADER.unpack(header)[0])
+    if payload is None:
+        raise ConnectionError("Connection closed in the middle of a message")
+    return json.loads(payload.decode("utf8"))
+
+
+class _Request:
+    """A pending prediction request, waiting to be served by the batcher"""
+
+    def __init__(self, sentences):
+        self.sentences = sentences
+        self.arrival = time.time()
+        self.predictions = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    """Handle one client connection. A client can send several requests on
+    the same connection, they are answered in order"""
+
+    def handle(self):
+        while True:
+            try:
+                message = recv_message(self.request)
+            except (ConnectionError, OSError):
+                return
+            if message is None:
+                return
+            try:
+                sentences = message["sentences"]
+                if not isinstance(sentences, list):
+                    raise ValueError("'sentences' must be a list")
+                predictions = self.server.lid_server.predict(sentences)
+                response = {"predictions": predictions}
+            except Exception as e:
+                logging.error(traceback.format_exc())
+                response = {"error": str(e)}
+            try:
+                send_message(self.request, response)
+            except OSError:
+                return
+
+
+class _UnixServer(socketserver.ThreadingMixIn,
+                  socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class LidServer:
+    """Serve the predictions of a language identification model on a unix
+    socket.
+
+    Parameters
+        lid | object
+            The model, anything with a 'predict_label(List[str])' method
+            returning one gsw probability per sentence (e.g. BertLid)
+        socket_path | str
+            The path of the unix socket to listen on
+        batch_size | int
+            Maximum count of sentences given to the model at once
+        max_delay | float
+            Maximum time (s) a request waits for other requests before its
+            batch is flushed
+    """
+
+    def __init__(self, lid, socket_path, batch_size=100, max_delay=0.05):
+        self.lid = lid
+        self.socket_path = socket_path
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.requests = queue.Queue()
+        self.server = None
+
+    def predict(self, sentences: List[str]) -> List[float]:
+        """Queue the sentences for the next micro-batch and wait for the
+        predictions. This is called concurrently by the connection handlers.
+        """
+        if len(sentences) == 0:
+            return []
+        request = _Request(sentences)
+        self.requests.put(request)
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.predictions
+
+    def _next_batch(self):
+        """Block until a request arrives, then gather other requests until
+        the batch is full or the deadline of the first request is reached."""
+        first = self.requests.get()
+        batch = [first]
+        count = len(first.sentences)
+        deadline = first.arrival + self.max_delay
+        while count < self.batch_size:
+            timeout = deadline - time.time()
+            if timeout <= 0:
+                break
+            try:
+                request = self.requests.get(timeout=timeout)
+            except queue.Empty:
+                break
+            batch.append(request)
+            count += len(request.sentences)
+        return batch
+
+    def _run_batch(self, batch):
+        """Run the model on all sentences of the batch and dispatch the
+        predictions to the corresponding requests"""
+        sentences = [s for request in batch for s in request.sentences]
+        try:
+            predictions = []
+            for left in range(0, len(sentences), self.batch_size):
+                chunk = sentences[left:left + self.batch_size]
+                predictions.extend(float(x)
+                                   for x in self.lid.predict_label(chunk))
+            if len(predictions) != len(sentences):
+                raise Exception("predictions and sentences must have the " +
+                                "same length")
+        except Exception as e:
+            logging.error(traceback.format_exc())
+            for request in batch:
+                request.error = e
+                request.done.set()
+            return
+
+        left = 0
+        for request in batch:
+            right = left + len(request.sentences)
+            request.predictions = predictions[left:right]
+            request.done.set()
+            left = right
+
+    def _run_batcher(self):
+        while True:
+            batch = self._next_batch()
+            self._run_batch(batch)
+
+    def serve_forever(self):
+        """Start the batcher and listen for clients until interrupted"""
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        batcher = threading.Thread(target=self._run_batcher, daemon=True)
+        batcher.start()
+        self.server = _UnixServer(self.socket_path, _Handler)
+        self.server.lid_server = self
+        msg = "LID service listening on " + self.socket_path
+        print(msg)
+        logging.info(msg)
+        try:
+            self.server.serve_forever()
+        finally:
+            self.server.server_close()
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+
+    def shutdown(self):
+        if self.server is not None:
+            self.server.shutdown()
+
+
+class LidClient:
+    """Client of the LID service. It exposes the same 'predict_label' method
+    as BertLid, so it can be used as a drop-in replacement of the model.
+
+    Parameters
+        socket_path | str
+            The path of the unix socket the service listens on
+        timeout | float
+            Timeout (s) of a single request, None to wait forever
+    """
+
+    def __init__(self, socket_path, timeout=None):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.sock = None
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except (FileNotFoundError, ConnectionRefusedError):
+            sock.close()
+            raise ConnectionError("The LID service is not running on " +
+                                  self.socket_path + " (see " +
+                                  "scripts/lid_server.py)")
+        self.sock = sock
+
+    def _request(self, sentences):
+        if self.sock is None:
+            self._connect()
+        send_message(self.sock, {"sentences": sentences})
+        response = recv_message(self.sock)
+        if response is None:
+            raise ConnectionError("The LID service closed the connection")
+        return response
+
+    def predict_label(self, sentences: List[str]) -> List[float]:
+        """Returns the gsw prediction for each sentence"""
+        sentences = list(sentences)
+        if len(sentences) == 0:
+            return []
+        try:
+            response = self._request(sentences)
+        except socket.timeout:
+            self.close()
+            raise
+        except OSError:
+            # The service may have been restarted, retry once on a new
+            # connection
+            self.close()
+            response = self._request(sentences)
+        if "error" in response:
+            raise Exception("LID service error: " + response["error"])
+        return response["predictions"]
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
@@ -36,6 +36,20 @@ _NUMERIC_ONLY = 2  #: the prefix applies only when followed by number(s)
 # * \p{IsPi} => \p{Pi} or \p{Initial_Punctuation}: any kind of opening quote.
 # * \p{IsPf} => \p{Pf} or \p{Final_Punctuation}: any kind of closing quote.
 
+# Patterns of split_paragraph, compiled once. See split_paragraph for their purpose.
+_MULTI_SPACES = re.compile(' +')
+_NEWLINE_SPACE = re.compile('\n ')
+_SPACED_NEWLINE = re.compile(' \n ')
+_MORE = regex.compile(r'([\:;])([^\d\)\(/-])')
+_QUESTION_EXCLAMATION = regex.compile(r'([\?!]+)([^\?!\p{Pe}\p{Pf}\"])')
+_MULTI_DOTS = regex.compile(r'(\.[\.]+) +([\'\"\(\[\¿\¡\p{Pi}]*[\p{L}])')
+_PUNCT_IN_QUOTE = regex.compile(r'([?!\.][\ ]*[\'\"\)\]\p{Pf}]+) +([\'\"\(\[\¿\¡\p{Pi}]*[\ ]*[\p{Lu}])')
+_PUNCT = regex.compile(r'([?!\.]) +([\'\"\(\[\¿\¡\p{Pi}]+[\ ]*[\p{L}])')
+_PERIOD_WORD = regex.compile(r'([\p{IsAlnum}\.\-]*)([\'\"\)\]\%\p{Pf}]*)(\.+)$')
+_ACRONYM = regex.compile(r'(\.)[\p{IsUpper}\-]+(\.+)$')
+_SENTENCE_START = regex.compile(r'^([ ]*[\'\"\(\[\¿\¡\p{Pi}]*[ ]*[\p{L}0-9])')
+_NUMBER_START = regex.compile('^[0-9]+')
+
 
 class MocySplitter():
     """
@@ -80,6 +94,20 @@ class MocySplitter():
         keep_newlines = keep_newlines if keep_newlines is not None else self.keep_newlines
         return self._split_sentences(input_text, more) if keep_newlines else self._split_text(input_text, more)
 
+    def split_many(self, texts, more=None, keep_newlines=None):  # -> List[List[str]]
+        """
+        Split several texts into sentences, see :py:meth:`split`.
+
+        :param texts: the input texts
+        :param more: override the class' parameter
+        :param keep_newlines: override the class' parameter
+        :return: the list of sentences of each text
+        """
+        more = more if more is not None else self.more
+        keep_newlines = keep_newlines if keep_newlines is not None else self.keep_newlines
+        split = self._split_sentences if keep_newlines else self._split_text
+        return [split(text, more) for text in texts]
+
     def _split_sentences(self, input_text, more):  # -> List[str]
         """
         Split a text into sentences. Newlines already present in text will be preserved and act as paragraph delimiters.
@@ -88,11 +116,11 @@ class MocySplitter():
         :param more: split on :; if true
         :return: a list of sentences (no blank lines)
         """
-        return sum((
-            self.split_paragraph(p, self.nb_prefixes, more)
-            for p in input_text.split('\n')
-            if p and not p.isspace()
-        ), [])
+        splits = []
+        for p in input_text.split('\n'):
+            if p and not p.isspace():
+                splits.extend(self.split_paragraph(p, self.nb_prefixes, more))
+        return splits
 
     def _split_text(self, input_text, more):  # -> List[str]
         """
@@ -124,9 +152,9 @@ class MocySplitter():
     def cleanup_spaces(cls, text):  # -> str
         """Normalize spaces in a text."""
         # clean up spaces
-        text = re.sub(' +', ' ', text)
-        text = re.sub('\n ', '\n', text)
-        text = re.sub(' \n ', '\n', text)
+        text = _MULTI_SPACES.sub(' ', text)
+        text = _NEWLINE_SPACE.sub('\n', text)
+        text = _SPACED_NEWLINE.sub('\n', text)
         return text.strip()
 
     @classmethod
@@ -151,52 +179,54 @@ class MocySplitter():
             # https://bitbucket.org/luismsgomes/mosestokenizer/src/default/src/mosestokenizer/split-sentences.perl
             # text = regex.sub(r'([\:;])', r'\1\n', text)
             # TODO: improvement: try to keep emojis, numers like 1:1 and urls intact
-            text = regex.sub(r'([\:;])([^\d\)\(/-])', r'\1\n\2', text)
+            text = _MORE.sub(r'\1\n\2', text)
 
         # split if ?! is followed by a lowercase (often on the web)
-        text = regex.sub(r'([\?!]+)([^\?!\p{Pe}\p{Pf}\"])', r'\1\n\2', text)
+        text = _QUESTION_EXCLAMATION.sub(r'\1\n\2', text)
         # text = regex.sub(r'([?!]) +([\'\"\(\[\¿\¡\p{Pi}]*[\p{L}])', r'\1\n\2', text)
 
         # Multi-dots followed by sentence starters.
-        text = regex.sub(r'(\.[\.]+) +([\'\"\(\[\¿\¡\p{Pi}]*[\p{L}])', r'\1\n\2', text)
+        text = _MULTI_DOTS.sub(r'\1\n\2', text)
 
         # Add breaks for sentences that end with some sort of punctuation
         # inside a quote or parenthetical and are followed by a possible
         # sentence starter punctuation and ~upper case~ letter
-        text = regex.sub(r'([?!\.][\ ]*[\'\"\)\]\p{Pf}]+) +([\'\"\(\[\¿\¡\p{Pi}]*[\ ]*[\p{Lu}])', r'\1\n\2', text)
+        text = _PUNCT_IN_QUOTE.sub(r'\1\n\2', text)
 
         # Add breaks for sentences that end with some sort of punctuation,
         # and are followed by a sentence starter punctuation and upper case letter.
-        text = regex.sub(r'([?!\.]) +([\'\"\(\[\¿\¡\p{Pi}]+[\ ]*[\p{L}])', r'\1\n\2', text)
+        text = _PUNCT.sub(r'\1\n\2', text)
 
         # Special punctuation cases are covered. Check all remaining periods.
         words = text.split(' ')
-        text = ''
         for i in range(len(words) - 1):
+            word = words[i]
+            # Only words ending with periods can be split ($ also matches before a final newline)
+            if not (word.endswith('.') or word.endswith('.\n')):
+                continue
             # TODO: add the # as a possible sentence start ? (twitter and hashtags)
-            m = regex.search(r'([\p{IsAlnum}\.\-]*)([\'\"\)\]\%\p{Pf}]*)(\.+)$', words[i])
+            m = _PERIOD_WORD.search(word)
             if m is not None:
                 # Check if $1 is a known honorific and $2 is empty, never break.
                 prefix, starting_punct, _ = m.groups()
-                if prefix and nb_prefixes.get(prefix, _UNDEF) == _ANY and not starting_punct:
+                prefix_type = nb_prefixes.get(prefix, _UNDEF) if prefix else _UNDEF
+                if prefix_type == _ANY and not starting_punct:
                     pass  # Not breaking prefix
-                elif regex.search(r'(\.)[\p{IsUpper}\-]+(\.+)$', words[i]) is not None:
+                elif _ACRONYM.search(word) is not None:
                     pass  # Not breaking - upper case acronym
-                elif regex.search(r'^([ ]*[\'\"\(\[\¿\¡\p{Pi}]*[ ]*[\p{L}0-9])', words[i + 1]):
+                elif _SENTENCE_START.search(words[i + 1]):
                     # The next word has maybe a bunch of initial quotes, maybe a
                     # space, then either ~upper case~ letter or a number
-                    if prefix and nb_prefixes.get(prefix, _UNDEF) == _NUMERIC_ONLY and not starting_punct \
-                            and regex.search('^[0-9]+', words[i + 1]):
+                    if prefix_type == _NUMERIC_ONLY and not starting_punct \
+                            and _NUMBER_START.search(words[i + 1]):
                         # exception: we have a numeric-only prefix followed by a number
                         pass
                     else:
                         # In any other case, split
-                        words[i] = words[i] + '\n'
-            text += words[i] + ' '
+                        words[i] = word + '\n'
 
-        # We stopped one token from the end to allow for easy look-ahead.
-        # Append it now.
-        text = text + words[-1]
+        # Join in a single pass (the last word is never split)
+        text = ' '.join(words)
 
         # clean up spaces
         text = cls.cleanup_spaces(text)
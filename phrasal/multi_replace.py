@@ -0,0 +1,92 @@
+"""
+Replacement of many literals in a single scan of the text.
+
+The literals are stored in a trie (the automaton), which is compiled into a regular expression where each state is a
+group of alternatives, one per outgoing character, and each final state with outgoing transitions is an optional
+group. Since the alternatives of a state start with different characters, at most one of them can match, and the
+greedy optional groups make the automaton report the longest literal. The regex engine scanning from left to right,
+the matches are *leftmost-longest* and don't overlap:
+
+.. code-block:: python
+
+    >>> MultiReplacer({'ab': 'x', 'abc': 'y', 'bcd': 'z'}).replace('abcd')
+    'yd'
+
+.. note::
+
+    This differs from applying ``str.replace`` literal after literal when the literals overlap (``'abcd'`` gives
+    ``'xcd'`` when replacing ``'ab'`` first) or when a replacement creates a new occurrence of a literal (all the
+    replacements are done in the original text, the output is not scanned again).
+"""
+
+import re
+
+__all__ = ['MultiReplacer']
+
+
+def _trie(literals):
+    root = dict()
+    for literal in literals:
+        node = root
+        for c in literal:
+            node = node.setdefault(c, dict())
+        node[''] = True  # final state
+    return root
+
+
+def _trie_regex(node):
+    """Compile the states reachable from a trie node into a regex."""
+    branches = [re.escape(c) + _trie_regex(child) for c, child in sorted(node.items()) if c != '']
+    if not branches:
+        return ''
+    body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+    if '' in node:
+        # a literal ends here: try to go further first, the longest literal wins
+        return '(?:' + body + ')?'
+    return body
+
+
+class MultiReplacer:
+    """
+    Replace all the occurrences of several literals at once, with leftmost-longest semantics.
+
+    :param replacements: a dictionary or a list of pairs ``(literal, replacement)``. If a literal is given more than
+        once, its first replacement is used.
+    """
+
+    def __init__(self, replacements):
+        items = replacements.items() if isinstance(replacements, dict) else replacements
+        self.replacements = dict()
+        for literal, replacement in items:
+            if not literal:
+                raise ValueError('MultiReplacer: empty literal')
+            self.replacements.setdefault(literal, replacement)
+        self.pattern = re.compile(_trie_regex(_trie(self.replacements))) if self.replacements else None
+        values = set(self.replacements.values())
+        if len(values) == 1:
+            # same replacement for all the literals: no lookup needed
+            self._repl = values.pop().replace('\\', r'\\')
+        else:
+            lookup = self.replacements.__getitem__
+            self._repl = lambda m: lookup(m.group(0))
+
+    def replace(self, text):
+        """Replace the literals in the text."""
+        if self.pattern is None:
+            return text
+        return self.pattern.sub(self._repl, text)
+
+    __call__ = replace
+
+    def replace_many(self, texts):
+        """Replace the literals in a list of texts."""
+        if self.pattern is None:
+            return list(texts)
+        sub, repl = self.pattern.sub, self._repl
+        return [sub(repl, text) for text in texts]
+
+    def __len__(self):
+        return len(self.replacements)
+
+    def __repr__(self):
+        return 'MultiReplacer(%d literals)' % len(self.replacements)
@@ -8,7 +8,8 @@ Each sentence is checked against a list of rules and rejected / considered inval
 Rules are thus *AND-based*.
 
 Rules are defined using a simple YAML syntax and can be of two types: *length-based* (character count)
- or *pattern-based* (regular expressions). They are checked in the same order they are defined.
+ or *pattern-based* (regular expressions). They are checked in the same order they are defined, unless an
+ execution plan is computed (see below).
 
 .. note::
 
@@ -16,6 +17,23 @@ Rules are defined using a simple YAML syntax and can be of two types: *length-ba
     * Rules are checked in the same order as they are defined, so it is advised to put the most generic / efficient
       ones first.
 
+Execution plan
+--------------
+
+Since rules are AND-ed, their order doesn't change the result, only the time spent: a sentence is rejected as soon
+as a rule fails. :py:meth:`Rules.plan` measures the cost and the rejection rate of each rule on a sample of
+sentences, and orders the rules such that the cheap and selective ones come first (by increasing
+``cost / rejection rate``). In *adaptive* mode, the statistics are also collected while filtering and the rules are
+ordered again every ``replan_interval`` sentences.
+
+Profiling
+---------
+
+In *profile* mode, the statistics of every rule (sentences checked, time spent, sentences for which the ``if``
+condition held and sentences rejected) are collected while filtering. :py:meth:`Rules.report` returns them, and
+:py:meth:`Rules.save_report` writes them to a JSON file. From the command line, ``--profile`` prints the report
+to stderr and ``--report`` writes it to a file.
+
 .. note::
 
     This module uses the `regex library <https://pypi.org/project/regex/>`_ (version V0)
@@ -115,6 +133,8 @@ Rules can additionnally specify ``examples`` and ``counterexamples`` that could
 
 import regex
 import yaml
+import json
+import time
 import logging
 from os import path
 
@@ -130,18 +150,31 @@ class PatternSentenceFilter():
     You can override this by passing a path to the constructor (``rulespath`` argument).
     """
 
-    def __init__(self, rulespath=None):
-        """Load rules from the default YAML file or the path provided."""
+    def __init__(self, rulespath=None, adaptive=False, replan_interval=10000, profile=False):
+        """Load rules from the default YAML file or the path provided.
+
+        :param rulespath: the path of the YAML rules file
+        :param adaptive: if set, order the rules again every ``replan_interval`` sentences from the statistics
+            collected while filtering (see :py:class:`Rules`)
+        :param replan_interval: the count of sentences between two plans in adaptive mode
+        :param profile: if set, collect the statistics of the rules while filtering
+        """
         if rulespath is None:
             rulespath = path.join(path.dirname(path.realpath(__file__)), 'pattern_sentence_filter.yaml')
 
         self.rulespath = rulespath
-        self.rules = Rules(yaml.safe_load(open(rulespath)))
+        with open(rulespath) as f:
+            self.rules = Rules(yaml.safe_load(f), adaptive=adaptive, replan_interval=replan_interval,
+                               profile=profile)
 
     def is_valid(self, sentence):
         """Returns true only if all the rules were respected."""
         return not self.rules.is_invalid(sentence)
 
+    def plan(self, sentences):
+        """Order the rules from their cost and rejection rate on a sample of sentences, see :py:meth:`Rules.plan`."""
+        self.rules.plan(sentences)
+
 
 class MinMax:
     """Encapsulates and handles min/max bounds. A bound set to -1 will be ignored."""
@@ -184,13 +217,62 @@ class Find:
         self.count = MinMax(**count) if count else None
         self.ratio = MinMax(**ratio) if ratio else None
 
+    def _stop_count(self, length):
+        """Returns the count of matches from which the result is known (the matches don't need to be counted
+        further), or None if all the matches must be counted."""
+        upper = []  # counts exceeding a max bound: invalid whatever the remaining matches
+        lower = []  # counts reaching all the min bounds: valid if there is no max bound
+        if self.count:
+            if self.count.max >= 0:
+                upper.append(self.count.max + 1)
+            if self.count.min >= 0:
+                lower.append(self.count.min)
+        if self.ratio:
+            if length == 0:
+                return None
+            if self.ratio.max >= 0:
+                # smallest n such that n / length > max
+                n = int(self.ratio.max * length)
+                while n / length <= self.ratio.max:
+                    n += 1
+                while n > 0 and (n - 1) / length > self.ratio.max:
+                    n -= 1
+                upper.append(n)
+            if self.ratio.min >= 0:
+                # smallest n such that n / length >= min
+                n = int(self.ratio.min * length)
+                while n > 0 and (n - 1) / length >= self.ratio.min:
+                    n -= 1
+                while n / length < self.ratio.min:
+                    n += 1
+                lower.append(n)
+        if upper:
+            return min(upper)
+        if lower:
+            return max(lower)
+        return None
+
+    def count_matches(self, s, stop=None):
+        """Count the (non-overlapping) matches of the pattern, stopping at ``stop`` matches if given."""
+        if stop is None:
+            return len(self.pattern.findall(s))
+        if stop <= 0:
+            return 0
+        nb_matches = 0
+        for _ in self.pattern.finditer(s):
+            nb_matches += 1
+            if nb_matches >= stop:
+                break
+        return nb_matches
+
     def is_invalid(self, s):
-        matches = self.pattern.findall(s)
-        nb_matches = len(matches)
+        # the count is capped once the result is known, it gives the same result as the full count
+        nb_matches = self.count_matches(s, self._stop_count(len(s)))
         if self.count and self.count.is_out_of_range(nb_matches):
             return True
         if self.ratio:
-            ratio = nb_matches / len(s)
+            # the ratio of an empty sentence is 0: the rules are independent, whatever their order
+            ratio = nb_matches / len(s) if len(s) > 0 else 0
             return self.ratio.is_out_of_range(ratio)
         return False
 
@@ -227,8 +309,10 @@ class Rule:
         """Check for the if condition"""
         return not any([iff.is_invalid(s) for iff in self.iff])
 
-    def is_invalid(self, s) -> bool:
-        if self.is_applicable(s):
+    def is_invalid(self, s, check_if=True) -> bool:
+        """Returns true if the rule applies and fails. With ``check_if`` unset, the if condition is assumed to
+        hold."""
+        if not check_if or self.is_applicable(s):
             if self.logic.is_invalid(s):
                 logger.debug("%s FAILED on |%s|" % (self, s))
                 return True
@@ -257,25 +341,140 @@ class Rule:
         return "{}: [if {}] logic={}".format(self.descr, self.iff, self.logic)
 
 
+class RuleStats:
+    """Statistics of a rule: the count of sentences checked, the time spent, the count of sentences for which the
+    ``if`` condition held (all of them if the rule has none) and the count of sentences rejected."""
+
+    def __init__(self):
+        self.calls = 0
+        self.time = 0.
+        self.applicable = 0
+        self.rejections = 0
+
+    def add(self, elapsed, applicable, rejected, calls=1):
+        self.calls += calls
+        self.time += elapsed
+        self.applicable += applicable
+        self.rejections += rejected
+
+    def rank(self):
+        """The expected cost of the rule per rejection. Rules with the lowest rank should be checked first; rules
+        that never reject come last, by increasing cost."""
+        if self.calls == 0:
+            return (1, 0.)
+        cost = self.time / self.calls
+        if self.rejections == 0:
+            return (1, cost)
+        return (0, cost * self.calls / self.rejections)
+
+    def to_dict(self):
+        return dict(calls=self.calls, time=self.time, applicable=self.applicable, rejections=self.rejections)
+
+    @classmethod
+    def from_dict(cls, d):
+        stats = cls()
+        stats.add(d['time'], d['applicable'], d['rejections'], calls=d['calls'])
+        return stats
+
+    def __repr__(self):
+        return "RuleStats(calls=%d, time=%.6f, applicable=%d, rejections=%d)" % (
+            self.calls, self.time, self.applicable, self.rejections)
+
+
 class Rules:
     """
     This class represents a list of rules.
+
+    The rules are checked in the order of :py:attr:`rules`, which is the YAML order until :py:meth:`plan` is called.
+    In profile mode, the statistics of the rules are recorded while checking sentences. In adaptive mode, they are
+    recorded as well and the rules are ordered again every ``replan_interval`` sentences.
     """
 
-    def __init__(self, rules_dict):
+    def __init__(self, rules_dict, adaptive=False, replan_interval=10000, profile=False):
         """
         :param rules_dict: a dictionary of rules (as loaded by yaml)
+        :param adaptive: if set, order the rules again from the live statistics
+        :param replan_interval: the count of sentences between two plans in adaptive mode
+        :param profile: if set, record the statistics of the rules
         """
         self.rules = [Rule(idx + 1, **r) for (idx, r) in enumerate(rules_dict)]  # [:1]
+        self.adaptive = adaptive
+        self.replan_interval = replan_interval
+        self.profile = profile or adaptive
+        self.stats = {r.id: RuleStats() for r in self.rules}  #: statistics by rule id
+        self._checked = 0
 
     def is_invalid(self, sentence: str) -> bool:
         """Returns true if any rule that apply failed."""
+        if self.profile:
+            return self._is_invalid_profiled(sentence)
         for idx, r in enumerate(self.rules):
             if r.is_invalid(sentence):
                 # print("RULE %d %s FAILED on |%s|" % (idx, r.descr, sentence))
                 return True
         return False
 
+    def _check(self, r, sentence):
+        """Check a rule and record its statistics."""
+        start = time.perf_counter()
+        applicable = r.is_applicable(sentence)
+        invalid = applicable and r.is_invalid(sentence, check_if=False)
+        self.stats[r.id].add(time.perf_counter() - start, applicable, invalid)
+        return invalid
+
+    def _is_invalid_profiled(self, sentence):
+        invalid = False
+        for r in self.rules:
+            invalid = self._check(r, sentence)
+            if invalid:
+                break
+        self._checked += 1
+        if self.adaptive and self._checked % self.replan_interval == 0:
+            self.order()
+        return invalid
+
+    def plan(self, sentences):
+        """
+        Measure the cost and the rejection rate of every rule on a sample of sentences (all the rules are checked
+        on all the sentences), then order the rules. The result of :py:meth:`is_invalid` doesn't change.
+
+        :param sentences: the sample of sentences
+        """
+        for sentence in sentences:
+            for r in self.rules:
+                self._check(r, sentence)
+        self.order()
+
+    def order(self):
+        """Order the rules from the statistics collected, by increasing cost per rejection. The sort is stable,
+        rules without statistics keep their relative order."""
+        self.rules.sort(key=lambda r: self.stats[r.id].rank())
+        logger.debug("Rules order: %s" % [r.id for r in self.rules])
+
+    def report(self):
+        """
+        Returns the statistics of the rules, in the YAML order: a list of dictionaries with the ``id`` and ``descr``
+        of the rule, its current ``position`` in the execution plan, the count of sentences checked (``calls``),
+        the time spent (``time``, in seconds), the count of sentences for which the ``if`` condition held
+        (``applicable``) and the count of sentences rejected (``rejections``).
+        """
+        positions = {r.id: position for position, r in enumerate(self.rules)}
+        return [dict(id=r.id, descr=r.descr, position=positions[r.id], **self.stats[r.id].to_dict())
+                for r in sorted(self.rules, key=lambda r: r.id)]
+
+    def save_report(self, path):
+        """Write the statistics of the rules (see :py:meth:`report`) to a JSON file."""
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+
+    def print_report(self, file=None):
+        """Prints the statistics of the rules, from the most expensive."""
+        print("%4s %-40s %10s %10s %10s %10s" % ("id", "descr", "calls", "applic.", "rejected", "time (ms)"),
+              file=file)
+        for x in sorted(self.report(), key=lambda x: -x['time']):
+            print("%4d %-40s %10d %10d %10d %10.1f" % (
+                x['id'], x['descr'][:40], x['calls'], x['applicable'], x['rejections'], x['time'] * 1000), file=file)
+
     def print_rules(self):
         """Prints all the rules, useful for debug."""
         for idx, r in enumerate(self.rules):
@@ -296,13 +495,24 @@ def main():
     parser.add_argument('-i', '--input', type=argparse.FileType('r'), default='-')
     parser.add_argument('-o', '--out', type=argparse.FileType('w'), default='-')
     parser.add_argument('-r', '--rules-file', default=None)
+    parser.add_argument('-p', '--profile', action='store_true', help='print the statistics of the rules to stderr')
+    parser.add_argument('--report', default=None, help='write the statistics of the rules to this JSON file')
 
     args = parser.parse_args()
 
     logging.basicConfig(level=logging.INFO, stream=sys.stderr, format='%(levelname)s: %(msg)s')
 
-    psf = PatternSentenceFilter(rulespath=args.rules_file)
+    psf = PatternSentenceFilter(rulespath=args.rules_file, profile=args.profile or args.report is not None)
 
     args.out.write('\n'.join(
         t for t in args.input if psf.is_valid(t)
     ))
+
+    if args.profile:
+        psf.rules.print_report(file=sys.stderr)
+    if args.report is not None:
+        psf.rules.save_report(args.report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+# Precompiled character classes shared by the Cleaner, the TweetFilter and the
+# geocoder. Each class holds the characters as a frozenset (membership and
+# "contains only" tests), a translate table deleting them (counting) and two
+# compiled regex character classes (replacing the characters of the class, or
+# the other ones). str.translate is slow as soon as a text has non-ascii
+# characters when it maps characters to other ones, so replacements go through
+# the regexes, which scan the text in a single pass.
+
+import re
+from typing import Iterable, List
+
+__all__ = ['CharClass', 'as_char_class', 'GOOD_CHARS', 'WORD_CHARS',
+           'SPECIAL_CHARS', 'GROUP_SPECIAL_CHARS', 'ISOLATED_SPECIAL_CHARS',
+           'LOCATION_CHARS']
+
+LETTERS = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+ACCENTED_LETTERS = "ÀÁÂÄÈÉÊËÍÌÎÏÓÒÔÖÚÙÛÜàáâäèéêëìíîïôöòóüùúûÿ"
+DIGITS = "0123456789"
+
+
+class CharClass:
+    """A precompiled set of characters.
+
+    Parameters
+        chars | Iterable[str]
+            The characters of the class
+    """
+
+    def __init__(self, chars):
+        self.chars = frozenset(chars)
+        self.delete_table = str.maketrans("", "", "".join(self.chars))
+        if len(self.chars) > 0:
+            body = "".join(re.escape(c) for c in sorted(self.chars))
+            self.pattern = re.compile("[" + body + "]")
+            self.others_pattern = re.compile("[^" + body + "]")
+        else:
+            self.pattern = re.compile("(?!)")
+            self.others_pattern = re.compile("(?s:.)")
+
+    def __contains__(self, c):
+        return c in self.chars
+
+    def __iter__(self):
+        return iter(self.chars)
+
+    def __len__(self):
+        return len(self.chars)
+
+    def contains_only(self, text: str) -> bool:
+        """Returns true if all the characters of the text are in the class"""
+        return self.chars.issuperset(text)
+
+    def count(self, text: str) -> int:
+        """Count the characters of the text that are in the class"""
+        return len(text) - len(text.translate(self.delete_table))
+
+    def count_others(self, text: str) -> int:
+        """Count the characters of the text that are not in the class"""
+        return len(text.translate(self.delete_table))
+
+    def replace(self, text: str, replacement: str = " ") -> str:
+        """Replace each character of the text in the class"""
+        return self.pattern.sub(replacement.replace("\\", r"\\"), text)
+
+    def replace_others(self, text: str, replacement: str = " ") -> str:
+        """Replace each character of the text not in the class"""
+        return self.others_pattern.sub(replacement.replace("\\", r"\\"),
+                                       text)
+
+    def contains_only_many(self, texts: Iterable[str]) -> List[bool]:
+        """contains_only on a list of texts"""
+        return list(map(self.chars.issuperset, texts))
+
+    def count_others_many(self, texts: Iterable[str]) -> List[int]:
+        """count_others on a list of texts"""
+        table = self.delete_table
+        return [len(text.translate(table)) for text in texts]
+
+    def replace_many(self, texts: Iterable[str],
+                     replacement: str = " ") -> List[str]:
+        """replace on a list of texts"""
+        sub = self.pattern.sub
+        replacement = replacement.replace("\\", r"\\")
+        return [sub(replacement, text) for text in texts]
+
+    def replace_others_many(self, texts: Iterable[str],
+                            replacement: str = " ") -> List[str]:
+        """replace_others on a list of texts"""
+        sub = self.others_pattern.sub
+        replacement = replacement.replace("\\", r"\\")
+        return [sub(replacement, text) for text in texts]
+
+
+_char_classes = dict()
+
+def as_char_class(chars) -> CharClass:
+    """Returns the CharClass of a set of characters. The classes built from
+    plain sets are kept, so that a set given at each call is only compiled
+    once."""
+    if isinstance(chars, CharClass):
+        return chars
+    key = frozenset(chars)
+    if key not in _char_classes:
+        _char_classes[key] = CharClass(key)
+    return _char_classes[key]
+
+
+# The characters allowed in a sentence
+GOOD_CHARS = CharClass(LETTERS + ACCENTED_LETTERS + DIGITS +
+                       " -,.?!%&\"\'()/$*+:;<=>[]\\^_{}|~€°²")
+# The characters allowed in a word without being counted as special
+WORD_CHARS = CharClass(LETTERS + ACCENTED_LETTERS + DIGITS)
+# The characters replaced by Cleaner.remove_special_chars
+SPECIAL_CHARS = CharClass("#@[]{}<>=^\\_~")
+# The characters of the groups removed by
+# Cleaner.remove_groups_of_special_chars
+GROUP_SPECIAL_CHARS = CharClass("-,%&\"'()/$*+:;<=>[]^_{}|\\~€°²")
+# The characters removed when isolated by
+# Cleaner.remove_isolated_special_chars
+ISOLATED_SPECIAL_CHARS = CharClass("+<=>^_\\°²")
+# The characters allowed in a location field
+LOCATION_CHARS = CharClass(LETTERS + ACCENTED_LETTERS + DIGITS +
+                           " -.&()/'")
@@ -1,12 +1,11 @@
 import re
-from typechecker.typecheck import *
+from utils.typecheck import *
 import unidecode
+from preprocessing.charclass import *
+from phrasal.multi_replace import MultiReplacer
 
 class Cleaner:
-    good_chars = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
-    good_chars += "ÀÁÂÄÈÉÊËÍÌÎÏÓÒÔÖÚÙÛÜàáâäèéêëìíîïôöòóüùúûÿ"
-    good_chars += " -,.?!0123456789%&\"\'()/$*+:;<=>[]\\^_{}|\\~€°²"
-    good_chars = set(good_chars)
+    good_chars = set(GOOD_CHARS)
 
     html_entities = ["&lt;", "&gt;", "&le;", "&ge;", "&amp;",
                      "&lt", "&gt", "&le", "&ge", "&amp"]
@@ -17,6 +16,11 @@ class Cleaner:
                '\\(\'o\')/', '\\(~_~)/', '\\*O*/', '\\/', '/\\',
                '-\\_( •-•)_/-', '-\\_( -)_/-', '-\\_(-)_/-', '-\\_(- )_/-']
 
+    # Replace the smileys and the html entities by a space in a single scan.
+    # The longest smiley wins when several ones overlap (see MultiReplacer).
+    smileys_replacer = MultiReplacer([(x, " ") for x in smileys])
+    html_entities_replacer = MultiReplacer([(x, " ") for x in html_entities])
+
     punc_set = set(".,:;!?")
     punc_set_no_period = set(",:;!?")
 
@@ -50,10 +54,7 @@ class Cleaner:
         sentence = re.sub(regex, " ", sentence)
         regex = r"[\:\;\=]{1}\s?-\s?([\\\/\*)(\]\[\]])\1*"
         sentence = re.sub(regex, " ", sentence)
-
-        for smiley in Cleaner.smileys:
-            sentence = sentence.replace(smiley, " ")
-        return sentence
+        return Cleaner.smileys_replacer.replace(sentence)
 
     @staticmethod
     @accepts(str)
@@ -72,33 +73,27 @@ class Cleaner:
     def remove_html_entities(sentence):
         """Remove some html entities
         """
-        for x in Cleaner.html_entities:
-            sentence = sentence.replace(x, " ")
-        return sentence
+        return Cleaner.html_entities_replacer.replace(sentence)
 
     @staticmethod
-    @accepts(str, int, special=set)
+    @accepts(str, int, special=Union[set, CharClass])
     @returns(str)
-    def remove_groups_of_special_chars(
-                                sentence,
-                                from_size,
-                                special=set("-,%&\"'()/$*+:;<=>[]^_{}|\\~€°²")):
+    def remove_groups_of_special_chars(sentence,
+                                       from_size,
+                                       special=GROUP_SPECIAL_CHARS):
         """Remove tokens of consecutive special characters, if the length is
         at least 'from_size'. The tokens are space-separated
         """
-        final_words = []
+        contains_only = as_char_class(special).contains_only
         sentence = Cleaner.clean_spaces(sentence)
-        for word in sentence.split():
-            special_count = len([c for c in word if c in special])
-            if special_count < from_size or len(word) != special_count:
-                final_words.append(word)
-        return ' '.join(final_words)
+        return ' '.join(word for word in sentence.split()
+                        if len(word) < from_size or not contains_only(word))
 
     @staticmethod
-    @accepts(str, special=set)
+    @accepts(str, special=Union[set, CharClass])
     @returns(str)
     def remove_isolated_special_chars(sentence,
-                                       special=set("+<=>^_\\°²")):
+                                       special=ISOLATED_SPECIAL_CHARS):
         """Remove isolated special characters.
         """
         final_words = []
@@ -120,26 +115,18 @@ class Cleaner:
         return [x.strip() for x in sentence.split('|') if len(x.strip())>0]
 
     @staticmethod
-    @accepts(str, Set[str])
+    @accepts(str, Union[Set[str], CharClass])
     @returns(str)
     def remove_not_good_chars(sentence, good_chars):
         """Replace by a space all characters that are not in good_chars"""
-        chars = set(list(sentence))
-        for c in chars:
-            if c not in good_chars:
-                sentence = sentence.replace(c, " ")
-        return sentence
+        return as_char_class(good_chars).replace_others(sentence)
 
     @staticmethod
     @returns(str)
-    def remove_special_chars(sentence, special_chars=set("#@[]{}<>=^\\_~")):
+    def remove_special_chars(sentence, special_chars=SPECIAL_CHARS):
         """Replace by a space all given special characters from a list of
         sentences"""
-        chars = set(list(sentence))
-        for c in chars:
-            if c in special_chars:
-                sentence = sentence.replace(c, " ")
-        return sentence
+        return as_char_class(special_chars).replace(sentence)
 
     @staticmethod
     @accepts(str)
@@ -147,11 +134,8 @@ class Cleaner:
     def remove_special_words(sentence):
         """Remove words containing one or more character that are not in
         the good character list"""
-        final = []
-        for word in sentence.split():
-            if len(set(word).difference(Cleaner.good_chars)) == 0:
-                final.append(word)
-        return ' '.join(final)
+        return ' '.join(word for word in sentence.split()
+                        if GOOD_CHARS.contains_only(word))
 
     @staticmethod
     @accepts(str)
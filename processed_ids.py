@@ -0,0 +1,306 @@
+import os
+import json
+import time
+import numpy as np
+from typing import Iterable
+
+# Twitter epoch (ms) used by the snowflake ids
+TWITTER_EPOCH_MS = 1288834974657
+
+
+def snowflake_to_timestamp(tweet_id: int) -> float:
+    """Returns the creation time (s since the unix epoch) of a snowflake id"""
+    return ((int(tweet_id) >> 22) + TWITTER_EPOCH_MS) / 1000
+
+
+def timestamp_to_snowflake(timestamp: float) -> int:
+    """Returns the smallest snowflake id created at the given time (s)"""
+    return max(0, int(timestamp * 1000) - TWITTER_EPOCH_MS) << 22
+
+
+def _mix64(x):
+    """splitmix64 finalizer, used as hash function for the bloom filter"""
+    x = x ^ (x >> np.uint64(30))
+    x = x * np.uint64(0xBF58476D1CE4E5B9)
+    x = x ^ (x >> np.uint64(27))
+    x = x * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+class BloomFilter:
+    """A bloom filter over int64 values, stored in a memory-mapped file such
+    that it is neither read entirely at startup nor kept in memory.
+
+    Parameters
+        path | str
+            The file holding the bits of the filter
+        capacity | int
+            The expected count of values. Used only to create the file.
+        error_rate | float
+            The expected false positive rate at capacity. Used only to create
+            the file.
+    """
+
+    def __init__(self, path, capacity, error_rate=0.01):
+        if not os.path.exists(path):
+            bit_count = int(-capacity * np.log(error_rate) / np.log(2) ** 2)
+            byte_count = max(8, bit_count // 8 + 1)
+            hash_count = max(1, round(bit_count / capacity * np.log(2)))
+            header = np.array([byte_count * 8, hash_count], dtype=np.int64)
+            np.save(path, np.concatenate([header.view(np.uint8),
+                                          np.zeros(byte_count,
+                                                   dtype=np.uint8)]))
+        self.path = path
+        data = np.load(path, mmap_mode="r+")
+        self.bit_count, self.hash_count = (int(x) for x in
+                                           data[:16].view(np.int64))
+        self.bits = data[16:]
+        self.data = data
+
+    def _positions(self, values):
+        """Returns the positions of the bits of each value, as an array of
+        shape (len(values), hash_count)"""
+        values = np.asarray(values, dtype=np.int64).view(np.uint64)
+        h1 = _mix64(values)
+        h2 = _mix64(values ^ np.uint64(0x9E3779B97F4A7C15)) | np.uint64(1)
+        steps = np.arange(self.hash_count, dtype=np.uint64)
+        positions = h1[:, None] + steps[None, :] * h2[:, None]
+        return positions % np.uint64(self.bit_count)
+
+    def add_many(self, values, chunk_size=1000000):
+        for left in range(0, len(values), chunk_size):
+            chunk = values[left:left+chunk_size]
+            positions = self._positions(chunk).ravel()
+            masks = np.left_shift(1, (positions % np.uint64(8)).astype(np.uint8))
+            np.bitwise_or.at(self.bits,
+                             (positions // np.uint64(8)).astype(np.int64),
+                             masks.astype(np.uint8))
+
+    def contains_many(self, values):
+        """Returns a boolean array, False means the value is surely absent"""
+        if len(values) == 0:
+            return np.zeros(0, dtype=bool)
+        positions = self._positions(values)
+        bytes_ = self.bits[(positions // np.uint64(8)).astype(np.int64)]
+        masks = np.left_shift(1, (positions % np.uint64(8)).astype(np.uint8))
+        return np.all(bytes_ & masks.astype(np.uint8), axis=1)
+
+    def flush(self):
+        self.data.flush()
+
+
+class ProcessedIdStore:
+    """Set of the tweet ids already processed, designed to keep a flat startup
+    time and memory usage as the corpus grows.
+
+    The ids are stored as int64 in sorted arrays ("segments"), written as .npy
+    files and memory-mapped. A bloom filter answers most negative lookups
+    without touching the segments. New ids are kept in memory until 'flush'
+    writes them as a new segment, and segments are merged once there are more
+    than 'max_segments'.
+
+    Tweet ids are snowflakes, so they encode their creation time. If
+    'horizon_days' is set, every tweet older than this horizon is considered
+    processed and the corresponding ids are dropped from the segments at
+    compaction.
+
+    Parameters
+        dir_path | str
+            The directory holding the segments, the bloom filter and the meta
+            data
+        legacy_path | str
+            A text file with one id per line (the previous format), imported
+            when the store is created
+        horizon_days | float
+            Tweets older than this are considered processed (None to disable)
+        bloom_capacity | int
+            The count of ids the bloom filter is sized for. The filter is
+            rebuilt larger at compaction once exceeded.
+        max_segments | int
+            The count of segments from which they are merged
+    """
+
+    def __init__(self, dir_path, legacy_path=None, horizon_days=None,
+                 bloom_capacity=10000000, max_segments=32):
+        self.dir_path = dir_path
+        self.horizon_days = horizon_days
+        self.max_segments = max_segments
+        self.meta_path = os.path.join(dir_path, "meta.json")
+        self.pending = set()
+
+        new_store = not os.path.exists(self.meta_path)
+        if new_store:
+            os.makedirs(dir_path, exist_ok=True)
+            self.meta = {"floor_id": 0,
+                         "next_segment": 0,
+                         "segments": [],
+                         "bloom": "bloom_0.npy",
+                         "bloom_capacity": bloom_capacity}
+            self._write_meta()
+        else:
+            with open(self.meta_path, "r", encoding="utf8") as f:
+                self.meta = json.load(f)
+
+        self.bloom = BloomFilter(os.path.join(dir_path, self.meta["bloom"]),
+                                 self.meta["bloom_capacity"])
+        self.segments = [np.load(os.path.join(dir_path, name), mmap_mode="r")
+                         for name in self.meta["segments"]]
+
+        if new_store and legacy_path is not None \
+        and os.path.exists(legacy_path):
+            self._import_text_file(legacy_path)
+
+    def _write_meta(self):
+        tmp_path = self.meta_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf8") as f:
+            json.dump(self.meta, f)
+        os.replace(tmp_path, self.meta_path)
+
+    def _import_text_file(self, path):
+        """Import the ids of a text file with one id per line"""
+        print("Importing processed ids from " + path + "...")
+        with open(path, "r", encoding="utf8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    self.pending.add(int(line))
+        self.flush()
+        self.compact()
+
+    def __len__(self):
+        """Count of ids stored, not counting the ones below the horizon"""
+        return sum(len(x) for x in self.segments) + len(self.pending)
+
+    def __contains__(self, tweet_id):
+        tweet_id = int(tweet_id)
+        if tweet_id < self.meta["floor_id"] or tweet_id in self.pending:
+            return True
+        if not self.bloom.contains_many([tweet_id])[0]:
+            return False
+        for segment in self.segments:
+            i = np.searchsorted(segment, tweet_id)
+            if i < len(segment) and segment[i] == tweet_id:
+                return True
+        return False
+
+    def contains_many(self, tweet_ids: Iterable) -> np.ndarray:
+        """Vectorized version of 'in', returns a boolean array"""
+        ids = np.array([int(x) for x in tweet_ids], dtype=np.int64)
+        found = ids < self.meta["floor_id"]
+        if len(self.pending) > 0:
+            found |= np.isin(ids, np.fromiter(self.pending, dtype=np.int64))
+        candidates = ~found & self.bloom.contains_many(ids)
+        for segment in self.segments:
+            if not candidates.any():
+                break
+            values = ids[candidates]
+            i = np.searchsorted(segment, values)
+            i[i == len(segment)] = 0
+            hits = np.zeros(len(ids), dtype=bool)
+            hits[candidates] = segment[i] == values
+            found |= hits
+            candidates &= ~hits
+        return found
+
+    def add(self, tweet_id):
+        """Add an id. It is written on disk at the next 'flush'"""
+        self.pending.add(int(tweet_id))
+
+    def add_many(self, tweet_ids: Iterable):
+        for tweet_id in tweet_ids:
+            self.add(tweet_id)
+
+    def _write_segment(self, values):
+        name = f"segment_{self.meta['next_segment']}.npy"
+        self.meta["next_segment"] += 1
+        path = os.path.join(self.dir_path, name)
+        with open(path + ".tmp", "wb") as f:
+            np.save(f, values)
+        os.replace(path + ".tmp", path)
+        return name
+
+    def flush(self):
+        """Write the ids added since the last flush as a new segment"""
+        if len(self.pending) == 0:
+            return
+        values = np.array(sorted(self.pending), dtype=np.int64)
+        values = values[values >= self.meta["floor_id"]]
+        if len(values) > 0:
+            self.bloom.add_many(values)
+            self.bloom.flush()
+            name = self._write_segment(values)
+            self.meta["segments"].append(name)
+            self._write_meta()
+            self.segments.append(np.load(os.path.join(self.dir_path, name),
+                                         mmap_mode="r"))
+        self.pending = set()
+        if len(self.segments) > self.max_segments:
+            self.compact(full=False)
+
+    def compact(self, full=True):
+        """Merge the segments and drop the ids below the horizon.
+
+        Parameters
+            full | bool
+                If False, the largest segment is kept as is and only the
+                others are merged, unless they sum up to at least half of it.
+        """
+        self.flush()
+        if self.horizon_days is not None:
+            floor_time = time.time() - self.horizon_days * 86400
+            self.meta["floor_id"] = max(self.meta["floor_id"],
+                                        timestamp_to_snowflake(floor_time))
+        floor_id = self.meta["floor_id"]
+
+        names = list(self.meta["segments"])
+        segments = list(self.segments)
+        kept_names = []
+        kept_count = 0
+        if not full and len(segments) > 1:
+            largest = max(range(len(segments)), key=lambda i: len(segments[i]))
+            others = sum(len(x) for x in segments) - len(segments[largest])
+            if others < len(segments[largest]) / 2:
+                kept_names = [names[largest]]
+                kept_count = len(segments[largest])
+                del names[largest]
+                del segments[largest]
+        if len(segments) == 0 or (len(segments) == 1 and floor_id == 0):
+            return
+
+        merged = np.unique(np.concatenate([np.asarray(x) for x in segments]))
+        merged = merged[merged >= floor_id]
+        new_names = kept_names.copy()
+        if len(merged) > 0:
+            new_names.append(self._write_segment(merged))
+
+        # Rebuild the bloom filter if it is over capacity, or if ids were
+        # dropped below the horizon
+        total = kept_count + len(merged)
+        rebuild_bloom = full and floor_id > 0
+        if total > self.meta["bloom_capacity"]:
+            self.meta["bloom_capacity"] = 2 * total
+            rebuild_bloom = True
+        old_bloom = None
+        if rebuild_bloom:
+            old_bloom = self.meta["bloom"]
+            index = int(old_bloom[len("bloom_"):-len(".npy")]) + 1
+            self.meta["bloom"] = f"bloom_{index}.npy"
+            bloom = BloomFilter(os.path.join(self.dir_path, self.meta["bloom"]),
+                                self.meta["bloom_capacity"])
+            for name in new_names:
+                bloom.add_many(np.load(os.path.join(self.dir_path, name),
+                                       mmap_mode="r"))
+            bloom.flush()
+
+        self.meta["segments"] = new_names
+        self._write_meta()
+        if rebuild_bloom:
+            self.bloom = bloom
+        self.segments = [np.load(os.path.join(self.dir_path, name),
+                                 mmap_mode="r") for name in new_names]
+
+        # The previous files are not referenced anymore
+        for name in set(names) - set(new_names):
+            os.remove(os.path.join(self.dir_path, name))
+        if old_bloom is not None:
+            os.remove(os.path.join(self.dir_path, old_bloom))
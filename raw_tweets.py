@@ -0,0 +1,118 @@
+# Decoding of the raw tweets files written by the streamer. The pipeline only
+# needs a handful of fields of each tweet, so instead of keeping the full json
+# objects in memory, each tweet is projected into a small TweetRecord keeping
+# the needed fields and a reference to the raw line. The full tweet is decoded
+# again only for the few tweets that end up in the output.
+#
+# If the orjson module is installed, it is used instead of json to decode the
+# lines, which is significantly faster. The lines orjson rejects are decoded
+# again with json, which is less strict.
+
+import json
+from typing import Iterator, List, Tuple
+
+try:
+    import orjson
+
+    def _loads(raw):
+        try:
+            return orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            # e.g. a lone surrogate escape, left by an emoji truncated by
+            # twitter, is rejected by orjson but accepted by json
+            return json.loads(raw)
+except ModuleNotFoundError:
+    _loads = json.loads
+
+# Fields of a tweet (or of a sub-tweet) kept by the projection
+TWEET_FIELDS = ("id_str", "text", "full_text", "coordinates", "place",
+                "limit")
+USER_FIELDS = ("id_str", "location")
+SUB_TWEET_FIELDS = ("retweeted_status", "quoted_status")
+
+
+class TweetRecord(dict):
+    """A tweet reduced to the fields used by the pipeline. It is a dict, so it
+    can be used wherever a tweet is expected as long as only the projected
+    fields are read.
+
+    Attributes
+        raw | bytes
+            The raw json line the tweet comes from
+        path | Tuple[str]
+            The keys leading from the top-level tweet of the line to this
+            tweet (e.g. ("retweeted_status",) for a retweeted tweet)
+    """
+    __slots__ = ("raw", "path")
+
+
+def loads(raw):
+    """Decode a json document with the fastest backend available"""
+    return _loads(raw)
+
+
+def project(tweet: dict, raw: bytes, path: Tuple = ()) -> TweetRecord:
+    """Project a decoded tweet and its sub-tweets into TweetRecords"""
+    record = TweetRecord()
+    record.raw = raw
+    record.path = path
+    for key in TWEET_FIELDS:
+        if key in tweet:
+            record[key] = tweet[key]
+    extended = tweet.get("extended_tweet", None)
+    if isinstance(extended, dict) and "full_text" in extended:
+        record["extended_tweet"] = {"full_text": extended["full_text"]}
+    user = tweet.get("user", None)
+    if isinstance(user, dict):
+        record["user"] = {key: user[key] for key in USER_FIELDS if key in user}
+    for key in SUB_TWEET_FIELDS:
+        if tweet.get(key, None):
+            record[key] = project(tweet[key], raw, path + (key,))
+        elif key in tweet:
+            record[key] = tweet[key]
+    return record
+
+
+def materialize(tweet: dict) -> dict:
+    """Returns the full tweet object. For a TweetRecord, the raw line is
+    decoded again, any other dict is returned as is."""
+    if not isinstance(tweet, TweetRecord):
+        return tweet
+    full = _loads(tweet.raw)
+    for key in tweet.path:
+        full = full[key]
+    return full
+
+
+def iter_lines(path: str, chunk_size: int = 1 << 20) -> Iterator[bytes]:
+    """Read a file by chunks and yield its non-empty lines, without the end
+    of line character"""
+    with open(path, "rb") as f:
+        rest = b""
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            lines = (rest + chunk).split(b"\n")
+            rest = lines.pop()
+            for line in lines:
+                if line.strip():
+                    yield line
+        if rest.strip():
+            yield rest
+
+
+def load_records(path: str, chunk_size: int = 1 << 20) -> List[TweetRecord]:
+    """Load the tweets of a raw tweets file as TweetRecords. Lines that are not
+    valid json are printed and skipped."""
+    records = []
+    for line in iter_lines(path, chunk_size):
+        try:
+            tweet = _loads(line)
+        except Exception:
+            print("*********************")
+            print(line.decode("utf8", errors="replace"))
+            print("*********************")
+            continue
+        records.append(project(tweet, line))
+    return records
@@ -0,0 +1,50 @@
+# Benchmark the startup of the geocoding cache : compare loading the text file
+# (previous format) with opening the database, and measure the lookups. The
+# database is created from the text file in a temporary directory.
+
+from geocode_cache import GeocodeCache
+from utils.utils import *
+import tempfile
+import random
+import time
+
+###  Settings  #################################################################
+config_path = "config.yaml"
+# Count of random lookups measured
+lookup_count = 10000
+################################################################################
+
+def main():
+    config = load_yaml(config_path)
+    txt_path = config["loc_to_coords_path"]
+
+    start = time.time()
+    loc_to_coords = load_dict_from_txt(txt_path)
+    print(f"Text file : {len(loc_to_coords)} entries loaded in " +
+          f"{time.time() - start:.3f} s")
+    queries = list(loc_to_coords.keys())
+    del loc_to_coords
+
+    with tempfile.TemporaryDirectory() as dir_path:
+        db_path = os.path.join(dir_path, "loc_to_coords.db")
+        start = time.time()
+        GeocodeCache(db_path, legacy_path=txt_path).close()
+        print(f"Migration : {time.time() - start:.3f} s, " +
+              f"{os.path.getsize(db_path) / 1e6:.1f} MB")
+
+        start = time.time()
+        cache = GeocodeCache(db_path)
+        print(f"Database : opened in {time.time() - start:.4f} s")
+
+        if len(queries) > 0:
+            sample = random.choices(queries, k=lookup_count)
+            start = time.time()
+            for query in sample:
+                cache.get(query)
+            elapsed = time.time() - start
+            print(f"{lookup_count} lookups in {elapsed:.3f} s " +
+                  f"({1e6 * elapsed / lookup_count:.1f} us/lookup)")
+        cache.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+# Benchmark the data-parallel language identification on CPU : measure the
+# throughput of the pool of workers for several counts of workers.
+
+from lid.pool import ShardedLid
+from utils.utils import *
+import time
+
+###  Settings  #################################################################
+config_path = "config.yaml"
+# Count of sentences of the gsw corpus to classify for each measure
+sentence_count = 2000
+worker_counts = [1, 2, 4, 8]
+################################################################################
+
+def main():
+    config = load_yaml(config_path)
+    with open(config["gsw_corpus_path"], "r", encoding="utf8") as f:
+        sentences = [x.strip() for x in f.readlines()[:sentence_count]]
+    print(f"{len(sentences)} sentences, {os.cpu_count()} cpus")
+
+    base = None
+    for workers in worker_counts:
+        pool = ShardedLid(workers,
+                          threads_per_worker=config["lid_threads_per_worker"],
+                          batch_size=config["lid_worker_batch_size"])
+        # warm up the replicas
+        pool.predict_label(sentences[:workers*config["lid_worker_batch_size"]])
+        start = time.time()
+        pool.predict_label(sentences)
+        elapsed = time.time() - start
+        pool.close()
+        throughput = len(sentences) / elapsed
+        base = throughput if base is None else base
+        print(f"{workers} workers ({pool.threads_per_worker} threads each) : " +
+              f"{throughput:.1f} sentences/s, speedup {throughput/base:.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# Benchmark the sentence splitter on the texts of raw tweets files : measure
+# the throughput of MocySplitter.split_many, and of the original
+# implementation if its module is given (e.g. extracted from git history with
+# 'git show <commit>:phrasal/mocy_splitter.py > /tmp/mocy_splitter_old.py').
+
+from phrasal.mocy_splitter import MocySplitter
+from raw_tweets import iter_lines
+from utils.utils import *
+import importlib.util
+import json
+import time
+
+###  Settings  #################################################################
+config_path = "config.yaml"
+# Maximum count of texts read from the raw tweets files
+max_text_count = 50000
+# Path of the original implementation to compare with, None to skip it
+original_module_path = None
+################################################################################
+
+def load_texts(config):
+    texts = []
+    for key in ["raw_tweets_stream_dir_path", "raw_tweets_search_dir_path"]:
+        dir_path = config[key]
+        if not os.path.exists(dir_path):
+            continue
+        for name in sorted(os.listdir(dir_path)):
+            if name[-4:] != ".txt":
+                continue
+            for line in iter_lines(os.path.join(dir_path, name)):
+                tweet = json.loads(line)
+                text = tweet.get("full_text", tweet.get("text", None))
+                if text:
+                    texts.append(text)
+                if len(texts) >= max_text_count:
+                    return texts
+    return texts
+
+def measure(name, split_many, texts):
+    start = time.time()
+    splits = split_many(texts)
+    elapsed = time.time() - start
+    print(f"{name} : {len(texts)} texts in {elapsed:.3f} s " +
+          f"({len(texts) / elapsed:.0f} texts/s)")
+    return splits
+
+def main():
+    config = load_yaml(config_path)
+    texts = load_texts(config)
+    if len(texts) == 0:
+        print("No raw tweets found")
+        return
+    splitter = MocySplitter()
+    splits = measure("split_many", splitter.split_many, texts)
+
+    if original_module_path is not None:
+        spec = importlib.util.spec_from_file_location("mocy_splitter_original",
+                                                      original_module_path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        original = module.MocySplitter(prefix_file=None)
+        original.nb_prefixes = splitter.nb_prefixes
+        original_splits = measure("original",
+                                  lambda x: [original.split(t) for t in x],
+                                  texts)
+        print("Same sentences : " + str(splits == original_splits))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# Benchmark the overhead of the type checking on the text stages of the
+# filter : the stages (from the extraction of the texts up to the rule-based
+# sentence filter) are applied to a raw tweets file with each typecheck mode.
+# The mode is applied when the modules are imported (see utils/typecheck.py),
+# so each mode is measured in a new process.
+
+import os
+import sys
+import json
+import time
+import subprocess
+
+###  Settings  #################################################################
+config_path = "config.yaml"
+# The raw tweets file, None for the first file of raw_tweets_stream_dir_path
+raw_path = None
+# The modes measured, with the sample rate used by "sample"
+modes = ["on", "sample", "off"]
+sample_rate = 100
+# Count of runs of the stages in each process, the best one is reported
+repeat = 3
+################################################################################
+
+def run_stages(tweet_filter, tweets):
+    """Apply the text stages of TweetFilter._prepare_file to the tweets.
+    Returns the count of sentences kept."""
+    from tweet_filter import TweetFilter
+    from sentence_batch import SentenceBatch
+    tweet_filter.tweets = tweets
+    config = tweet_filter.config
+    batch = SentenceBatch.from_sentences(
+                            TweetFilter._extract_text_from_tweets(tweets))
+    tweet_filter._preprocess_batch(batch)
+    TweetFilter._normalize_batch(batch)
+    batch = tweet_filter._split_batch(batch)
+    TweetFilter._remove_sentences_with_special_chars_batch(batch)
+    TweetFilter._remove_groups_of_special_chars_batch(
+                                batch, config["min_char_special_group"])
+    TweetFilter._remove_sentences_with_special_words_batch(
+                                batch, config["max_special_char_in_word"])
+    TweetFilter._remove_special_duplication_batch(batch)
+    TweetFilter._remove_isolated_special_chars_batch(batch)
+    tweet_filter._filter_valid_sentences_batch(batch)
+    return len(batch)
+
+def child(path):
+    """Measure the stages in the current process, the typecheck mode being
+    given by the environment"""
+    from tweet_filter import TweetFilter
+    from utils.utils import load_yaml
+    config = load_yaml(config_path)
+    # The model is not needed by the text stages
+    config["use_lid_service"] = True
+    config["typecheck_mode"] = os.environ["TYPECHECK_MODE"]
+    config["typecheck_sample_rate"] = sample_rate
+    tweet_filter = TweetFilter(config)
+    tweets = tweet_filter._load_raw_tweets(path)
+    tweets = TweetFilter._extract_sub_tweets(tweets)
+    best = None
+    for _ in range(repeat):
+        start = time.time()
+        count = run_stages(tweet_filter, tweets)
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(json.dumps({"tweets": len(tweets), "sentences": count,
+                      "time": best}))
+
+def main():
+    if len(sys.argv) == 3 and sys.argv[1] == "--child":
+        child(sys.argv[2])
+        return
+    path = raw_path
+    if path is None:
+        from utils.utils import load_yaml
+        dir_path = load_yaml(config_path)["raw_tweets_stream_dir_path"]
+        names = sorted(x for x in os.listdir(dir_path) if x[-4:] == ".txt")
+        if len(names) == 0:
+            print("No raw tweets found")
+            return
+        path = os.path.join(dir_path, names[0])
+    results = dict()
+    for mode in modes:
+        env = dict(os.environ, TYPECHECK_MODE=mode,
+                   TYPECHECK_SAMPLE_RATE=str(sample_rate))
+        output = subprocess.run([sys.executable, "-m",
+                                 "scripts.bench_typecheck", "--child", path],
+                                env=env, check=True, capture_output=True,
+                                text=True).stdout
+        results[mode] = json.loads(output.strip().split("\n")[-1])
+        print(f"{mode:>6} : {results[mode]['time']:.3f} s for " +
+              f"{results[mode]['tweets']} tweets " +
+              f"({results[mode]['sentences']} sentences kept)")
+    if "off" in results:
+        for mode in modes:
+            overhead = results[mode]["time"] / results["off"]["time"] - 1
+            print(f"{mode:>6} : {100 * overhead:+.1f} % compared to off")
+
+if __name__ == "__main__":
+    main()
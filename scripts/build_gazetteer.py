@@ -0,0 +1,84 @@
+# Build the gazetteer of the local forward geocoder (see 'gazetteer_path' in
+# config.yaml) from the official directory of swiss localities and postcodes
+# published by swisstopo ("Amtliches Ortschaftenverzeichnis", csv version with
+# WGS84 coordinates). The gazetteer contains the localities, municipalities,
+# postcodes and cantons, with their coordinates and canton. A name found in
+# several cantons (e.g. "Aesch") is ambiguous and left to locationiq.
+
+import csv
+from collections import defaultdict
+from statistics import mean
+from geocoder import Geocoder
+from gazetteer import Gazetteer
+from utils.utils import *
+
+###  Settings  #################################################################
+config_path = "config.yaml"
+localities_path = "data/AMTOVZ_CSV_WGS84.csv"
+localities_delimiter = ";"
+locality_column = "Ortschaftsname"
+postcode_column = "PLZ"
+municipality_column = "Gemeindename"
+canton_column = "Kantonskürzel"
+lon_column = "E"
+lat_column = "N"
+################################################################################
+
+# Other names of the cantons, in addition to the locationiq spelling
+canton_names = {"ZH": ["Zürich"], "BE": ["Berne"], "LU": ["Lucerne"],
+                "FR": ["Freiburg"], "BS": ["Basel-Stadt", "Bâle-Ville"],
+                "BL": ["Baselland", "Basel-Land"], "SG": ["St. Gallen"],
+                "GR": ["Graubünden", "Grigioni"], "TI": ["Tessin"],
+                "VD": ["Waadt"], "VS": ["Valais", "Wallis"],
+                "NE": ["Neuenburg"], "GE": ["Genf", "Genève", "Ginevra"],
+                "AR": ["Appenzell A.Rh."], "AI": ["Appenzell I.Rh."]}
+
+def main():
+    config = load_yaml(config_path)
+    code_to_state = {Geocoder.state_to_code[x]: x for x in Geocoder.ch_states}
+
+    # Coordinates of each normalized name, by canton code. The cantons are
+    # added only under the names that are not a locality or a municipality.
+    places = defaultdict(lambda: defaultdict(list))
+    cantons = defaultdict(list)
+    with open(localities_path, "r", encoding="utf-8-sig", newline="") as f:
+        for row in csv.DictReader(f, delimiter=localities_delimiter):
+            code = row[canton_column]
+            if code not in code_to_state:
+                continue
+            coords = (float(row[lon_column]), float(row[lat_column]))
+            for column in [locality_column, municipality_column,
+                           postcode_column]:
+                places[Gazetteer.normalize(row[column])][code].append(coords)
+            cantons[code].append(coords)
+
+    entries = dict(places)
+    for code, coords in cantons.items():
+        for name in [code_to_state[code]] + canton_names.get(code, []):
+            key = Gazetteer.normalize(name)
+            if key not in entries:
+                entries[key] = {code: coords}
+
+    rows = []
+    ambiguous_count = 0
+    for key, by_code in sorted(entries.items()):
+        if not key:
+            continue
+        if len(by_code) > 1:
+            ambiguous_count += 1
+            continue
+        code, coords = next(iter(by_code.items()))
+        rows.append([key,
+                     str(round(mean(x[0] for x in coords), 6)),
+                     str(round(mean(x[1] for x in coords), 6)),
+                     code_to_state[code]])
+
+    with open(config["gazetteer_path"], "w", encoding="utf8", newline="") as f:
+        writer = csv.writer(f, delimiter="\t")
+        writer.writerow(["name", "lon", "lat", "state"])
+        writer.writerows(rows)
+    print(f"{len(rows)} entries written to {config['gazetteer_path']}, " +
+          f"{ambiguous_count} ambiguous names skipped")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# Build the boundaries file of the offline reverse geocoder (see
+# 'regions_path' in config.yaml) from :
+#  - the swiss cantons, e.g. swissBOUNDARIES3D from swisstopo, converted to a
+#    GeoJSON file in WGS84 coordinates (lon, lat). Each feature must have the
+#    canton number (1 to 26, in the federal order) in the property given by
+#    canton_number_property.
+#  - the countries, e.g. the admin 0 countries of Natural Earth as a GeoJSON
+#    file, with the ISO country code in the property given by
+#    country_code_property. Switzerland is skipped since it is covered by the
+#    cantons.
+# The polygons are simplified to keep the file small. The reverse geocoder
+# sends the points close to a border to locationiq anyway.
+
+import json
+from geocoder import Geocoder
+from shapely.geometry import shape, mapping
+from utils.utils import *
+
+###  Settings  #################################################################
+config_path = "config.yaml"
+cantons_path = "data/swissboundaries_cantons.geojson"
+canton_number_property = "KANTONSNUM"
+countries_path = "data/ne_countries.geojson"
+country_code_property = "ISO_A2"
+# Tolerance (degrees) used to simplify the polygons
+simplify_tolerance = 0.001
+################################################################################
+
+# The canton codes in the federal order
+canton_codes = ["ZH", "BE", "LU", "UR", "SZ", "OW", "NW", "GL", "ZG", "FR",
+                "SO", "BS", "BL", "SH", "AR", "AI", "SG", "GR", "AG", "TG",
+                "TI", "VD", "VS", "NE", "GE", "JU"]
+
+def load_features(path):
+    with open(path, "r", encoding="utf8") as f:
+        return json.load(f)["features"]
+
+def to_feature(geometry, country_code, state):
+    geometry = geometry.simplify(simplify_tolerance, preserve_topology=True)
+    return {"type": "Feature",
+            "properties": {"country_code": country_code, "state": state},
+            "geometry": mapping(geometry)}
+
+def main():
+    config = load_yaml(config_path)
+    # Spelling of the states used by locationiq
+    code_to_state = {Geocoder.state_to_code[x]: x for x in Geocoder.ch_states}
+
+    # A canton may be made of several features (enclaves)
+    cantons = dict()
+    for feature in load_features(cantons_path):
+        number = int(feature["properties"][canton_number_property])
+        geometry = shape(feature["geometry"])
+        cantons[number] = geometry if number not in cantons \
+                          else cantons[number].union(geometry)
+    features = [to_feature(geometry,
+                           "ch",
+                           code_to_state[canton_codes[number - 1]])
+                for number, geometry in sorted(cantons.items())]
+
+    for feature in load_features(countries_path):
+        country_code = str(feature["properties"][country_code_property])
+        if country_code.upper() == "CH" or country_code == "-99":
+            continue
+        features.append(to_feature(shape(feature["geometry"]),
+                                   country_code.lower(),
+                                   None))
+
+    with open(config["regions_path"], "w", encoding="utf8") as f:
+        json.dump({"type": "FeatureCollection", "features": features}, f)
+    print(f"{len(features)} regions written to {config['regions_path']}")
+
+if __name__ == "__main__":
+    main()
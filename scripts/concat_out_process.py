@@ -16,6 +16,12 @@ def main():
     #_thread.start_new_thread( keep_alive, tuple() )
 
     config = load_yaml("config.yaml")
+    # The geocoding worker also updates the outputs of the filter and the
+    # dirty dataset
+    with file_lock(config["path_dirty_gsw_tweets"] + ".lock"):
+        concat_out_process(config)
+
+def concat_out_process(config):
     dir_path = config["out_dir_tweet_processing"]
 
     print(datetime.datetime.now())
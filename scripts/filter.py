@@ -1,4 +1,5 @@
 from tweet_filter import *
+from lid.loader import load_lid, lid_batches_itself
 from utils.utils import *
 from torch import cuda
 #import _thread
@@ -12,20 +13,29 @@ def main():
     cur_gsw_fetched = dict()
     cur_gsw_fetched["stream"] = 0
     cur_gsw_fetched["search"] = 0
+    # Kept across the runs, such that the geocoding caches stay warm
+    geocoder = Geocoder(config)
+    # The client of the LID service or the pool of workers is kept across the
+    # runs as well, such that the workers do not load the model at each run.
+    # A single model on the gpu is loaded at each run and released after.
+    lid = load_lid(config) if lid_batches_itself(config) else None
     while True:
         current_time = time.time()
         if current_time > base_time + config["time_interval_process"]:
             base_time = current_time
-            tweets = TweetFilter(config)
+            tweets = TweetFilter(config, geocoder, lid)
             tweets.process(cur_gsw_fetched)
-            del(tweets.lid.model)
-            del(tweets.lid.device)
-            del(tweets.lid.config)
-            del(tweets.lid.tokenizer)
-            del(tweets.lid)
-            del(tweets)
-            gc.collect()
-            cuda.empty_cache()
+            if lid_batches_itself(config):
+                del(tweets)
+            else:
+                del(tweets.lid.model)
+                del(tweets.lid.device)
+                del(tweets.lid.config)
+                del(tweets.lid.tokenizer)
+                del(tweets.lid)
+                del(tweets)
+                gc.collect()
+                cuda.empty_cache()
         time.sleep(10)
 
 if __name__ == "__main__":
@@ -0,0 +1,16 @@
+# Start the geocoding worker. It geocodes the user locations queued by the
+# filter when 'deferred_geocoding' is true, and fills in the coordinates of the
+# sentences written with the source "Pending".
+
+from geocode_worker import GeocodeWorker
+from utils.utils import *
+
+def main():
+    config = load_yaml("config.yaml")
+    create_logging_config(os.path.join(config["dir_path_log"],
+                                       "geocode_worker.log"))
+    worker = GeocodeWorker(config)
+    worker.run()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,21 @@
+# Start the local language identification service. The filter scripts will
+# send their sentences to this process instead of loading their own model
+# (see 'use_lid_service' in config.yaml).
+
+from lid.loader import load_local_lid
+from lid.service import LidServer
+from utils.utils import *
+
+def main():
+    config = load_yaml("config.yaml")
+    create_logging_config(os.path.join(config["dir_path_log"],
+                                       "lid_server.log"))
+    lid = load_local_lid(config)
+    server = LidServer(lid,
+                       config["lid_socket_path"],
+                       batch_size=config["lid_service_batch_size"],
+                       max_delay=config["lid_service_max_delay"])
+    server.serve_forever()
+
+if __name__ == "__main__":
+    main()
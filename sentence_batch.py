@@ -0,0 +1,110 @@
+from typing import Callable, Iterable, List, Tuple
+
+
+class SentenceBatch:
+    """The sentences going through the text stages of the filter, stored by
+    columns: the index of the tweet of each sentence, its text, its position
+    in the split of the tweet text and a keep mask.
+
+    Filters clear bits of the mask instead of building a new list, and
+    transforms rewrite the texts of the kept slots in place. Only splitting
+    a text into sentences creates a new batch.
+
+    Parameters
+        indices | List[int]
+            The index of the tweet of each sentence
+        texts | List[str]
+            The texts
+        positions | List[int]
+            The position of each sentence in the split of its tweet text.
+            Default to 0 for all the sentences (texts not split yet).
+    """
+
+    def __init__(self, indices, texts, positions=None):
+        if len(indices) != len(texts) \
+        or (positions is not None and len(positions) != len(texts)):
+            raise ValueError("The columns of a batch must have the same size")
+        self.indices = list(indices)
+        self.texts = list(texts)
+        self.positions = list(positions) if positions is not None \
+                         else [0] * len(self.texts)
+        self.keep = bytearray(b"\x01") * len(self.texts)
+        self.kept_count = len(self.texts)
+
+    @staticmethod
+    def from_sentences(sentences: List[Tuple[int, str]]) -> "SentenceBatch":
+        """Build a batch from a list of tuples (index, text)"""
+        return SentenceBatch([x[0] for x in sentences],
+                             [x[1] for x in sentences])
+
+    def to_sentences(self) -> List[Tuple[int, str]]:
+        """Returns the kept sentences as a list of tuples (index, text)"""
+        return [(self.indices[i], self.texts[i]) for i in self.slots()]
+
+    def __len__(self):
+        """The count of kept sentences"""
+        return self.kept_count
+
+    def slots(self) -> List[int]:
+        """Returns the positions of the kept sentences in the columns"""
+        if self.kept_count == len(self.texts):
+            return list(range(len(self.texts)))
+        return [i for i, keep in enumerate(self.keep) if keep]
+
+    def kept_texts(self) -> List[str]:
+        """Returns the texts of the kept sentences"""
+        if self.kept_count == len(self.texts):
+            return list(self.texts)
+        return [self.texts[i] for i in self.slots()]
+
+    def transform(self, f: Callable[[str], str]):
+        """Apply a function to the text of each kept sentence"""
+        texts = self.texts
+        for i in self.slots():
+            texts[i] = f(texts[i])
+
+    def transform_many(self, f: Callable[[List[str]], List[str]]):
+        """Apply a function to the list of the texts of the kept sentences,
+        e.g. a batch variant of a transform"""
+        slots = self.slots()
+        texts = self.texts
+        for i, text in zip(slots, f([texts[i] for i in slots])):
+            texts[i] = text
+
+    def filter(self, predicate: Callable[[str], bool]):
+        """Drop the kept sentences whose text does not satisfy the predicate"""
+        texts = self.texts
+        for i in self.slots():
+            if not predicate(texts[i]):
+                self.keep[i] = 0
+                self.kept_count -= 1
+
+    def filter_many(self, predicate: Callable[[List[str]], Iterable[bool]]):
+        """Drop the kept sentences for which a function of the list of the
+        texts of the kept sentences returns False"""
+        slots = self.slots()
+        texts = self.texts
+        for i, ok in zip(slots, predicate([texts[i] for i in slots])):
+            if not ok:
+                self.keep[i] = 0
+                self.kept_count -= 1
+
+    def split(self, split_many: Callable[[List[str]], List[List[str]]]) \
+                                                        -> "SentenceBatch":
+        """Split the text of each kept sentence into sentences. Returns a new
+        batch where each sentence keeps the index of its tweet, and records
+        its position in the split.
+
+        Parameters
+            split_many | Callable[[List[str]], List[List[str]]]
+                Returns the sentences of each text of a list
+        """
+        slots = self.slots()
+        indices, texts, positions = [], [], []
+        for i, split in zip(slots, split_many([self.texts[i] for i in slots])):
+            index = self.indices[i]
+            for position, text in enumerate(split):
+                indices.append(index)
+                texts.append(text)
+                positions.append(position)
+        return SentenceBatch(indices, texts, positions)
@@ -0,0 +1,176 @@
+# Vectorized geometry used by the geocoder : point-in-polygon tests on arrays
+# of coordinates, centroids of bounding boxes, and the offline reverse geocoder mapping coordinates to a
+# (country code, state) pair from a file of boundary polygons, indexed by an STRtree.
+
+import json
+import numpy as np
+from typing import List, Tuple
+from shapely.geometry import shape
+
+try:
+    # shapely >= 2.0
+    from shapely import contains_xy, prepare, points, STRtree
+except ImportError:
+    from shapely.vectorized import contains as contains_xy
+    # The STRtree of shapely 1.x cannot query arrays of points, the regions
+    # are then all tested after a bounding box prefilter
+    prepare = points = STRtree = None
+
+
+def points_in_polygon(polygon, lons, lats, bounds=None) -> np.ndarray:
+    """Returns a boolean array telling which points (lons[i], lats[i]) lie in
+    the polygon. The points outside the bounding box of the polygon are
+    discarded first, the others are tested in a single vectorized call.
+
+    Parameters
+        polygon | shapely geometry
+            The polygon, or multipolygon
+        lons, lats | array-like of float
+            The coordinates of the points
+        bounds | Tuple[float]
+            The box (min_lon, min_lat, max_lon, max_lat) used as prefilter.
+            Default to the bounds of the polygon.
+    """
+    lons = np.asarray(lons, dtype=float)
+    lats = np.asarray(lats, dtype=float)
+    min_lon, min_lat, max_lon, max_lat = bounds if bounds is not None \
+                                         else polygon.bounds
+    inside = np.zeros(len(lons), dtype=bool)
+    candidates = np.nonzero((lons >= min_lon) & (lons <= max_lon) &
+                            (lats >= min_lat) & (lats <= max_lat))[0]
+    if len(candidates) > 0:
+        inside[candidates] = contains_xy(polygon, lons[candidates],
+                                         lats[candidates])
+    return inside
+
+
+def bbox_centroids(rings) -> Tuple[np.ndarray, np.ndarray]:
+    """Returns the centers (lons, lats) of the bounding boxes of a list of
+    rings, e.g. the bounding boxes of twitter places. The center of a ring is
+    the middle of its extreme longitudes and latitudes.
+
+    Parameters
+        rings | List[List[List[float]]]
+            The rings, each one a non-empty list of points [lon, lat]
+    """
+    if len(rings) == 0:
+        return np.zeros(0), np.zeros(0)
+    lengths = np.array([len(x) for x in rings])
+    offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    points = np.array([point[:2] for ring in rings for point in ring],
+                      dtype=float)
+    lons = (np.minimum.reduceat(points[:,0], offsets) +
+            np.maximum.reduceat(points[:,0], offsets)) / 2
+    lats = (np.minimum.reduceat(points[:,1], offsets) +
+            np.maximum.reduceat(points[:,1], offsets)) / 2
+    return lons, lats
+
+
+class Region:
+    """A region of the reverse geocoder, i.e. a swiss canton or a country
+
+    Parameters
+        country_code | str
+            The lowercase country code, as returned by locationiq
+        state | str
+            The state with the locationiq spelling, or None for a country
+        geometry | shapely geometry
+            The boundaries of the region
+        border_margin | float
+            The distance (in degrees) to the border under which a point is
+            considered ambiguous
+    """
+
+    def __init__(self, country_code, state, geometry, border_margin):
+        self.country_code = country_code
+        self.state = state
+        self.geometry = geometry
+        self.border = geometry.boundary.buffer(border_margin)
+        if prepare is not None:
+            prepare(self.geometry)
+            prepare(self.border)
+        self.bounds = self.border.bounds
+
+
+class ReverseGeocoder:
+    """Offline reverse geocoder, mapping coordinates to (country code, state)
+    from boundary polygons.
+
+    The polygons are read from a GeoJSON file where each feature has the
+    properties 'country_code' and 'state' (see scripts/build_regions.py). A
+    point lying in no region, or closer to a border than 'border_margin', is
+    reported as uncertain : the boundaries are simplified, so these points
+    should be sent to the locationiq reverse geocoder instead.
+
+    The file holds every country, so the regions are indexed by an STRtree of
+    their bounding boxes (border margin included) : a batch of points is
+    queried at once, and each region only tests the points of its box.
+
+    Parameters
+        path | str
+            The path of the GeoJSON file
+        border_margin | float
+            The distance (in degrees) to a border under which a point is
+            uncertain
+    """
+
+    def __init__(self, path, border_margin=0.005):
+        with open(path, "r", encoding="utf8") as f:
+            features = json.load(f)["features"]
+        self.regions = [Region(x["properties"]["country_code"],
+                               x["properties"].get("state", None),
+                               shape(x["geometry"]),
+                               border_margin)
+                        for x in features]
+        self.tree = None
+        if STRtree is not None:
+            self.tree = STRtree([x.border.envelope for x in self.regions])
+
+    def _candidates(self, lons, lats):
+        """Returns, for each region whose box contains points, the region
+        index and the indices of these points"""
+        if self.tree is None:
+            everything = np.arange(len(lons))
+            return [(i, everything) for i in range(len(self.regions))]
+        point_indices, region_indices = self.tree.query(points(lons, lats))
+        order = np.argsort(region_indices, kind="stable")
+        point_indices = point_indices[order]
+        region_indices = region_indices[order]
+        starts = np.flatnonzero(np.diff(region_indices, prepend=-1))
+        return [(int(region_indices[left]), point_indices[left:right])
+                for left, right in zip(starts,
+                                       np.append(starts[1:],
+                                                 len(region_indices)))]
+
+    def lookup(self, lons, lats) -> Tuple[List[Tuple[str, str]], np.ndarray]:
+        """Reverse geocode arrays of coordinates.
+
+        Returns
+            List[Tuple[str, str]]
+                The (country code, state) of each point, (None, None) if the
+                point lies in no region
+            np.ndarray
+                A boolean array, True for the uncertain points
+        """
+        lons = np.asarray(lons, dtype=float)
+        lats = np.asarray(lats, dtype=float)
+        region_indices = np.full(len(lons), -1)
+        uncertain = np.zeros(len(lons), dtype=bool)
+        if len(lons) == 0:
+            return [], uncertain
+        # By increasing region index, such that a point inside several
+        # regions gets the first one of the file
+        for i, candidates in self._candidates(lons, lats):
+            region = self.regions[i]
+            inside = points_in_polygon(region.geometry, lons[candidates],
+                                       lats[candidates], region.bounds)
+            near_border = points_in_polygon(region.border, lons[candidates],
+                                            lats[candidates], region.bounds)
+            unassigned = region_indices[candidates] == -1
+            region_indices[candidates[inside & unassigned]] = i
+            uncertain[candidates[near_border]] = True
+        uncertain |= region_indices == -1
+        results = [(None, None) if i == -1
+                   else (self.regions[i].country_code, self.regions[i].state)
+                   for i in region_indices]
+        return results, uncertain
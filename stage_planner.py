@@ -0,0 +1,116 @@
+import os
+import json
+from typing import List, Optional
+from phrasal.pattern_sentence_filter import RuleStats
+
+
+class StagePlanner:
+    """Orders the filter stages of the pipeline, i.e. the stages that drop
+    sentences without changing them (e.g. the language identification).
+
+    The count of sentences each stage receives, the count it drops and the time
+    it takes are recorded, and kept from one run to the next in a json file. In
+    the "auto" mode, the stages are run by increasing time per dropped sentence,
+    such that the cheap and selective stages shrink the input of the expensive
+    ones, as done for the rules of the pattern sentence filter (see RuleStats).
+    Until every stage has been measured, the default order is used.
+
+    Parameters
+        stages | List[str]
+            The names of the stages, in the default order (cheapest first)
+        order | Union[str, List[str]]
+            "auto", or the names of the stages in a fixed order. The stages
+            missing from the list are run last, in the default order.
+        stats_path | str
+            The json file of the statistics of the stages. Nothing is kept
+            from one run to the next if None.
+        constraints | List[Tuple[str, str]]
+            Pairs of stages (a, b) where a must run before b whatever the
+            order, e.g. if a only acts on the sentences b did not see yet
+    """
+
+    def __init__(self, stages, order="auto", stats_path=None,
+                 constraints=()):
+        self.stages = list(stages)
+        self.constraints = list(constraints)
+        unknown = [x for pair in self.constraints for x in pair
+                   if x not in self.stages]
+        if len(unknown) > 0:
+            raise ValueError("Unknown stages " + ", ".join(unknown) +
+                             " in the constraints")
+        if order == "auto":
+            self.fixed_order = None
+        elif isinstance(order, (list, tuple)):
+            unknown = [x for x in order if x not in self.stages]
+            if len(unknown) > 0:
+                raise ValueError("Unknown stages " + ", ".join(unknown) +
+                                 ", expected " + ", ".join(self.stages))
+            self.fixed_order = list(dict.fromkeys(order)) + \
+                               [x for x in self.stages if x not in order]
+        else:
+            raise ValueError("The stage order must be \"auto\" or a list of " +
+                             "stage names, got " + repr(order))
+        self.stats_path = stats_path
+        self.stats = {x: RuleStats() for x in self.stages}
+        if stats_path is not None and os.path.exists(stats_path):
+            with open(stats_path, "r") as f:
+                saved = json.load(f)
+            for name, stats in saved.items():
+                if name in self.stats:
+                    self.stats[name] = RuleStats.from_dict(stats)
+
+    def order(self, available: Optional[List[str]] = None) -> List[str]:
+        """Returns the stages in the order they should be run.
+
+        Parameters
+            available | List[str]
+                The stages enabled, all of them if None
+        """
+        if available is None:
+            available = self.stages
+        if self.fixed_order is not None:
+            order = self.fixed_order
+        elif any(self.stats[x].calls == 0 for x in available):
+            order = self.stages
+        else:
+            # sorted is stable, the default order breaks the ties
+            order = sorted(self.stages, key=lambda x: self.stats[x].rank())
+        return self._constrain([x for x in order if x in available])
+
+    def _constrain(self, order):
+        """Move the stages of an order as little as possible such that the
+        constraints hold : each position takes the first remaining stage
+        whose predecessors are placed"""
+        remaining = list(order)
+        constrained = []
+        while len(remaining) > 0:
+            for stage in remaining:
+                if all(a in constrained or a not in remaining
+                       for a, b in self.constraints if b == stage):
+                    break
+            else:
+                raise ValueError("The stage constraints contain a cycle")
+            remaining.remove(stage)
+            constrained.append(stage)
+        return constrained
+
+    def record(self, stage: str, count: int, kept: int, elapsed: float):
+        """Record a run of a stage, which received 'count' sentences and
+        kept 'kept' of them in 'elapsed' seconds"""
+        self.stats[stage].add(elapsed, count, count - kept, calls=count)
+
+    def report(self) -> List[dict]:
+        """Returns the statistics of the stages, in the current order"""
+        return [dict(stage=x, **self.stats[x].to_dict())
+                for x in self.order()]
+
+    def save(self):
+        """Write the statistics to stats_path"""
+        if self.stats_path is None:
+            return
+        # Written to a temporary file first, such that a partially written
+        # file is never loaded
+        with open(self.stats_path + ".tmp", "w") as f:
+            json.dump({x: self.stats[x].to_dict() for x in self.stages}, f,
+                      indent=2)
+        os.replace(self.stats_path + ".tmp", self.stats_path)
@@ -0,0 +1,43 @@
+import os
+import pytest
+from lid.pool import *
+
+class FakeLid:
+    def predict_label(self, sentences):
+        if "crash" in sentences:
+            # e.g. killed by the out of memory killer
+            os._exit(1)
+        if "fail" in sentences:
+            raise ValueError("cannot predict")
+        return [float(len(x)) for x in sentences]
+
+def load_fake_lid():
+    return FakeLid()
+
+@pytest.fixture(scope="module")
+def pool():
+    pool = ShardedLid(3, threads_per_worker=1, batch_size=2,
+                      model_factory=load_fake_lid, poll_interval=0.1)
+    yield pool
+    pool.close()
+
+def test_predict_label_keeps_order(pool):
+    sentences = ["x" * n for n in [5, 1, 9, 3, 3, 7, 2, 8, 4]]
+    assert(pool.predict_label(sentences) ==
+           [5.0, 1.0, 9.0, 3.0, 3.0, 7.0, 2.0, 8.0, 4.0])
+    assert(pool.predict_label([]) == [])
+    # The pool can be used several times
+    assert(pool.predict_label(["ab"]) == [2.0])
+
+def test_failed_batch(pool):
+    with pytest.raises(Exception, match="cannot predict"):
+        pool.predict_label(["fail", "a", "b", "c", "d", "e", "f", "g"])
+    # The batches left from the failed job are not mixed with the next one
+    assert(pool.predict_label(["abc", "de"]) == [3.0, 2.0])
+
+def test_dead_worker(pool):
+    with pytest.raises(Exception, match="died"):
+        pool.predict_label(["crash", "a"])
+    # The pool was started again
+    assert(len(pool.processes) == 3)
+    assert(pool.predict_label(["abc", "de"]) == [3.0, 2.0])
@@ -0,0 +1,63 @@
+import pytest
+import os
+import tempfile
+import threading
+import time
+from lid.service import *
+
+class FakeLid:
+    """Predict the length of each sentence and record the batches received"""
+
+    def __init__(self):
+        self.batches = []
+
+    def predict_label(self, sentences):
+        self.batches.append(list(sentences))
+        return [float(len(x)) for x in sentences]
+
+@pytest.fixture
+def service():
+    lid = FakeLid()
+    socket_path = os.path.join(tempfile.mkdtemp(), "lid.sock")
+    server = LidServer(lid, socket_path, batch_size=4, max_delay=0.2)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    while server.server is None or not os.path.exists(socket_path):
+        time.sleep(0.01)
+    yield lid, socket_path
+    server.shutdown()
+
+def test_predict_label(service):
+    lid, socket_path = service
+    client = LidClient(socket_path, timeout=10)
+    assert(client.predict_label([]) == [])
+    sentences = ["a", "bb", "ccc", "dddd", "eeeee", "ffffff"]
+    assert(client.predict_label(sentences) == [1.0, 2.0, 3.0, 4.0, 5.0, 6.0])
+    # The batches given to the model never exceed the batch size
+    assert(all(len(batch) <= 4 for batch in lid.batches))
+    client.close()
+
+def test_requests_are_coalesced(service):
+    lid, socket_path = service
+    results = dict()
+
+    def run(i):
+        client = LidClient(socket_path, timeout=10)
+        results[i] = client.predict_label(["x" * i])
+        client.close()
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(1, 4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert(results == {1: [1.0], 2: [2.0], 3: [3.0]})
+    # The three requests arrived within max_delay, they share a single batch
+    assert(len(lid.batches) == 1)
+
+def test_service_not_running():
+    socket_path = os.path.join(tempfile.mkdtemp(), "lid.sock")
+    client = LidClient(socket_path, timeout=10)
+    with pytest.raises(ConnectionError):
+        client.predict_label(["a"])
+    assert(client.sock is None)
@@ -0,0 +1,35 @@
+import json
+import pytest
+from phrasal.mocy_splitter import *
+
+# Texts (the test tweets, hand written cases and random combinations of
+# tricky tokens) along with their sentences as split by the original
+# implementation, for each value of 'more' and 'keep_newlines'
+golden_path = "tests/phrasal/data/mocy_splitter_golden.jsonl"
+
+@pytest.fixture(scope="module")
+def golden():
+    with open(golden_path, "r", encoding="utf8") as f:
+        return [json.loads(line) for line in f]
+
+@pytest.mark.parametrize("more", [True, False])
+@pytest.mark.parametrize("keep_newlines", [True, False])
+def test_split_golden(golden, more, keep_newlines):
+    splitter = MocySplitter()
+    key = f"more={more},keep_newlines={keep_newlines}"
+    for entry in golden:
+        assert(splitter.split(entry["text"], more, keep_newlines)
+               == entry["sentences"][key]), entry["text"]
+
+def test_split_many(golden):
+    splitter = MocySplitter()
+    texts = [x["text"] for x in golden]
+    assert(splitter.split_many(texts)
+           == [x["sentences"]["more=True,keep_newlines=True"] for x in golden])
+
+@pytest.mark.parametrize("text, expected",
+    [("Mr. Smith isch da. Er chunt morn.", ["Mr. Smith isch da.", "Er chunt morn."]),
+     ("Es git 3.5 Mio. Lüt. Krass.", ["Es git 3.5 Mio. Lüt.", "Krass."]),
+     ("Was?! nei", ["Was?!", "nei"])])
+def test_split(text, expected):
+    assert(MocySplitter().split(text) == expected)
@@ -0,0 +1,45 @@
+import json
+import pytest
+from phrasal.multi_replace import *
+from preprocessing.cleaner import Cleaner
+
+@pytest.mark.parametrize("replacements, text, expected",
+    [({"ab": "x", "abc": "y", "bcd": "z"}, "abcd", "yd"),
+     ({"ab": "x", "abc": "y"}, "ababc abd", "xy xd"),
+     ({"a": "1", "b": "2"}, "abba", "1221"),
+     ({"aa": "b"}, "aaa", "ba"),
+     ({"^^": " ", "^^'": " "}, "yes ^^' ^^", "yes    "),
+     ({"\\o/": "\\"}, "\\o/\\o/", "\\\\"),
+     ({}, "abc", "abc")])
+def test_replace(replacements, text, expected):
+    replacer = MultiReplacer(replacements)
+    assert(replacer.replace(text) == expected)
+    assert(replacer.replace_many([text, text]) == [expected, expected])
+
+def test_first_replacement_wins():
+    assert(MultiReplacer([("a", "1"), ("a", "2")]).replace("a") == "1")
+    with pytest.raises(ValueError):
+        MultiReplacer([("", "x")])
+
+def test_documented_differences():
+    # The replacements are not scanned again
+    assert(MultiReplacer([("<3", " "), (" XD", " ")]).replace("<3XD")
+           == " XD")
+    # Overlapping literals: the leftmost one wins, then the longest
+    assert(MultiReplacer([("bc", "x"), ("abc", "y")]).replace("abcd") == "yd")
+    assert(MultiReplacer([("bcd", "x"), ("ab", "y")]).replace("abcd") == "ycd")
+
+def test_cleaner_same_as_sequential():
+    with open("tests/phrasal/data/norm_punc_golden.jsonl", "r",
+              encoding="utf8") as f:
+        texts = [json.loads(line)["text"] for line in f]
+    texts += ["hey &gt bye &amp;", "yes ^^ -.- <3 \\o/ ^^'", "(ツ) -\\_(ツ)_/-"]
+    for text in texts:
+        expected = text
+        for x in Cleaner.html_entities:
+            expected = expected.replace(x, " ")
+        assert(Cleaner.remove_html_entities(text) == expected)
+        expected = text
+        for x in Cleaner.smileys:
+            expected = expected.replace(x, " ")
+        assert(Cleaner.smileys_replacer.replace(text) == expected)
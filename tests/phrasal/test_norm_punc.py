@@ -0,0 +1,40 @@
+import json
+import pytest
+from phrasal.norm_punc import *
+from phrasal.norm_punc import compile_plan, STR
+
+# Texts (tweets, hand written cases and random strings of the characters
+# handled by the patterns) along with their normalization by the original
+# implementation, applying the patterns one after the other
+golden_path = "tests/phrasal/data/norm_punc_golden.jsonl"
+
+@pytest.fixture(scope="module")
+def golden():
+    with open(golden_path, "r", encoding="utf8") as f:
+        return [json.loads(line) for line in f]
+
+def test_normalize_text_golden(golden):
+    for entry in golden:
+        assert(normalize_text(entry["text"]) == entry["normalized"])
+        assert(normalize_text(entry["text"], strip_emojis=True)
+               == entry["normalized_no_emojis"])
+
+def test_normalize_many(golden):
+    texts = [x["text"] for x in golden]
+    assert(normalize_many(texts, strip_emojis=True)
+           == [x["normalized_no_emojis"] for x in golden])
+
+@pytest.mark.parametrize("patterns, text",
+    [([(STR, "ab", "x"), (STR, "b", "y")], "abb"),
+     ([(STR, "a", "b"), (STR, "bc", "z")], "ac"),
+     ([(STR, "-", ""), (STR, "ab", "z")], "a-b"),
+     ([(STR, "a", "b"), (STR, "c", "d"), (STR, "b", "e")], "abc")])
+def test_compile_plan_order(patterns, text):
+    # Rules that don't commute must still be applied in order
+    expected = text
+    for _, pattern, replace in patterns:
+        expected = expected.replace(pattern, replace)
+    result = text
+    for step in compile_plan(patterns):
+        result = step(result)
+    assert(result == expected)
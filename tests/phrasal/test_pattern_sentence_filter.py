@@ -0,0 +1,99 @@
+import json
+import pytest
+from phrasal.pattern_sentence_filter import *
+
+golden_path = "tests/phrasal/data/mocy_splitter_golden.jsonl"
+
+@pytest.fixture(scope="module")
+def sentences():
+    # The sentences of the splitter golden file (tweets and hand written cases)
+    result = []
+    with open(golden_path, "r", encoding="utf8") as f:
+        for line in f:
+            entry = json.loads(line)
+            result.extend(entry["sentences"]["more=False,keep_newlines=False"])
+    return result
+
+def test_plan_same_result(sentences):
+    reference = PatternSentenceFilter()
+    expected = [reference.is_valid(s) for s in sentences]
+    filterer = PatternSentenceFilter()
+    filterer.plan(sentences[:200])
+    assert(sorted(r.id for r in filterer.rules.rules)
+           == list(range(1, len(filterer.rules) + 1)))
+    assert([filterer.is_valid(s) for s in sentences] == expected)
+
+def test_adaptive_same_result(sentences):
+    reference = PatternSentenceFilter()
+    expected = [reference.is_valid(s) for s in sentences]
+    filterer = PatternSentenceFilter(adaptive=True, replan_interval=50)
+    assert([filterer.is_valid(s) for s in sentences] == expected)
+    assert(sum(x.calls for x in filterer.rules.stats.values()) > 0)
+
+def test_plan_order():
+    rules = Rules([{"descr": "never", "find": {"pattern": "z", "count": {"max": 5}}},
+                   {"descr": "short", "length": {"min": 3}}])
+    rules.plan(["a", "ab", "abc", "abcd"])
+    assert([r.descr for r in rules.rules] == ["short", "never"])
+    assert(rules.stats[2].rejections == 2)
+    assert(rules.stats[1].rejections == 0)
+
+@pytest.mark.parametrize("find",
+    [{"pattern": "a", "count": {"max": 2}},
+     {"pattern": "a", "count": {"min": 2}},
+     {"pattern": "a", "count": {"min": 1, "max": 3}},
+     {"pattern": "a", "ratio": {"max": 0.3}},
+     {"pattern": "a", "ratio": {"min": 0.25}},
+     {"pattern": "a", "count": {"max": 4}, "ratio": {"min": 0.1, "max": 0.5}},
+     {"pattern": "(a )?", "count": {"max": 2}}])
+def test_find_early_stop(find):
+    # Counting stops once the result is known, the result is the same as with
+    # all the matches
+    rule = Find(**find)
+    for text in ["", "b", "a", "aa", "ab", "aab", "a a a", "bbbbaaaa",
+                 "abababababab", "aaaaaaaaaa", "b" * 9 + "a" * 3]:
+        nb_matches = len(rule.pattern.findall(text))
+        expected = (rule.count is not None
+                    and rule.count.is_out_of_range(nb_matches)) \
+                   or (rule.ratio is not None and len(text) > 0
+                       and rule.ratio.is_out_of_range(nb_matches / len(text)))
+        if rule.ratio is not None and len(text) == 0:
+            # The ratio of an empty text is 0
+            expected = rule.count is not None \
+                       and rule.count.is_out_of_range(nb_matches) \
+                       or rule.ratio.is_out_of_range(0)
+        assert(rule.is_invalid(text) == expected)
+
+def test_plan_empty_sentence():
+    reference = PatternSentenceFilter()
+    expected = [reference.is_valid(s) for s in ["", "Das isch e guete Satz mit vilne Wörter"]]
+    filterer = PatternSentenceFilter()
+    filterer.plan(["Das isch e guete Satz mit vilne Wörter", ""])
+    assert([filterer.is_valid(s) for s in ["", "Das isch e guete Satz mit vilne Wörter"]] == expected)
+
+def test_empty_sentence_any_order():
+    filterer = PatternSentenceFilter()
+    expected = filterer.is_valid("")
+    # A ratio rule first, before the length and word count rules
+    spaces = [r for r in filterer.rules.rules if r.descr == "too many or not enough spaces"]
+    assert(len(spaces) == 1)
+    filterer.rules.rules.remove(spaces[0])
+    filterer.rules.rules.insert(0, spaces[0])
+    assert(filterer.is_valid("") == expected)
+    filterer.rules.rules.reverse()
+    assert(filterer.is_valid("") == expected)
+
+def test_profile_report(tmp_path):
+    rules = Rules([{"descr": "short", "length": {"min": 3}},
+                   {"descr": "no z", "if": {"length": {"max": 3}},
+                    "find": {"pattern": "z", "count": {"max": 0}}}],
+                  profile=True)
+    results = [rules.is_invalid(s) for s in ["a", "abz", "abcz", "abc"]]
+    assert(results == [True, True, False, False])
+    report = rules.report()
+    assert([(x["descr"], x["calls"], x["applicable"], x["rejections"])
+            for x in report] == [("short", 4, 4, 1), ("no z", 3, 2, 1)])
+    path = str(tmp_path / "report.json")
+    rules.save_report(path)
+    with open(path) as f:
+        assert(json.load(f) == report)
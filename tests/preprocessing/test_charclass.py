@@ -0,0 +1,76 @@
+import json
+import random
+import pytest
+from preprocessing.charclass import *
+from preprocessing.cleaner import Cleaner
+
+# The original implementations, character by character
+def reference_remove_not_good_chars(sentence, good_chars):
+    for c in set(sentence):
+        if c not in good_chars:
+            sentence = sentence.replace(c, " ")
+    return sentence
+
+def reference_remove_special_chars(sentence, special_chars):
+    for c in set(sentence):
+        if c in special_chars:
+            sentence = sentence.replace(c, " ")
+    return sentence
+
+def reference_remove_groups_of_special_chars(sentence, from_size, special):
+    final_words = []
+    for word in Cleaner.clean_spaces(sentence).split():
+        special_count = len([c for c in word if c in special])
+        if special_count < from_size or len(word) != special_count:
+            final_words.append(word)
+    return ' '.join(final_words)
+
+def reference_has_special_word(sentence, chars_ok, max_char):
+    return any(len([c for c in word if c not in chars_ok]) > max_char
+               for word in sentence.split())
+
+@pytest.fixture(scope="module")
+def texts():
+    with open("tests/phrasal/data/norm_punc_golden.jsonl", "r",
+              encoding="utf8") as f:
+        texts = [json.loads(line)["text"] for line in f]
+    rng = random.Random(0)
+    alphabet = "aZé9 \t\n-#@[]{}<>=^\\_~°²€|*ü🙂 ,.?!&"
+    texts += ["".join(rng.choice(alphabet) for _ in range(rng.randint(0, 30)))
+              for _ in range(2000)]
+    return texts
+
+def test_char_class_sets():
+    assert(GOOD_CHARS.chars == Cleaner.good_chars)
+    assert("\\" in GOOD_CHARS and "#" not in GOOD_CHARS)
+    assert(len(CharClass("")) == 0)
+    assert(CharClass("").replace_others("ab") == "  ")
+    assert(CharClass("ab").replace("abc", "\\") == "\\\\c")
+
+def test_equivalence(texts):
+    for text in texts:
+        assert(Cleaner.remove_not_good_chars(text, set(LOCATION_CHARS))
+               == reference_remove_not_good_chars(text, LOCATION_CHARS.chars))
+        assert(Cleaner.remove_special_chars(text)
+               == reference_remove_special_chars(text, SPECIAL_CHARS.chars))
+        for from_size in [0, 1, 2, 3]:
+            assert(Cleaner.remove_groups_of_special_chars(text, from_size)
+                   == reference_remove_groups_of_special_chars(
+                                text, from_size, GROUP_SPECIAL_CHARS.chars))
+        assert(Cleaner.remove_special_words(text)
+               == ' '.join(x for x in text.split()
+                           if set(x) <= Cleaner.good_chars))
+        assert(GOOD_CHARS.contains_only(text)
+               == (len(set(text).difference(Cleaner.good_chars)) == 0))
+        assert(WORD_CHARS.count(text)
+               == len([c for c in text if c in WORD_CHARS.chars]))
+
+def test_batch_variants(texts):
+    assert(GOOD_CHARS.contains_only_many(texts)
+           == [GOOD_CHARS.contains_only(x) for x in texts])
+    assert(WORD_CHARS.count_others_many(texts)
+           == [WORD_CHARS.count_others(x) for x in texts])
+    assert(SPECIAL_CHARS.replace_many(texts, "_")
+           == [SPECIAL_CHARS.replace(x, "_") for x in texts])
+    assert(LOCATION_CHARS.replace_others_many(texts)
+           == [LOCATION_CHARS.replace_others(x) for x in texts])
@@ -0,0 +1,49 @@
+import re
+import pytest
+from ch_words_index import *
+from utils.utils import heavy_normalize_text
+
+ch_words_path = "data/ch_words.txt"
+
+def get_ch_location_regex(ch_words, location_field):
+    """The previous implementation, a regex search for each CH word"""
+    location_field_norm = heavy_normalize_text(location_field)
+    for ch_word in ch_words:
+        ch_word_norm = heavy_normalize_text(ch_word)
+        if re.search(r"(^|\W)" + ch_word_norm + r"(\W|$)",
+                     location_field_norm):
+            return ch_word
+    return None
+
+@pytest.mark.parametrize("text",
+    ["I LIVE in >>>Goûmoens'la-ville<<< !!!",
+     "6.1376, 47.1376",
+     "Zürich, Schweiz",
+     "St. Gallen / Bern",
+     "Basel-Land und Luzern",
+     "8000 zurich",
+     "Switzerland",
+     "Berner Oberland",
+     "",
+     "   "])
+def test_find_same_as_regex(text):
+    ch_words = ChWordsIndex.read_ch_words(ch_words_path)
+    index = ChWordsIndex(ch_words)
+    assert(index.find(text) == get_ch_location_regex(ch_words, text))
+
+def test_find_first_word():
+    index = ChWordsIndex(["Basel Land", "Land", "Basel"])
+    assert(index.find("basel-land!") == "Basel Land")
+    assert(index.find("Land of Basel") == "Land")
+    assert(index.find("Baselland") is None)
+
+def test_load(tmp_path):
+    index_path = str(tmp_path / "index.pkl")
+    words_path = tmp_path / "ch_words.txt"
+    words_path.write_text("Bern\nZug\tcanton\n", encoding="utf8")
+    index = ChWordsIndex.load(str(words_path), index_path)
+    assert(index.ch_words == ["Bern", "Zug"])
+    assert(ChWordsIndex.load(str(words_path), index_path).find("zug") == "Zug")
+    # The index is built again when the CH words change
+    words_path.write_text("Bern\nZug\tcanton\nUri\n", encoding="utf8")
+    assert(ChWordsIndex.load(str(words_path), index_path).find("uri") == "Uri")
@@ -0,0 +1,23 @@
+import pytest
+from fuzzy_matcher import *
+
+@pytest.mark.parametrize("a, b, max_distance, expected",
+    [("zurich", "zurich", 2, 0),
+     ("zureich", "zurich", 2, 1),
+     ("st gallen", "sankt gallen", 1, 2),
+     ("lausanne", "luzern", 2, 3)])
+def test_bounded_levenshtein(a, b, max_distance, expected):
+    assert(bounded_levenshtein(a, b, max_distance) == expected)
+
+def test_match():
+    matcher = FuzzyMatcher(threshold=0.8, min_length=5)
+    for key in ["zurich", "winterthur", "lausanne", "bern"]:
+        matcher.add(key, key.upper())
+    assert(len(matcher) == 3)
+    key, value, similarity = matcher.match("zureich")
+    assert((key, value) == ("zurich", "ZURICH"))
+    assert(similarity == pytest.approx(1 - 1/7))
+    assert(matcher.match("winterthur")[2] == 1.0)
+    assert(matcher.match("lausane")[0] == "lausanne")
+    assert(matcher.match("luzern") is None)
+    assert(matcher.match("barn") is None)
@@ -0,0 +1,21 @@
+import pytest
+from gazetteer import *
+
+gazetteer_path = "tests/twitter/data/ch_gazetteer.tsv"
+
+@pytest.mark.parametrize("text, expected",
+    [("Zürich", "Zurich"),
+     ("ZURICH, Switzerland", "Zurich"),
+     ("St. Gallen - Schweiz", "Sankt Gallen"),
+     ("1376", "Vaud"),
+     ("Zürich & Bern", None),
+     ("Schweiz", None)])
+def test_lookup(text, expected):
+    gazetteer = Gazetteer(gazetteer_path)
+    loc = gazetteer.lookup(text)
+    assert((loc["state"] if loc is not None else None) == expected)
+
+def test_lookup_location():
+    loc = Gazetteer(gazetteer_path).lookup("Echallens")
+    assert(loc == {"lon": "6.633333", "lat": "46.641667", "state": "Vaud",
+                   "country": "ch"})
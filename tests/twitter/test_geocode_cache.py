@@ -0,0 +1,39 @@
+import pytest
+from geocode_cache import *
+
+loc_to_coords_src_path = "tests/twitter/data/loc_to_coords_src.txt"
+
+def test_import_text_file(tmp_path):
+    cache = GeocodeCache(str(tmp_path / "cache.db"), legacy_path=loc_to_coords_src_path)
+    loc, source = cache["1376"]
+    assert(loc == {"lon": "6.60014686413811", "lat": "46.6588912633543",
+                   "state": "Vaud", "country": "ch"})
+    assert(source == "from original location")
+    assert("not cached" not in cache)
+    cache.close()
+
+def test_put_and_reopen(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = GeocodeCache(path, commit_interval=10)
+    full = {"lat": "47.1", "lon": "8.5", "display_name": "Zug",
+            "address": {"state": "Zug", "country_code": "ch"}}
+    cache["zug"] = (full, "Geocoder_original")
+    cache["nowhere"] = (dict(), "location not found")
+    assert(cache.get("zug")[0] == {"lon": "8.5", "lat": "47.1",
+                                   "state": "Zug", "country": "ch"})
+    cache.close()
+    cache = GeocodeCache(path)
+    assert(len(cache) == 2)
+    assert(cache["nowhere"] == (dict(), "location not found"))
+    cache.compact()
+    cache.close()
+
+def test_resolved_queries(tmp_path):
+    cache = GeocodeCache(str(tmp_path / "cache.db"))
+    zug = {"lon": "8.5", "lat": "47.1", "state": "Zug", "country": "ch"}
+    cache["zug"] = (zug, "Geocoder_original")
+    cache["nowhere"] = (dict(), "location not found")
+    cache.put("zugg", (zug, "Fuzzy_match"), inferred_from="zug")
+    cache["baar"] = (zug, "Geocoder_original")
+    assert(list(cache.resolved_queries()) == ["baar", "zug"])
+    cache.close()
@@ -0,0 +1,101 @@
+import pytest
+from geocode_worker import *
+from tests.twitter.test_geocoder import reset_loc_to_coords_file
+
+test_config = load_yaml("tests/config.yaml")
+
+@pytest.fixture
+def worker(tmp_path):
+    reset_loc_to_coords_file()
+    config = load_yaml(test_config["path_config"])
+    for var_name in test_config["overwrite"]:
+        config[var_name] = test_config["overwrite"][var_name]
+    config["deferred_geocoding"] = True
+    config["out_dir_tweet_processing"] = str(tmp_path / "out_process")
+    config["path_dirty_gsw_tweets"] = str(tmp_path / "gsw_tweets.pkl")
+    config["path_dirty_gsw_sentences"] = str(tmp_path / "gsw_sentences.csv")
+    os.makedirs(config["out_dir_tweet_processing"])
+    return GeocodeWorker(config)
+
+def pending_tweet(sentence, location):
+    tweet = {"id_str": "1", "user": {"id_str": "2", "location": location}}
+    return (sentence, (0.0, 0.0), 0.99, "Pending", "2", tweet)
+
+def test_forward_geocode_deferred(worker):
+    res = worker.geocoder.forward_geocode("Lausanne")
+    assert(res == (dict(), "Pending"))
+    assert(worker.cache.pending_queries(10) == ["lausanne"])
+    # Cached queries are still answered directly
+    assert(worker.geocoder.forward_geocode("1376")[1] != "Pending")
+
+def test_backfill(worker):
+    worker.geocoder.forward_geocode("Lausanne")
+    worker.geocoder.forward_geocode("Paris")
+    path = os.path.join(worker.config["out_dir_tweet_processing"], "0.pkl")
+    save_obj([pending_tweet("a", "Lausanne"),
+              pending_tweet("b", "Paris"),
+              pending_tweet("c", "Nowhere")], path)
+    # What the worker stores once the queries are geocoded
+    worker.cache["lausanne"] = ({"lon": "8.54", "lat": "47.37"},
+                                 "Geocoder_original")
+    worker.cache["paris"] = ({"lon": "2.35", "lat": "48.85"},
+                             "Geocoder_original")
+    worker.config["keep_foreign_location"] = False
+    assert(worker.backfill() == 2)
+    gsw_tweets = load_obj(path)
+    assert([x[0] for x in gsw_tweets] == ["a", "c"])
+    assert(gsw_tweets[0][1] == (8.54, 47.37))
+    assert(gsw_tweets[0][3] == "Geocoder_original")
+    assert(gsw_tweets[1][3] == "Pending")
+    assert(worker.cache.pending_queries(10) == ["nowhere"])
+
+def test_backfill_qualified(worker, tmp_path):
+    worker.config["geocode_policy"] = "qualified"
+    worker.config["geocode_qualification_count"] = 3
+    worker.config["sg_users_count_path"] = str(tmp_path / "sg_users.csv")
+    path = os.path.join(worker.config["out_dir_tweet_processing"], "0.pkl")
+    save_obj([pending_tweet("a", "Nowhere")], path)
+    # The user does not qualify, its location is not queued
+    assert(worker.backfill() == 0)
+    assert(worker.cache.pending_count() == 0)
+    with open(worker.config["sg_users_count_path"], "w") as f:
+        f.write("user_id,gsw_tweet_count\n2,3.0\n")
+    assert(worker.backfill() == 0)
+    assert(worker.cache.pending_queries(10) == ["nowhere"])
+
+def test_backfill_if_needed(worker, tmp_path):
+    calls = []
+    backfill_dataset = worker.backfill_dataset
+    def count_calls():
+        calls.append(1)
+        return backfill_dataset()
+    worker.backfill_dataset = count_calls
+    assert(worker.backfill_if_needed(0) == 0)
+    assert(len(calls) == 1)
+    # Nothing resolved nor written since the last pass
+    assert(worker.backfill_if_needed(0) == 0)
+    assert(len(calls) == 1)
+    # A new output of the filter
+    worker.cache["lausanne"] = ({"lon": "8.54", "lat": "47.37"},
+                                 "Geocoder_original")
+    path = os.path.join(worker.config["out_dir_tweet_processing"], "0.pkl")
+    save_obj([pending_tweet("a", "Lausanne")], path)
+    assert(worker.backfill_if_needed(0) == 1)
+    assert(len(calls) == 2)
+    assert(worker.backfill_if_needed(0) == 0)
+    assert(len(calls) == 2)
+    # Queries resolved
+    assert(worker.backfill_if_needed(1) == 0)
+    assert(len(calls) == 3)
+    # The qualified users change
+    worker.config["geocode_policy"] = "qualified"
+    worker.config["geocode_qualification_count"] = 3
+    worker.config["sg_users_count_path"] = str(tmp_path / "sg_users.csv")
+    assert(worker.backfill_if_needed(0) == 0)
+    assert(len(calls) == 4)
+    assert(worker.backfill_if_needed(0) == 0)
+    assert(len(calls) == 4)
+    with open(worker.config["sg_users_count_path"], "w") as f:
+        f.write("user_id,gsw_tweet_count\n2,3.0\n")
+    worker.backfill_if_needed(0)
+    assert(len(calls) == 5)
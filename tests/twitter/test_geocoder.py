@@ -1,17 +1,22 @@
 import pytest
 from geocoder import *
 from shutil import copyfile
-#import os
+import os
 #from utils.utils import *
 
 test_config = load_yaml("tests/config.yaml")
 
 def reset_loc_to_coords_file():
-    """Reset the file mapping the queries to locations. This is done by copying
-    the file 'loc_to_coords_src.txt' into 'loc_to_coords'"""
+    """Reset the cache mapping the queries to locations. This is done by
+    copying the file 'loc_to_coords_src.txt' into 'loc_to_coords' and removing
+    the database, such that the text file is imported again"""
     src = test_config["loc_to_coords_src_path"]
     dst = test_config["overwrite"]["loc_to_coords_path"]
     copyfile(src, dst)
+    db_path = test_config["overwrite"]["loc_to_coords_db_path"]
+    for path in [db_path, db_path + "-wal", db_path + "-shm"]:
+        if os.path.exists(path):
+            os.remove(path)
 
 @pytest.fixture(scope="module")
 def geocoder():
@@ -36,6 +41,13 @@ def geocoder():
 def test_is_in_bounding_boxes(geocoder, point, boxes, expected):
     assert(geocoder.is_in_bounding_boxes(point, boxes) == expected)
 
+def test_are_coords_in_switzerland_batch(geocoder):
+    coords = [(8.54, 47.37), (2.35, 48.85), (7.45, 46.95), (0.0, 0.0)]
+    expected = [geocoder.are_coords_in_switzerland(x) for x in coords]
+    assert(expected == [True, False, True, False])
+    assert(geocoder.are_coords_in_switzerland_batch(coords) == expected)
+    assert(geocoder.are_coords_in_switzerland_batch([]) == [])
+
 @pytest.mark.parametrize("text, expected",
     [("I LIVE in >>>Goûmoens'la-ville<<< !!!", "Goumoëns"),
      ("6.1376, 47.1376", None)])
@@ -54,6 +66,48 @@ def test_forward_geocode(geocoder):
     assert(not query in geocoder.loc_to_coords)
     res = geocoder.forward_geocode(query)
     assert(query.lower() in geocoder.loc_to_coords)
-    geocoder.clean() # close the loc_to_coords.txt file
-    loc = load_dict_from_txt(test_config["overwrite"]["loc_to_coords_path"])
+    geocoder.clean() # commit the new entries
+    loc = GeocodeCache(test_config["overwrite"]["loc_to_coords_db_path"])
     assert(query.lower() in loc)
+
+def test_geocode_user_location(geocoder):
+    res = geocoder.geocode_user_location("42", "1376")
+    assert(res == geocoder.forward_geocode("1376"))
+    assert(geocoder.user_locations.get("42") == ("1376", res))
+    # The location is computed again if the user changed it
+    geocoder.loc_to_coords["1377"] = (dict(), "location not found")
+    res = geocoder.geocode_user_location("42", "1377")
+    assert(res == (dict(), "location not found"))
+    assert(geocoder.user_locations.get("42")[0] == "1377")
+
+def test_forward_geocode_gazetteer(geocoder):
+    res = geocoder.forward_geocode("Zürich, Schweiz")
+    assert(res[1] == "Gazetteer")
+    assert(res[0]["state"] == "Zurich")
+    query = Geocoder.normalize_query("Zürich, Schweiz")
+    assert(geocoder.loc_to_coords[query] == res)
+
+def test_forward_geocode_fuzzy_match(geocoder):
+    res = geocoder.forward_geocode("Zureich")
+    assert(res[1] == "Fuzzy_match")
+    assert(res[0]["state"] == "Zurich")
+    assert(geocoder.loc_to_coords.inferred_from("zureich") == "gazetteer:zurich")
+    res = geocoder.forward_geocode("Goumoens, Schweiz")
+    assert(res[1] == "Fuzzy_match")
+    query = Geocoder.normalize_query("Goumoens, Schweiz")
+    assert(geocoder.loc_to_coords.inferred_from(query) == "goumoëns")
+
+def test_fuzzy_match_max_cache_entries(geocoder):
+    max_entries = geocoder.config["fuzzy_match_max_cache_entries"]
+    geocoder.config["fuzzy_match_max_cache_entries"] = 1
+    geocoder.fuzzy_matcher = None
+    try:
+        matcher = geocoder._get_fuzzy_matcher()
+        assert(geocoder.fuzzy_cache_entries == 1)
+        count = len(matcher)
+        zug = {"lon": "8.5", "lat": "47.1", "state": "Zug", "country": "ch"}
+        geocoder._cache_result("unterageri", (zug, "Geocoder_original"))
+        assert(len(matcher) == count)
+    finally:
+        geocoder.config["fuzzy_match_max_cache_entries"] = max_entries
+        geocoder.fuzzy_matcher = None
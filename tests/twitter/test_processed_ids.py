@@ -0,0 +1,43 @@
+import pytest
+import time
+from processed_ids import *
+
+@pytest.fixture
+def store_dir(tmp_path):
+    return str(tmp_path / "processed_ids")
+
+def test_add_flush_and_reload(store_dir, tmp_path):
+    legacy = tmp_path / "processed_ids.txt"
+    legacy.write_text("11\n12\n", encoding="utf8")
+    store = ProcessedIdStore(store_dir, legacy_path=str(legacy),
+                             bloom_capacity=100, max_segments=2)
+    assert("11" in store and "12" in store and "13" not in store)
+    for i in range(5):
+        store.add_many([100 + 2*i, 101 + 2*i])
+        store.flush()
+    # segments are merged when there are more than max_segments
+    assert(len(store.segments) <= 3)
+    store.add(7)
+    assert(7 in store)
+
+    # pending ids are lost if not flushed
+    store = ProcessedIdStore(store_dir)
+    assert(7 not in store)
+    ids = ["11", "12", "13"] + [str(x) for x in range(99, 112)]
+    expected = [x in {"11", "12"} or 100 <= int(x) <= 109 for x in ids]
+    assert([x in store for x in ids] == expected)
+    assert(list(store.contains_many(ids)) == expected)
+    store.compact()
+    assert(len(store.segments) == 1 and len(store) == 12)
+
+def test_horizon(store_dir):
+    now = timestamp_to_snowflake(time.time())
+    old = timestamp_to_snowflake(time.time() - 10 * 86400)
+    assert(abs(snowflake_to_timestamp(now) - time.time()) < 1)
+    store = ProcessedIdStore(store_dir, horizon_days=5)
+    store.add_many([now, old])
+    store.compact()
+    # the old id is not stored anymore, but still considered processed
+    assert(len(store) == 1)
+    assert(now in store and old in store and old + 1 in store)
+    assert(now + 1 not in store)
@@ -0,0 +1,59 @@
+import os
+import json
+import pytest
+from raw_tweets import *
+
+dir_path = "tests/twitter/tweets"
+
+
+def test_project_keeps_used_fields():
+    with open(os.path.join(dir_path, "tweet_with_retweeted.txt"), "rb") as f:
+        raw = f.read().strip()
+    tweet = json.loads(raw)
+    record = project(tweet, raw)
+    assert record["id_str"] == tweet["id_str"]
+    assert record["user"]["location"] == tweet["user"]["location"]
+    assert "entities" not in record
+    sub_record = record["retweeted_status"]
+    assert isinstance(sub_record, TweetRecord)
+    assert sub_record.path == ("retweeted_status",)
+    assert sub_record["id_str"] == tweet["retweeted_status"]["id_str"]
+
+
+def test_materialize():
+    with open(os.path.join(dir_path, "tweet_with_retweeted.txt"), "rb") as f:
+        raw = f.read().strip()
+    tweet = json.loads(raw)
+    record = project(tweet, raw)
+    assert materialize(record) == tweet
+    assert materialize(record["retweeted_status"]) == \
+           tweet["retweeted_status"]
+    assert materialize(tweet) is tweet
+
+
+def test_load_records(tmp_path):
+    names = ["tweet_with_gps.txt", "tweet_with_place.txt", "tweet_limit.txt"]
+    lines = []
+    for name in names:
+        with open(os.path.join(dir_path, name), "rb") as f:
+            lines.append(f.read().strip())
+    path = tmp_path / "raw.txt"
+    path.write_bytes(b"\n".join([lines[0], b"", b"not json", lines[1],
+                                 lines[2]]) + b"\n")
+    # A small chunk size such that lines span several chunks
+    records = load_records(str(path), chunk_size=64)
+    assert [materialize(x) for x in records] == [json.loads(x) for x in lines]
+
+
+def test_lone_surrogate(tmp_path):
+    # An emoji truncated by twitter leaves a lone surrogate escape, which
+    # json accepts (and orjson does not)
+    line = b'{"id_str": "1", "text": "a\\ud83d b", "user": {"id_str": "2"}}'
+    tweet = json.loads(line)
+    assert loads(line) == tweet
+    path = tmp_path / "raw.txt"
+    path.write_bytes(line + b"\nnot json\n")
+    records = load_records(str(path))
+    assert len(records) == 1
+    assert records[0]["text"] == "a\ud83d b"
+    assert materialize(records[0]) == tweet
@@ -0,0 +1,35 @@
+import pytest
+from sentence_batch import SentenceBatch
+
+def test_filter_and_transform():
+    batch = SentenceBatch.from_sentences([(0, "a"), (1, "bb"), (1, "ccc")])
+    batch.filter(lambda text: len(text) != 2)
+    assert(len(batch) == 2)
+    calls = []
+    def upper(text):
+        calls.append(text)
+        return text.upper()
+    batch.transform(upper)
+    # Only the kept sentences are transformed
+    assert(calls == ["a", "ccc"])
+    assert(batch.to_sentences() == [(0, "A"), (1, "CCC")])
+    batch.filter_many(lambda texts: [x != "A" for x in texts])
+    batch.transform_many(lambda texts: [x + "!" for x in texts])
+    assert(batch.to_sentences() == [(1, "CCC!")])
+    assert(batch.kept_texts() == ["CCC!"])
+
+def test_split():
+    batch = SentenceBatch.from_sentences([(3, "a. b"), (5, "c"), (7, "d. e")])
+    batch.filter(lambda text: text != "c")
+    split = batch.split(lambda texts: [x.split(". ") for x in texts])
+    assert(split.to_sentences() == [(3, "a"), (3, "b"), (7, "d"), (7, "e")])
+    assert(split.positions == [0, 1, 0, 1])
+    assert(len(split) == 4)
+
+def test_empty_and_invalid():
+    batch = SentenceBatch.from_sentences([])
+    batch.filter(lambda text: False)
+    batch.transform_many(lambda texts: texts)
+    assert(batch.to_sentences() == [])
+    with pytest.raises(ValueError):
+        SentenceBatch([0, 1], ["a"])
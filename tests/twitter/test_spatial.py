@@ -0,0 +1,63 @@
+import json
+import pytest
+import numpy as np
+from statistics import mean
+from spatial import *
+from shapely.geometry import Polygon
+
+def square(min_lon, min_lat, max_lon, max_lat):
+    return {"type": "Polygon",
+            "coordinates": [[[min_lon, min_lat], [max_lon, min_lat],
+                             [max_lon, max_lat], [min_lon, max_lat],
+                             [min_lon, min_lat]]]}
+
+@pytest.fixture
+def reverse_geocoder(tmp_path):
+    features = [{"type": "Feature",
+                 "properties": {"country_code": "ch", "state": "Bern"},
+                 "geometry": square(0, 0, 1, 1)},
+                {"type": "Feature",
+                 "properties": {"country_code": "ch", "state": "Zurich"},
+                 "geometry": square(1, 0, 2, 1)},
+                {"type": "Feature",
+                 "properties": {"country_code": "de", "state": None},
+                 "geometry": square(0, 1, 2, 2)}]
+    path = tmp_path / "regions.geojson"
+    path.write_text(json.dumps({"type": "FeatureCollection",
+                                "features": features}))
+    return ReverseGeocoder(str(path), border_margin=0.01)
+
+def test_points_in_polygon():
+    polygon = Polygon([(0, 0), (2, 0), (0, 2)])
+    inside = points_in_polygon(polygon, [0.5, 1.5, 3, -1], [0.5, 1.5, 0, 0])
+    assert(list(inside) == [True, False, False, False])
+
+def test_bbox_centroids():
+    rings = [square(0, 0, 1, 2)["coordinates"][0],
+             [[6.1, 46.2], [6.3, 46.2], [6.3, 46.4], [6.1, 46.4]]]
+    lons, lats = bbox_centroids(rings)
+    # Same values as the middle of the extreme coordinates with statistics.mean
+    assert(list(lons) == [mean([0, 1]), mean([6.1, 6.3])])
+    assert(list(lats) == [mean([0, 2]), mean([46.2, 46.4])])
+    assert(len(bbox_centroids([])[0]) == 0)
+
+def test_lookup(reverse_geocoder):
+    results, uncertain = reverse_geocoder.lookup([0.5, 1.5, 1.5, 1.005, 5],
+                                                 [0.5, 0.5, 1.5, 0.5, 5])
+    assert(results[:3] == [("ch", "Bern"), ("ch", "Zurich"), ("de", None)])
+    assert(results[4] == (None, None))
+    # Close to the border between Bern and Zurich, and outside all regions
+    assert(list(uncertain) == [False, False, False, True, True])
+
+def test_lookup_without_tree(reverse_geocoder):
+    np.random.seed(0)
+    lons = np.random.uniform(-0.5, 2.5, 2000)
+    lats = np.random.uniform(-0.5, 2.5, 2000)
+    results, uncertain = reverse_geocoder.lookup(lons, lats)
+    # Same results when every region is tested (shapely 1.x)
+    reverse_geocoder.tree = None
+    expected, expected_uncertain = reverse_geocoder.lookup(lons, lats)
+    assert(results == expected)
+    assert(list(uncertain) == list(expected_uncertain))
+    results, uncertain = reverse_geocoder.lookup([], [])
+    assert(results == [] and len(uncertain) == 0)
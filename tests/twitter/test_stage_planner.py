@@ -0,0 +1,55 @@
+import pytest
+from stage_planner import StagePlanner
+
+def test_default_order_until_measured():
+    planner = StagePlanner(["cheap", "lid"])
+    assert(planner.order() == ["cheap", "lid"])
+    planner.record("lid", 100, 10, 5.0)
+    # "cheap" is not measured yet
+    assert(planner.order() == ["cheap", "lid"])
+    assert(planner.order(["lid"]) == ["lid"])
+
+def test_auto_order():
+    planner = StagePlanner(["a", "b", "c"])
+    # a : 1 s per dropped sentence, b : 0.1 s, c : drops nothing
+    planner.record("a", 100, 90, 10.0)
+    planner.record("b", 100, 50, 5.0)
+    planner.record("c", 100, 100, 0.1)
+    assert(planner.order() == ["b", "a", "c"])
+    assert(planner.order(["a", "c"]) == ["a", "c"])
+    assert([x["stage"] for x in planner.report()] == ["b", "a", "c"])
+
+def test_fixed_order():
+    planner = StagePlanner(["a", "b", "c"], order=["c", "a"])
+    planner.record("a", 100, 0, 0.1)
+    assert(planner.order() == ["c", "a", "b"])
+    with pytest.raises(ValueError):
+        StagePlanner(["a", "b"], order=["a", "d"])
+    with pytest.raises(ValueError):
+        StagePlanner(["a", "b"], order="fastest")
+
+def test_save_and_load(tmp_path):
+    path = str(tmp_path / "stage_stats.json")
+    planner = StagePlanner(["a", "b"], stats_path=path)
+    planner.record("a", 100, 90, 10.0)
+    planner.record("b", 100, 50, 5.0)
+    planner.save()
+    loaded = StagePlanner(["a", "b", "c"], stats_path=path)
+    assert(loaded.stats["a"].to_dict() == planner.stats["a"].to_dict())
+    assert(loaded.stats["c"].calls == 0)
+    assert(loaded.order(["a", "b"]) == ["b", "a"])
+
+def test_constraints():
+    planner = StagePlanner(["a", "prior", "lid"],
+                           constraints=[("prior", "lid")])
+    planner.record("a", 100, 90, 10.0)
+    planner.record("lid", 100, 50, 5.0)
+    # "prior" dropped nothing, but it still runs before "lid"
+    planner.record("prior", 100, 100, 0.1)
+    assert(planner.order() == ["a", "prior", "lid"])
+    assert(planner.order(["a", "lid"]) == ["lid", "a"])
+    planner = StagePlanner(["a", "prior", "lid"], order=["lid", "a"],
+                           constraints=[("prior", "lid")])
+    assert(planner.order() == ["a", "prior", "lid"])
+    with pytest.raises(ValueError):
+        StagePlanner(["a", "b"], constraints=[("a", "c")])
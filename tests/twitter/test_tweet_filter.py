@@ -1,9 +1,10 @@
 import pytest
 from tweet_filter import *
 import os
+import math
 from utils.utils import *
 from pytest import approx
-from shutil import copyfile
+from shutil import copyfile, rmtree
 import pandas as pd
 
 test_config = load_yaml("tests/config.yaml")
@@ -15,15 +16,22 @@ def reset_processed_ids_file():
     src = test_config["processed_tweets_ids_src_path"]
     dst = test_config["overwrite"]["processed_tweets_ids_path"]
     copyfile(src, dst)
+    # The store is created again from the text file
+    rmtree(test_config["overwrite"]["processed_tweets_ids_dir"],
+           ignore_errors=True)
 
-@pytest.fixture(scope="module")
-def tweets_obj():
+def load_test_config():
     config = load_yaml(test_config["path_config"])
     for var_name in test_config["overwrite"]:
         if not var_name in config:
             raise ValueError("Config element to overwrite '" + var_name +
                              "' does not exist")
         config[var_name] = test_config["overwrite"][var_name]
+    return config
+
+@pytest.fixture(scope="module")
+def tweets_obj():
+    config = load_test_config()
     reset_processed_ids_file()
 
     tweet_filter = TweetFilter(config)
@@ -38,6 +46,40 @@ def tweets_obj():
 
     return TweetFilter(config)
 
+def make_tweet_filter(tmp_path, file_count=3):
+    """Returns a TweetFilter whose files live in tmp_path, and the paths of
+    the raw tweets files, made of the lines of the test input split in
+    'file_count' files"""
+    config = load_test_config()
+    stream_dir = tmp_path / "stream"
+    search_dir = tmp_path / "search"
+    stream_dir.mkdir()
+    search_dir.mkdir()
+    config["raw_tweets_stream_dir_path"] = str(stream_dir)
+    config["raw_tweets_search_dir_path"] = str(search_dir)
+    config["processed_tweets_ids_path"] = str(tmp_path / "processed_ids.txt")
+    config["processed_tweets_ids_dir"] = str(tmp_path / "processed_ids")
+    config["out_dir_tweet_processing"] = str(tmp_path / "out_process")
+    config["sg_users_count_path"] = str(tmp_path / "sg_users_count.csv")
+    config["stage_stats_path"] = str(tmp_path / "stage_stats.json")
+    config["user_prior_db_path"] = str(tmp_path / "user_prior.db")
+    input_dir = test_config["overwrite"]["raw_tweets_stream_dir_path"]
+    lines = []
+    for name in sorted(os.listdir(input_dir)):
+        with open(os.path.join(input_dir, name), "r", encoding="utf8") as f:
+            lines += [x for x in f.readlines() if x.strip()]
+    size = math.ceil(len(lines) / file_count)
+    paths = []
+    for i in range(file_count):
+        path = str(stream_dir / f"raw_{i}.txt")
+        with open(path, "w", encoding="utf8") as f:
+            f.writelines(lines[i*size:(i+1)*size])
+        paths.append(path)
+    tweet_filter = TweetFilter(config)
+    # The order of the files given by os.listdir is arbitrary
+    tweet_filter.raw_tweets_paths = [(x, "stream") for x in paths]
+    return tweet_filter, paths
+
 @pytest.fixture(scope="module")
 def tweets_dict():
     tweets = dict()
@@ -354,6 +396,49 @@ class Test_tweets:
         #res = tweets_obj._attach_gsw_location(sentences, idx_to_location, True)
         #assert(len(res[0]) == 4)
 
+    def test_known_foreign_tweets(self, tweets_obj):
+        def place(lon, lat):
+            return {"bounding_box": {"coordinates": [[[lon - 0.1, lat - 0.1],
+                                                      [lon + 0.1, lat - 0.1],
+                                                      [lon + 0.1, lat + 0.1],
+                                                      [lon - 0.1, lat + 0.1]]]}}
+        user = {"id_str": "1", "location": None}
+        tweets_obj.tweets = [
+            {"coordinates": {"coordinates": [8.904, 47.484]}, "user": user},
+            {"coordinates": {"coordinates": [16.573, 47.305]}, "user": user},
+            {"place": place(8.904, 47.484), "user": user},
+            {"place": place(2.35, 48.85), "user": user},
+            {"user": {"id_str": "2", "location": ""}},
+            {"user": {"id_str": "3", "location": "qxwvzk town"}}]
+        foreign = tweets_obj._known_foreign_tweets([0, 1, 2, 3, 4, 5, 1])
+        # The location of the last tweet is not known without locationiq
+        assert(foreign == {1, 3, 4})
+
+        pending = PendingFile("path", "stream", tweets_obj.tweets,
+                              [(i, "s" + str(i)) for i in range(6)], set())
+        tweets_obj._filter_stage_swiss_location([pending])
+        assert(pending.sentences == [(0, "s0"), (2, "s2"), (5, "s5")])
+        assert(len(pending.predictions) == 3)
+
+    def test_filter_stage_user_prior(self, tweets_obj):
+        policy = tweets_obj.user_prior_policy
+        tweets_obj.user_prior_policy = UserPriorPolicy(2, 0.01, 0.98,
+                                                       audit_rate=0)
+        tweets_obj.user_prior.clear()
+        tweets_obj.user_prior.update_many([("1", 0.1, False),
+                                           ("1", 0.2, False),
+                                           ("2", 0.1, False),
+                                           ("2", 0.95, True)])
+        tweets = [{"user": {"id_str": str(i)}} for i in range(4)]
+        pending = PendingFile("path", "stream", tweets,
+                              [(1, "a"), (2, "b"), (3, "c"), (1, "d")], set())
+        # The last sentence is already scored
+        pending.predictions[3] = 0.95
+        tweets_obj._filter_stage_user_prior([pending])
+        assert(pending.sentences == [(2, "b"), (3, "c"), (1, "d")])
+        tweets_obj.user_prior.clear()
+        tweets_obj.user_prior_policy = policy
+
     def test_filter_gsw_sentences(self, tweets_obj):
         tweets_obj.tweets = [dict({"user":dict({"id_str":str(i)})})
                              for i in range(20)]
@@ -431,13 +516,165 @@ class Test_tweets:
         assert(df.at[1, "gsw_tweet_count"] == 1)
 
     def test_update_processed_tweets(self, tweets_obj):
+        reset_processed_ids_file()
+        config = tweets_obj.config
+        tweets_obj.processed_tweets_ids = ProcessedIdStore(
+                                config["processed_tweets_ids_dir"],
+                                legacy_path=config["processed_tweets_ids_path"])
         tweets_obj.new_tweets_ids = {1,13,15}
         tweets_obj._update_processed_tweets()
-        path = tweets_obj.config["processed_tweets_ids_path"]
-        with open(path, "r", encoding="utf8") as f:
-            lines = f.readlines()
-            assert(lines[0] == "11\n")
-            assert(lines[1] == "12\n")
-            assert(lines[2] == "1\n")
-            assert(lines[3] == "13\n")
-            assert(lines[4] == "15\n")
+        assert(tweets_obj.new_tweets_ids == set())
+        # Read the ids back from disk
+        store = ProcessedIdStore(config["processed_tweets_ids_dir"])
+        for id in ["11", "12", "1", "13", "15"]:
+            assert(id in store)
+        assert("14" not in store)
+
+def test_commit_keeps_uncommitted_ids_out(tmp_path):
+    tweet_filter, paths = make_tweet_filter(tmp_path, file_count=2)
+    pending_a = tweet_filter._prepare_file(paths[0], "stream")
+    pending_b = tweet_filter._prepare_file(paths[1], "stream")
+    assert(len(pending_b.new_tweets_ids) > 0)
+    # File B does not get the tweets already seen in file A
+    assert(len(pending_a.new_tweets_ids & pending_b.new_tweets_ids) == 0)
+    tweet_filter._commit_file(pending_a, [], {"stream": 0, "search": 0})
+    store = ProcessedIdStore(tweet_filter.config["processed_tweets_ids_dir"])
+    assert(all(x in store for x in pending_a.new_tweets_ids))
+    assert(not any(x in store for x in pending_b.new_tweets_ids))
+    assert(os.path.exists(paths[1]) and not os.path.exists(paths[0]))
+
+class FakeLid:
+    """Predict a score from the length of each sentence, and record the
+    sentences of each call"""
+
+    def __init__(self):
+        self.calls = []
+
+    @staticmethod
+    def score(text):
+        return (len(text) % 10) / 10
+
+    def predict_label(self, sentences):
+        self.calls.append(list(sentences))
+        return [FakeLid.score(x) for x in sentences]
+
+def record_prepared_files(tweet_filter):
+    """Record the pending files returned by _prepare_file, along with a copy
+    of their sentences before the filter stages"""
+    prepared = []
+    prepare_file = tweet_filter._prepare_file
+    def prepare(path, source):
+        pending = prepare_file(path, source)
+        prepared.append((pending, list(pending.sentences)))
+        return pending
+    tweet_filter._prepare_file = prepare
+    return prepared
+
+def test_cross_file_batching(tmp_path):
+    tweet_filter, paths = make_tweet_filter(tmp_path)
+    # A single call of the model for all the sentences
+    tweet_filter.config["use_lid_service"] = True
+    tweet_filter.lid = FakeLid()
+    tweet_filter.config["lid_cross_file_batching"] = True
+    tweet_filter.config["lid_min_batch_sentences"] = 1000000
+    tweet_filter.config["lid_threshold"] = 0.0
+    prepared = record_prepared_files(tweet_filter)
+    commits = []
+    tweet_filter._commit_file = \
+        lambda pending, sentences_pred, cur: commits.append((pending,
+                                                             sentences_pred))
+    tweet_filter.process({"stream": 0, "search": 0})
+
+    assert(len(tweet_filter.lid.calls) == 1)
+    assert([x[0].path for x in commits] == paths)
+    assert(len(tweet_filter.lid.calls[0]) ==
+           sum(len(sentences) for _, sentences in prepared))
+    # Each file gets back the predictions of its own sentences
+    for (pending, sentences), (committed, sentences_pred) in zip(prepared,
+                                                                 commits):
+        assert(committed is pending)
+        assert(len(sentences) > 0)
+        assert(sentences_pred == [(idx, text, FakeLid.score(text))
+                                  for idx, text in sentences])
+
+def test_failure_after_first_commit(tmp_path):
+    tweet_filter, paths = make_tweet_filter(tmp_path)
+    tweet_filter.config["use_lid_service"] = True
+    # Nothing is kept, such that nothing has to be geocoded
+    tweet_filter.lid = FakeLid()
+    tweet_filter.config["lid_threshold"] = 2.0
+    tweet_filter.config["lid_min_batch_sentences"] = 1000000
+    prepared = record_prepared_files(tweet_filter)
+    commit_file = tweet_filter._commit_file
+    def commit(pending, sentences_pred, cur):
+        if not os.path.exists(paths[0]):
+            raise RuntimeError("crash after the first commit")
+        commit_file(pending, sentences_pred, cur)
+    tweet_filter._commit_file = commit
+    tweet_filter.process({"stream": 0, "search": 0})
+
+    assert(len(tweet_filter.lid.calls) == 1)
+    assert([os.path.exists(x) for x in paths] == [False, True, True])
+    config = tweet_filter.config
+    store = ProcessedIdStore(config["processed_tweets_ids_dir"])
+    assert(all(x in store for x in prepared[0][0].new_tweets_ids))
+    for pending, _ in prepared[1:]:
+        assert(len(pending.new_tweets_ids) > 0)
+        assert(not any(x in store for x in pending.new_tweets_ids))
+
+    # The next run processes the remaining files with all their tweets
+    tweet_filter = TweetFilter(config)
+    tweet_filter.lid = FakeLid()
+    tweet_filter.raw_tweets_paths = [(x, "stream") for x in paths[1:]]
+    reprepared = record_prepared_files(tweet_filter)
+    tweet_filter.process({"stream": 0, "search": 0})
+    assert(not any(os.path.exists(x) for x in paths))
+    for (pending, _), (repending, _) in zip(prepared[1:], reprepared):
+        assert(repending.new_tweets_ids == pending.new_tweets_ids)
+
+def test_filter_stage_lid_fast_track(tmp_path):
+    tweet_filter, _ = make_tweet_filter(tmp_path, file_count=1)
+    tweet_filter.config["use_lid_service"] = True
+    tweet_filter.lid = FakeLid()
+    tweet_filter.config["use_user_prior"] = True
+    tweet_filter.config["lid_threshold"] = 0.65
+    tweet_filter.config["user_prior_fast_track_words"] = 2
+    tweet_filter.user_prior_policy = UserPriorPolicy(2, 0.01, 0.98,
+                                                     fast_track=True,
+                                                     audit_rate=0)
+    tweet_filter.user_prior.update_many([("1", 0.9, True), ("1", 0.8, True),
+                                         ("2", 0.1, False)])
+    tweets = [{"user": {"id_str": str(i)}} for i in range(3)]
+    pending = PendingFile("path", "stream", tweets,
+                          [(1, "aaa bbb c"), (2, "bbbbbbb"),
+                           (1, "aa bb cc dd"), (0, "dddddd")], set())
+    tweet_filter._filter_stage_lid([pending])
+    # The sentences of the user 1 are scored on their first words only
+    assert(tweet_filter.lid.calls == [["aaa bbb", "bbbbbbb", "aa bb",
+                                       "dddddd"]])
+    assert(pending.sentences == [(1, "aaa bbb c"), (2, "bbbbbbb")])
+    assert(pending.predictions == [0.7, 0.7])
+    # Only the sentences scored in full reach the history
+    assert(pending.scored == [("2", 0.7, True), ("0", 0.6, False)])
+
+def test_commit_updates_user_prior(tmp_path):
+    tweet_filter, paths = make_tweet_filter(tmp_path, file_count=1)
+    config = tweet_filter.config
+    pending = tweet_filter._prepare_file(paths[0], "stream")
+    pending.scored = [("1", 0.9, True), ("1", 0.2, False), ("2", 0.1, False)]
+    update_many = tweet_filter.user_prior.update_many
+    def update(scores):
+        # The ids are processed before the history is updated
+        store = ProcessedIdStore(config["processed_tweets_ids_dir"])
+        assert(all(x in store for x in pending.new_tweets_ids))
+        update_many(scores)
+    tweet_filter.user_prior.update_many = update
+    tweet_filter._commit_file(pending, [], {"stream": 0, "search": 0})
+
+    user_prior = UserPriorStore(config["user_prior_db_path"])
+    assert(len(user_prior) == 2)
+    prior = user_prior.get("1")
+    assert(prior.sentences == 2 and prior.gsw_sentences == 1)
+    assert(prior.mean_gsw_score == approx(0.9))
+    assert(user_prior.get("2").gsw_rate == 0)
+    user_prior.close()
@@ -0,0 +1,43 @@
+import pytest
+from user_prior import *
+
+def test_store(tmp_path):
+    path = str(tmp_path / "user_prior.db")
+    store = UserPriorStore(path)
+    store.update_many([("1", 0.1, False), ("1", 0.95, True), ("2", 0.2, False)])
+    store.update_many([("1", 0.97, True)])
+    store.close()
+    store = UserPriorStore(path)
+    assert(len(store) == 2)
+    prior = store.get("1")
+    assert(prior.sentences == 3 and prior.gsw_sentences == 2)
+    assert(prior.gsw_rate == pytest.approx(2 / 3))
+    assert(prior.mean_score == pytest.approx(2.02 / 3))
+    assert(prior.mean_gsw_score == pytest.approx(0.96))
+    assert(store.get("3") is None)
+    assert(set(store.get_many(["1", "2", "3"], chunk_size=1)) == {"1", "2"})
+    store.clear()
+    assert(len(store) == 0)
+    store.close()
+
+def test_policy():
+    negative = UserPrior(100, 0, 5.0, 0.)
+    positive = UserPrior(100, 99, 97.0, 96.0)
+    unknown = UserPrior(10, 0, 0.5, 0.)
+    policy = UserPriorPolicy(50, 0.01, 0.98, fast_track=True, audit_rate=0)
+    assert(policy.skip(negative) and not policy.fast_tracked(negative))
+    assert(policy.fast_tracked(positive) and not policy.skip(positive))
+    assert(not policy.skip(unknown) and not policy.fast_tracked(unknown))
+    assert(not policy.skip(None) and not policy.fast_tracked(None))
+    # Without fast track, the positive users are scored
+    policy = UserPriorPolicy(50, 0.01, 0.98, audit_rate=0)
+    assert(not policy.fast_tracked(positive))
+    # Every sentence is audited
+    policy = UserPriorPolicy(50, 0.01, 0.98, fast_track=True, audit_rate=1)
+    assert(not policy.skip(negative) and not policy.fast_tracked(positive))
+    # A part of them
+    policy = UserPriorPolicy(50, 0.01, 0.98, audit_rate=0.5, seed=0)
+    skipped = sum(policy.skip(negative) for _ in range(1000))
+    assert(400 < skipped < 600)
+    with pytest.raises(ValueError):
+        UserPriorPolicy(50, 0.01, 0.98, audit_rate=1.5)
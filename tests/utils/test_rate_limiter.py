@@ -0,0 +1,29 @@
+import time
+import pytest
+from utils.rate_limiter import *
+
+def test_burst(tmp_path):
+    bucket = TokenBucket(str(tmp_path / "rate.json"), 60, burst=2)
+    assert(bucket.try_acquire() == 0)
+    assert(bucket.try_acquire() == 0)
+    # The bucket is empty, a token is added every second
+    wait = bucket.try_acquire()
+    assert(0.9 < wait <= 1)
+
+def test_shared_state(tmp_path):
+    path = str(tmp_path / "rate.json")
+    TokenBucket(path, 60, burst=1).acquire()
+    # Another process using the same file sees the empty bucket
+    assert(TokenBucket(path, 60, burst=1).try_acquire() > 0)
+
+def test_acquire_waits(tmp_path):
+    bucket = TokenBucket(str(tmp_path / "rate.json"), 600, burst=1)
+    start = time.time()
+    for _ in range(3):
+        bucket.acquire()
+    assert(time.time() - start >= 0.18)
+
+def test_block(tmp_path):
+    bucket = TokenBucket(str(tmp_path / "rate.json"), 6000, burst=5)
+    bucket.block(0.5)
+    assert(0.4 < bucket.try_acquire() <= 0.5)
@@ -0,0 +1,49 @@
+import types
+import pytest
+import utils.typecheck as typecheck
+
+@pytest.fixture
+def checks(monkeypatch):
+    """Replace the typechecker by one counting the checked calls"""
+    checked = []
+    def accepts(*types_):
+        def decorator(f):
+            def wrapper(*args):
+                checked.append(args)
+                return f(*args)
+            return wrapper
+        return decorator
+    monkeypatch.setattr(typecheck, "_typecheck",
+                        types.SimpleNamespace(accepts=accepts, returns=accepts),
+                        raising=False)
+    monkeypatch.setattr(typecheck, "_import_mode", "on")
+    yield checked
+    typecheck.set_typecheck_mode("on", 100)
+
+def test_modes(checks):
+    @typecheck.accepts(int)
+    def double(x):
+        return 2 * x
+    typecheck.set_typecheck_mode("on")
+    assert([double(i) for i in range(10)] == list(range(0, 20, 2)))
+    assert(len(checks) == 10)
+    typecheck.set_typecheck_mode("sample", 4)
+    assert([double(i) for i in range(10)] == list(range(0, 20, 2)))
+    assert(checks[10:] == [(3,), (7,)])
+    typecheck.configure_typecheck({"typecheck_mode": "off",
+                                   "typecheck_sample_rate": 1})
+    double(1)
+    assert(len(checks) == 12)
+    assert(typecheck.get_typecheck_mode() == "off")
+
+def test_off_at_import(checks, monkeypatch):
+    monkeypatch.setattr(typecheck, "_import_mode", "off")
+    def double(x):
+        return 2 * x
+    assert(typecheck.accepts(int)(double) is double)
+
+def test_invalid_mode():
+    with pytest.raises(ValueError):
+        typecheck.set_typecheck_mode("always")
+    with pytest.raises(ValueError):
+        typecheck.set_typecheck_mode("sample", 0)
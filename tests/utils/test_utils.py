@@ -7,3 +7,15 @@ from utils.utils import *
      ("@Bill O'clash /!\\#thug/!\\", "bill o clash thug")])
 def test_heavy_normalize_text(text, expected):
     assert(heavy_normalize_text(text) == expected)
+
+def test_lru_cache():
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert(cache.get("a") == 1)
+    # "b" is now the least recently used
+    cache.put("c", 3)
+    assert("b" not in cache)
+    assert(cache.get("a") == 1 and cache.get("c") == 3)
+    assert(cache.get("b", 0) == 0)
+    assert(len(cache) == 2)
@@ -1,15 +1,13 @@
 import re
-import json
-from phrasal.norm_punc import normalize_text
+from phrasal.norm_punc import normalize_many
 from phrasal.pattern_sentence_filter import PatternSentenceFilter
 from phrasal.mocy_splitter import MocySplitter
 from utils.utils import *
 from geocoder import *
 from typing import List, Dict, Tuple, Union, Any
-from bert_lid import BertLid
+from lid.loader import load_lid, lid_batches_itself
 import os
-from typechecker.typecheck import *
-from statistics import mean
+from utils.typecheck import *
 from torch import cuda
 import pandas as pd
 import logging
@@ -19,6 +17,13 @@ import math
 from preprocessing.cleaner import *
 from tqdm import tqdm
 from pathlib import Path
+from processed_ids import ProcessedIdStore
+from raw_tweets import load_records, materialize
+from spatial import bbox_centroids
+from sentence_batch import SentenceBatch
+from stage_planner import StagePlanner
+from user_prior import UserPriorStore, UserPriorPolicy
+import time
 
 # Define typing aliases
 Coords = Tuple[float, float]
@@ -31,6 +36,36 @@ Idx_to_location = Dict[int, Tuple[Any, Coords, str]]
 # (sentence, (lon, lat), gsw prediction, geo_source, user_id, original tweet)
 GSW_tweets = List[Tuple[str, Tuple[float, float], float, str, str, dict]]
 
+class PendingFile:
+    """A raw tweets file for which the text stages of the pipeline are done,
+    waiting for the language identification and to be committed.
+    """
+
+    def __init__(self, path, source, tweets, sentences, new_tweets_ids):
+        self.path = path
+        # "stream" or "search"
+        self.source = source
+        self.tweets = tweets
+        # Sentences to classify, the indices refer to 'tweets'
+        self.sentences = sentences
+        # The gsw prediction of each sentence, set by the "lid" stage
+        self.predictions = [None] * len(sentences)
+        # The sentences scored by the model, as (user_id, score, accepted),
+        # added to the history of the users when the file is committed
+        self.scored = []
+        # Ids of the tweets found for the first time in this file
+        self.new_tweets_ids = new_tweets_ids
+
+    def keep(self, mask):
+        """Drop the sentences (and their predictions) whose mask is False"""
+        self.sentences = [x for x, ok in zip(self.sentences, mask) if ok]
+        self.predictions = [x for x, ok in zip(self.predictions, mask) if ok]
+
+    def sentences_pred(self):
+        """Returns the sentences along with their gsw prediction"""
+        return [(idx, text, prediction) for (idx, text), prediction
+                in zip(self.sentences, self.predictions)]
+
 class TweetFilter:
     """This class handles all the pipeline of tweet processing, that is loading,
     cleaning, geocoding, and filtering the tweets.
@@ -39,14 +74,32 @@ class TweetFilter:
     tweets.
     """
 
-    @accepts(Any, Union[str, dict])
+    # The filter stages run after the text stages, in their default order
+    # (cheapest first), see _run_filter_stages
+    filter_stages = ["swiss_location", "user_prior", "lid"]
+    # The user prior avoids the model, so it always runs before it
+    filter_stages_constraints = [("user_prior", "lid")]
+
+    @accepts(Any, Union[str, dict], Any, Any)
     @returns(None)
-    def __init__(self, config: Union[str, dict]):
+    def __init__(self, config: Union[str, dict], geocoder=None, lid=None):
         """Load the tweets and initialize the objects to process them.
+
+        Parameters
+            config | Union[str, dict]
+                The config or the path of the config file
+            geocoder | Geocoder
+                A geocoder to reuse, such that its caches are kept from one
+                run to the next. A new one is created if None.
+            lid | Any
+                A language identification model to reuse (see load_lid), e.g.
+                a pool of workers that should not load the model again at
+                each run. A new one is loaded if None.
         """
 
         print("Initializing...")
         self.config = load_yaml(config) if isinstance(config, str) else config
+        configure_typecheck(self.config)
         # remove previous logging config if present
         for handler in logging.root.handlers[:]:
             logging.root.removeHandler(handler)
@@ -57,15 +110,32 @@ class TweetFilter:
                             level=logging.INFO,
                             format='%(asctime)s - %(levelname)s - %(message)s')
 
-        self.geocoder = Geocoder(self.config)
-        self.filterer = PatternSentenceFilter()
+        self.geocoder = geocoder if geocoder is not None \
+                        else Geocoder(self.config)
+        self.filterer = PatternSentenceFilter(
+                    adaptive=self.config["sentence_filter_adaptive"],
+                    replan_interval=self.config["sentence_filter_replan_interval"])
+        # The rules are ordered from the first sentences filtered
+        self.filterer_planned = self.config["sentence_filter_plan_size"] <= 0
         self.splitter = MocySplitter()
-        # Set the gpu
-        cuda.set_device(self.config["gpu_index_to_use"])
-        self.lid = BertLid()
+        # Either a client of the LID service or a local model
+        self.lid = lid if lid is not None else load_lid(self.config)
+        # The language history of the users, see _filter_stage_user_prior
+        self.user_prior = UserPriorStore(self.config["user_prior_db_path"])
+        self.user_prior_policy = UserPriorPolicy.from_config(self.config)
+        self.stage_planner = StagePlanner(
+                            TweetFilter.filter_stages,
+                            order=self.config["stage_order"],
+                            stats_path=self.config["stage_stats_path"],
+                            constraints=TweetFilter.filter_stages_constraints)
         self.tweets = None
         self.processed_tweets_ids = None
         self.new_tweets_ids = set()
+        # The ids of the tweets of the files prepared but not committed yet.
+        # They are only added to the processed ids when their file is
+        # committed, such that a file left uncommitted (e.g. after a crash) is
+        # processed again with all its tweets.
+        self.uncommitted_tweets_ids = set()
 
         raw_tweets_stream_dir_path = self.config["raw_tweets_stream_dir_path"]
         raw_tweets_search_dir_path = self.config["raw_tweets_search_dir_path"]
@@ -78,20 +148,17 @@ class TweetFilter:
                                  for x in os.listdir(raw_tweets_search_dir_path)
                                  if x[-4:] == ".txt"]
 
-        # Create an empty file if the processed ids file does not exist
-        if not os.path.exists(self.config["processed_tweets_ids_path"]):
-            with open(self.config["processed_tweets_ids_path"], "w",
-                      encoding="utf8"):
-                pass
-
         Path(self.config["out_dir_tweet_processing"]).mkdir(parents=True,
                                                             exist_ok=True)
 
-        with open(self.config["processed_tweets_ids_path"], "r",
-                  encoding="utf8") as f:
-            ids = f.readlines()
-            ids = [id[:-1] if id[-1]=="\n" else id for id in ids]
-            self.processed_tweets_ids = set(ids)
+        # The ids of the tweets already processed. The text file given by
+        # processed_tweets_ids_path is imported when the store is created.
+        self.processed_tweets_ids = ProcessedIdStore(
+                    self.config["processed_tweets_ids_dir"],
+                    legacy_path=self.config["processed_tweets_ids_path"],
+                    horizon_days=self.config["processed_ids_horizon_days"],
+                    bloom_capacity=self.config["processed_ids_bloom_capacity"],
+                    max_segments=self.config["processed_ids_max_segments"])
 
         if not os.path.exists(self.config["sg_users_count_path"]):
             df = pd.DataFrame([], columns=["user_id", "gsw_tweet_count"])
@@ -173,15 +240,20 @@ class TweetFilter:
     def _filter_out_duplicates(self, tweets: List[Dict]) -> List[Dict]:
         """Filter out duplicated tweets based on the tweet id. A tweet is
         considered a duplicate either if another tweet in the list has the same
-        id, or if we already processed this tweet id in a previous batch"""
+        id, if we already processed this tweet id in a previous batch, or if
+        it belongs to a file prepared but not committed yet. The new ids are
+        added to the processed ids only when their file is committed, see
+        _update_processed_tweets."""
 
         filtered_tweets = []
         for tweet in tweets:
-            if "id_str" in tweet \
-            and not str(tweet["id_str"]) in self.processed_tweets_ids:
-                self.processed_tweets_ids.add(str(tweet["id_str"]))
-                self.new_tweets_ids.add(str(tweet["id_str"]))
-                filtered_tweets.append(tweet)
+            if "id_str" in tweet:
+                tweet_id = str(tweet["id_str"])
+                if tweet_id not in self.uncommitted_tweets_ids \
+                and tweet_id not in self.processed_tweets_ids:
+                    self.uncommitted_tweets_ids.add(tweet_id)
+                    self.new_tweets_ids.add(tweet_id)
+                    filtered_tweets.append(tweet)
         return filtered_tweets
 
     @accepts(Any, List[dict])
@@ -221,75 +293,69 @@ class TweetFilter:
                     raise ValueError("Cannot retrieve text from tweet")
         return sentences
 
-    @accepts(Any, Sentences)
-    @returns(Sentences)
-    def _preprocess(self, sentences: Sentences) -> Sentences:
+    @accepts(Any, SentenceBatch)
+    @returns(None)
+    def _preprocess_batch(self, batch: SentenceBatch):
         """Preprocess the text to remove special elements
         """
         print("    Specific twitter preprocessing")
-        clean_texts = []
-        for sentence in sentences:
-            idx = sentence[0]
-            text = sentence[1]
-            # Specific twitter preprocessing (remove RT, MT, mentions, hashtags,
-            # and urls)
-            for regex, replacement in self.config["preprocessing_regex"]:
+        regexs = self.config["preprocessing_regex"]
+        def preprocess(text):
+            # Specific twitter preprocessing (remove RT, MT, mentions,
+            # hashtags, and urls)
+            for regex, replacement in regexs:
                 text = re.sub(regex, replacement, text)
-            clean_texts.append((idx, text))
+            return text
+        batch.transform(preprocess)
 
         # remove hat elements
         print("    Removing hat elements")
-        sentences = clean_texts.copy()
-        clean_texts = []
-        for sentence in sentences:
-            idx = sentence[0]
-            text = Cleaner.remove_hat_element(sentence[1])
-            clean_texts.append((idx, text))
+        batch.transform(Cleaner.remove_hat_element)
 
         # remove smileys
         print("    Removing smileys")
-        sentences = clean_texts.copy()
-        clean_texts = []
-        for sentence in sentences:
-            idx = sentence[0]
-            text = Cleaner.remove_smileys(sentence[1])
-            clean_texts.append((idx, text))
+        batch.transform(Cleaner.remove_smileys)
 
         # remove html entities
         print("    Removing html entities")
-        sentences = clean_texts.copy()
-        clean_texts = []
-        for sentence in sentences:
-            idx = sentence[0]
-            text = Cleaner.remove_html_entities(sentence[1])
-            clean_texts.append((idx, text))
+        batch.transform(Cleaner.remove_html_entities)
 
         # uniformize punctuation
         print("    Uniformizing punctuation")
-        sentences = clean_texts.copy()
-        clean_texts = []
-        for sentence in sentences:
-            idx = sentence[0]
-            text = Cleaner.clean_punc(sentence[1])
-            clean_texts.append((idx, text))
+        batch.transform(Cleaner.clean_punc)
 
-        return clean_texts
+    @accepts(Any, Sentences)
+    @returns(Sentences)
+    def _preprocess(self, sentences: Sentences) -> Sentences:
+        """List wrapper of '_preprocess_batch'"""
+        batch = SentenceBatch.from_sentences(sentences)
+        self._preprocess_batch(batch)
+        return batch.to_sentences()
+
+    @staticmethod
+    @accepts(SentenceBatch)
+    @returns(None)
+    def _normalize_batch(batch: SentenceBatch):
+        """Apply 'normalize_text' to all the sentences of a batch"""
+        batch.transform_many(lambda texts: normalize_many(texts,
+                                                          strip_emojis=True))
 
     @staticmethod
     @accepts(Sentences)
     @returns(Sentences)
     def _normalize_texts(sentences: Sentences) -> Sentences:
-        """Wrapper on 'normalize_text' that applies the function to all elements
-        of a list"""
-
-        normalized = []
-        for sentence in sentences:
-            idx = sentence[0]
-            text = sentence[1]
-            text = normalize_text(text, strip_emojis=True)
-            normalized.append((idx, text))
-
-        return normalized
+        """List wrapper of '_normalize_batch'"""
+        batch = SentenceBatch.from_sentences(sentences)
+        TweetFilter._normalize_batch(batch)
+        return batch.to_sentences()
+
+    @accepts(Any, SentenceBatch)
+    @returns(SentenceBatch)
+    def _split_batch(self, batch: SentenceBatch) -> SentenceBatch:
+        """Split each text of a batch into sentences. Returns a new batch
+        where each sentence keeps the index of its text and its position in
+        the split."""
+        return batch.split(self.splitter.split_many)
 
     @accepts(Any, Sentences)
     @returns(Sentences)
@@ -297,74 +363,98 @@ class TweetFilter:
         """For each text of a list, split the text into sentences and associate
         each sentence to the index of the text. Return the list of tuple [index,
         sentence]"""
+        return self._split_batch(
+                            SentenceBatch.from_sentences(sentences)).to_sentences()
 
-        splits = [(idx, self.splitter.split(text))
-                  for idx, text in sentences]
-        sentences = [(idx, text) for idx, split in splits
-                     for text in split]
-        return sentences
+    @staticmethod
+    @accepts(SentenceBatch)
+    @returns(None)
+    def _remove_sentences_with_special_chars_batch(batch: SentenceBatch):
+        """Remove sentences that contains at least one very special characters
+        """
+        batch.filter_many(GOOD_CHARS.contains_only_many)
 
     @staticmethod
     @accepts(Sentences)
     @returns(Sentences)
     def _remove_sentences_with_special_chars(sentences: Sentences) -> Sentences:
-        """Remove sentences that contains at least one very special characters
-        """
+        """List wrapper of '_remove_sentences_with_special_chars_batch'"""
+        batch = SentenceBatch.from_sentences(sentences)
+        TweetFilter._remove_sentences_with_special_chars_batch(batch)
+        return batch.to_sentences()
 
-        chars_ok = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
-        chars_ok += "ÀÁÂÄÈÉÊËÍÌÎÏÓÒÔÖÚÙÛÜàáâäèéêëìíîïôöòóüùúûÿ"
-        chars_ok += " -,.?!0123456789%&\"\'()/$*+:;<=>[]\\^_{}|\\~€°²"
-        chars_ok = set(chars_ok)
-
-        return [x for x in sentences
-                if len(set(x[1]).difference(chars_ok))==0]
+    @staticmethod
+    @accepts(SentenceBatch, int)
+    @returns(None)
+    def _remove_groups_of_special_chars_batch(batch: SentenceBatch,
+                                              from_size: int):
+        batch.transform(lambda text:
+                        Cleaner.remove_groups_of_special_chars(text, from_size))
 
     @staticmethod
     @accepts(Sentences, int)
     @returns(Sentences)
     def _remove_groups_of_special_chars(sentences: Sentences,
                                         from_size: int) -> Sentences:
-        return [(idx, Cleaner.remove_groups_of_special_chars(text, from_size))
-                for idx, text in sentences]
+        batch = SentenceBatch.from_sentences(sentences)
+        TweetFilter._remove_groups_of_special_chars_batch(batch, from_size)
+        return batch.to_sentences()
+
+    @staticmethod
+    @accepts(SentenceBatch, int)
+    @returns(None)
+    def _remove_sentences_with_special_words_batch(batch: SentenceBatch,
+                                                   max_char: int):
+        """Remove sentences with words containing too much special characters.
+        """
+        def keep_many(texts):
+            # The special characters of a whole sentence bound the ones of
+            # each word, so only the sentences above the limit are split into
+            # words
+            counts = WORD_CHARS.count_others_many(texts)
+            return [count <= max_char
+                    or all(x <= max_char for x in
+                           WORD_CHARS.count_others_many(text.split()))
+                    for text, count in zip(texts, counts)]
+        batch.filter_many(keep_many)
 
     @staticmethod
     @accepts(Sentences, int)
     @returns(Sentences)
     def _remove_sentences_with_special_words(sentences: Sentences,
                                              max_char: int) -> Sentences:
-        """Remove sentences with words containing too much special characters.
-        """
+        """List wrapper of '_remove_sentences_with_special_words_batch'"""
+        batch = SentenceBatch.from_sentences(sentences)
+        TweetFilter._remove_sentences_with_special_words_batch(batch, max_char)
+        return batch.to_sentences()
 
-        chars_ok = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
-        chars_ok += "ÀÁÂÄÈÉÊËÍÌÎÏÓÒÔÖÚÙÛÜàáâäèéêëìíîïôöòóüùúûÿ"
-        chars_ok += "0123456789"
-        chars_ok = set(chars_ok)
-
-        res = []
-        for sentence in sentences:
-            words = sentence[1].split()
-            ok = True
-            for word in words:
-                if len([c for c in word if c not in chars_ok]) > max_char:
-                    ok = False
-            if ok:
-                res.append(sentence)
-        return res
+    @staticmethod
+    @accepts(SentenceBatch)
+    @returns(None)
+    def _remove_isolated_special_chars_batch(batch: SentenceBatch):
+        batch.transform(Cleaner.remove_isolated_special_chars)
 
     @staticmethod
     @accepts(Sentences)
     @returns(Sentences)
     def _remove_isolated_special_chars(sentences: Sentences) -> Sentences:
-        return [(idx, Cleaner.remove_isolated_special_chars(text))
-                for idx, text in sentences]
+        batch = SentenceBatch.from_sentences(sentences)
+        TweetFilter._remove_isolated_special_chars_batch(batch)
+        return batch.to_sentences()
 
+    @staticmethod
+    @accepts(SentenceBatch)
+    @returns(None)
+    def _remove_special_duplication_batch(batch: SentenceBatch):
+        batch.transform(Cleaner.remove_special_duplication)
 
     @staticmethod
     @accepts(Sentences)
     @returns(Sentences)
     def _remove_special_duplication(sentences: Sentences) -> Sentences:
-        return [(idx, Cleaner.remove_special_duplication(text))
-                for idx, text in sentences]
+        batch = SentenceBatch.from_sentences(sentences)
+        TweetFilter._remove_special_duplication_batch(batch)
+        return batch.to_sentences()
 
     # @staticmethod
     # @accepts(Sentences)
@@ -402,6 +492,18 @@ class TweetFilter:
     #
     #     return cleaned
 
+    @accepts(Any, SentenceBatch)
+    @returns(None)
+    def _filter_valid_sentences_batch(self, batch: SentenceBatch):
+        """Filter out all sentences that are not considered well-formed,
+        according to rules defined in the corresponding yaml file.
+        """
+        if not self.filterer_planned and len(batch) > 0:
+            plan_size = self.config["sentence_filter_plan_size"]
+            self.filterer.plan(batch.kept_texts()[:plan_size])
+            self.filterer_planned = True
+        batch.filter(self.filterer.is_valid)
+
     @accepts(Any, Sentences)
     @returns(Sentences)
     def _filter_valid_sentences(self, sentences: Sentences) -> Sentences:
@@ -410,15 +512,40 @@ class TweetFilter:
         takes a list of tuple [index, sentence] as input and output the same
         list, with some elements filtered out.
         """
-        return [(idx, text) for idx, text in sentences
-                            if self.filterer.is_valid(text)]
-
-    @accepts(Any, List[int])
+        batch = SentenceBatch.from_sentences(sentences)
+        self._filter_valid_sentences_batch(batch)
+        return batch.to_sentences()
+
+    @accepts(Any, Sentences_pred)
+    @returns(Any)
+    def _qualified_users(self, sentences_pred):
+        """Returns the ids of the users whose user.location field can be
+        geocoded according to 'geocode_policy', or None if all of them can.
+        With the "qualified" policy, a user qualifies once it has
+        'geocode_qualification_count' sentences above 'threshold_new_sg_user',
+        counting the ones already recorded and the given ones."""
+        if self.config["geocode_policy"] == "always":
+            return None
+        elif self.config["geocode_policy"] != "qualified":
+            raise ValueError("Unknown geocode_policy '" +
+                             str(self.config["geocode_policy"]) + "'")
+        counts = load_users_counts(self.config["sg_users_count_path"])
+        for idx, _, prediction in sentences_pred:
+            if prediction >= self.config["threshold_new_sg_user"]:
+                user_id = str(self.tweets[idx]["user"]["id_str"])
+                counts[user_id] = counts.get(user_id, 0) + 1
+        return {user_id for user_id, count in counts.items()
+                if count >= self.config["geocode_qualification_count"]}
+
+    @accepts(Any, List[int], Any)
     @returns(Idx_to_location)
-    def _geocode_tweets(self, indices: List[int]) -> Idx_to_location:
+    def _geocode_tweets(self, indices: List[int],
+                        qualified_users=None) -> Idx_to_location:
         """From a list of indices, retrieve the location from the tweets and
-        forward geocode the location. The method returns a dict mapping each
-        index to a tuple [location, coordinates, type]
+        forward geocode the location. If 'qualified_users' is given, only the
+        user.location field of these users is geocoded, the others get the
+        source "Pending" (see _qualified_users). The method returns a dict
+        mapping each index to a tuple [location, coordinates, type]
             location : location object, according to 'type'.
                 - type==gps : the location will be a list of [Long, Lat]
                 - type==place : the location will be a 'twitter place' object
@@ -432,8 +559,8 @@ class TweetFilter:
                 - locationiq : forward geocoding from the user.location field of
                                the tweet using the locationIQ api.
         """
-        self.geocoder.open_mapping_file()
         idx_to_location = dict()
+        places = []
         # Get the indices of all tweets we want to geocode.
         indices = set(indices)
         for idx in tqdm(indices):
@@ -453,23 +580,35 @@ class TweetFilter:
                     print("Warning, multiple polygons to define a place " +
                     "(tweet id: " + str(tweet["id_str"]) + ")")
                     print(polygon)
-                longitudes = [x[0] for x in polygon[0]]
-                latitudes = [x[1] for x in polygon[0]]
-
-                longitude = mean([min(longitudes), max(longitudes)])
-                latitude = mean([min(latitudes), max(latitudes)])
-                coordinates = (float(longitude), float(latitude))
-                loc_type = "Twitter_place"
-                idx_to_location[idx] = (location, coordinates, loc_type)
+                # The centers of the bounding boxes are computed at once
+                places.append((idx, location, polygon[0]))
             elif "user" in tweet and "location" in tweet["user"]:
                 location_str = tweet["user"]["location"]
                 if location_str is None:
                     location_str = ""
                 found = False
-                if len(location_str) > 1:
+                if len(location_str) > 1 and qualified_users is not None \
+                and str(tweet["user"].get("id_str", None)) \
+                    not in qualified_users:
+                    # Geocoded by the worker once the user qualifies
+                    idx_to_location[idx] = (None, (0.0, 0.0),
+                                            Geocoder.pending_source)
+                    found = True
+                elif len(location_str) > 1:
                     try:
-                        location = self.geocoder.forward_geocode(location_str)
-                        if len(location[0].keys()) > 0:
+                        user_id = tweet["user"].get("id_str", None)
+                        if user_id is not None:
+                            location = self.geocoder.geocode_user_location(
+                                                    str(user_id), location_str)
+                        else:
+                            location = self.geocoder.forward_geocode(
+                                                                location_str)
+                        if location[1] == Geocoder.pending_source:
+                            # Backfilled later by the geocoding worker
+                            idx_to_location[idx] = (location, (0.0, 0.0),
+                                                    location[1])
+                            found = True
+                        elif len(location[0].keys()) > 0:
                             coordinates = (float(location[0]["lon"]),
                                            float(location[0]["lat"]))
                             loc_type = location[1]
@@ -486,6 +625,11 @@ class TweetFilter:
             elif "user" in tweet:
                 idx_to_location[idx] = (None, (0.0,0.0), "")
 
+        longitudes, latitudes = bbox_centroids([x[2] for x in places])
+        for (idx, location, _), longitude, latitude in zip(places, longitudes,
+                                                            latitudes):
+            coordinates = (float(longitude), float(latitude))
+            idx_to_location[idx] = (location, coordinates, "Twitter_place")
 
         self.geocoder.clean()
         return idx_to_location
@@ -518,57 +662,276 @@ class TweetFilter:
                         * Geocoder_CH_word : the coordinates were retrievec by
                           querying locationiq with a CH word (city name, postal
                           code...) found in the user.location field
+                        * Gazetteer : the user.location field matches a swiss
+                          place of the local gazetteer
+                        * Fuzzy_match : the user.location field is close to a
+                          location already found or to a gazetteer entry
+                        * Pending : the user.location field is waiting to be
+                          geocoded by the geocoding worker, which will fill
+                          in the coordinates and the source
                         * "" : No location available
                     - The raw tweet object corresponding to the sentence
         """
         gsw_tweets = []
+        # The tweets are projections of the raw lines, the full objects are
+        # decoded only here, once per tweet
+        full_tweets = dict()
+        # Locations of the tweets tested all at once
+        in_switzerland = dict()
+        if not keep_foreign:
+            tweet_ids = list(dict.fromkeys(x[0] for x in sentences_pred))
+            in_switzerland = dict(zip(tweet_ids,
+                                self.geocoder.are_coords_in_switzerland_batch(
+                                    [idx_to_location[x][1] for x in tweet_ids])))
         for sentence_pred in sentences_pred:
             tweet_id = sentence_pred[0]
             coords = idx_to_location[tweet_id][1]
             geo_source = idx_to_location[tweet_id][2]
+            # The pending locations are filtered by the geocoding worker
             if keep_foreign \
-            or self.geocoder.are_coords_in_switzerland(coords):
+            or geo_source == Geocoder.pending_source \
+            or in_switzerland[tweet_id]:
+                if tweet_id not in full_tweets:
+                    full_tweets[tweet_id] = materialize(self.tweets[tweet_id])
                 gsw_tweets.append((sentence_pred[1],
                                    coords,
                                    sentence_pred[2],
                                    geo_source,
                                    self.tweets[tweet_id]["user"]["id_str"],
-                                   self.tweets[tweet_id]))
+                                   full_tweets[tweet_id]))
 
         return gsw_tweets
 
-    @accepts(Any, Sentences)
-    @returns(Sentences_pred)
-    def _filter_gsw_sentences(self, sentences):
-        """Filter out all sentences that are not detected as Swiss-German
-        """
-        # Predict Swiss-German
-        sentences_list = [sentence[1] for sentence in sentences]
+    @accepts(Any, List[int])
+    @returns(Any)
+    def _known_foreign_tweets(self, indices):
+        """Returns the indices of the tweets that are known to be located
+        outside of Switzerland without calling locationiq, i.e. the tweets
+        _attach_gsw_location would drop when 'keep_foreign_location' is false.
+        The location is found as in _geocode_tweets : GPS coordinates, center
+        of the twitter place, or user.location field if its result is cached
+        or in the gazetteer. The tweets without any location are returned as
+        well. The tweets whose location is not known yet are not, neither are
+        the user.location fields with the "qualified" geocode_policy, since
+        they may be left to the geocoding worker."""
+        foreign = set()
+        candidates = []
+        coords = []
+        places = []
+        for idx in dict.fromkeys(indices):
+            tweet = self.tweets[idx]
+            if tweet.get("coordinates", None):
+                location = tweet["coordinates"]["coordinates"]
+                candidates.append(idx)
+                coords.append((float(location[0]), float(location[1])))
+            elif tweet.get("place", None) \
+            and tweet["place"].get("bounding_box", None) \
+            and tweet["place"]["bounding_box"].get("coordinates", None) \
+            and len(tweet["place"]["bounding_box"]["coordinates"]) > 0:
+                places.append((idx,
+                               tweet["place"]["bounding_box"]["coordinates"][0]))
+            elif "user" in tweet and "location" in tweet["user"]:
+                location_str = tweet["user"]["location"]
+                if location_str is None or len(location_str) <= 1:
+                    foreign.add(idx)
+                elif self.config["geocode_policy"] == "always":
+                    user_id = tweet["user"].get("id_str", None)
+                    location = self.geocoder.lookup_local(
+                                    None if user_id is None else str(user_id),
+                                    location_str)
+                    if location is None \
+                    or location[1] == Geocoder.pending_source:
+                        continue
+                    elif len(location[0].keys()) > 0:
+                        candidates.append(idx)
+                        coords.append((float(location[0]["lon"]),
+                                       float(location[0]["lat"])))
+                    else:
+                        foreign.add(idx)
+            elif "user" in tweet:
+                foreign.add(idx)
+
+        longitudes, latitudes = bbox_centroids([x[1] for x in places])
+        candidates += [x[0] for x in places]
+        coords += [(float(lon), float(lat))
+                   for lon, lat in zip(longitudes, latitudes)]
+        for idx, inside in zip(candidates,
+                        self.geocoder.are_coords_in_switzerland_batch(coords)):
+            if not inside:
+                foreign.add(idx)
+        return foreign
+
+    @accepts(Any, List[Any])
+    @returns(None)
+    def _filter_stage_swiss_location(self, pending_files):
+        """Filter stage dropping the sentences of the tweets known to be
+        located outside of Switzerland, see _known_foreign_tweets"""
+        for pending in pending_files:
+            self.tweets = pending.tweets
+            foreign = self._known_foreign_tweets(
+                                            [x[0] for x in pending.sentences])
+            pending.keep([x[0] not in foreign for x in pending.sentences])
+
+    @accepts(Any, int)
+    @returns(Any)
+    def _user_id(self, idx):
+        """Returns the user id of a tweet, or None if it has no user"""
+        user_id = self.tweets[idx].get("user", dict()).get("id_str", None)
+        return None if user_id is None else str(user_id)
+
+    @accepts(Any, Any)
+    @returns(Any)
+    def _user_priors(self, pending):
+        """Returns the user id of each sentence of a pending file, and the
+        history of these users"""
+        self.tweets = pending.tweets
+        user_ids = [self._user_id(x[0]) for x in pending.sentences]
+        return user_ids, self.user_prior.get_many(
+                                        [x for x in user_ids if x is not None])
+
+    @accepts(Any, List[Any])
+    @returns(None)
+    def _filter_stage_user_prior(self, pending_files):
+        """Filter stage dropping the sentences of the users with a strong
+        negative history, except the ones sampled for audit (see
+        UserPriorPolicy). The sentences already scored are kept."""
+        for pending in pending_files:
+            user_ids, priors = self._user_priors(pending)
+            pending.keep([prediction is not None
+                          or not self.user_prior_policy.skip(priors.get(x,
+                                                                        None))
+                          for x, prediction in zip(user_ids,
+                                                   pending.predictions)])
+
+    @accepts(Any, List[Any])
+    @returns(None)
+    def _filter_stage_lid(self, pending_files):
+        """Filter stage running the language identification once on the
+        sentences of all the pending files, and keeping the gsw ones along
+        with their prediction. With 'user_prior_fast_track', the sentences of
+        the users with a strong positive history get a lighter check : they
+        are scored on their first 'user_prior_fast_track_words' words only,
+        and their score is not added to the history of the user."""
+        threshold = self.config["lid_threshold"]
+        fast_track = self.config["use_user_prior"] \
+                     and self.user_prior_policy.fast_track
+        max_words = self.config["user_prior_fast_track_words"]
+        texts = []
+        # Per pending file, the user id of each sentence and whether it is
+        # fast tracked
+        pending_users = []
+        fast_tracked_count = 0
+        for pending in pending_files:
+            if fast_track:
+                user_ids, priors = self._user_priors(pending)
+            else:
+                self.tweets = pending.tweets
+                user_ids = [self._user_id(x[0]) for x in pending.sentences]
+                priors = dict()
+            fast_tracked = []
+            for (idx, text), user_id in zip(pending.sentences, user_ids):
+                prior = priors.get(user_id, None)
+                if self.user_prior_policy.fast_tracked(prior):
+                    fast_tracked.append(True)
+                    texts.append(" ".join(text.split()[:max_words]))
+                    fast_tracked_count += 1
+                else:
+                    fast_tracked.append(False)
+                    texts.append(text)
+            pending_users.append((user_ids, fast_tracked))
+        if fast_track:
+            print(f"  => {fast_tracked_count} sentences fast tracked")
+
+        predictions = iter(self._predict_gsw(texts))
+        for pending, (user_ids, fast_tracked) in zip(pending_files,
+                                                     pending_users):
+            pending.predictions = []
+            for user_id, fast in zip(user_ids, fast_tracked):
+                prediction = next(predictions)
+                pending.predictions.append(prediction)
+                if user_id is not None and not fast:
+                    pending.scored.append((user_id, prediction,
+                                           prediction >= threshold))
+            pending.keep([x >= threshold for x in pending.predictions])
+
+    @accepts(Any)
+    @returns(List[str])
+    def _enabled_filter_stages(self):
+        """Returns the filter stages that apply with the current config"""
+        disabled = set()
+        if self.config["keep_foreign_location"]:
+            disabled.add("swiss_location")
+        if not self.config["use_user_prior"]:
+            disabled.add("user_prior")
+        return [x for x in TweetFilter.filter_stages if x not in disabled]
+
+    @accepts(Any, List[Any])
+    @returns(None)
+    def _run_filter_stages(self, pending_files):
+        """Apply the filter stages to the sentences of the pending files, in
+        the order given by the stage planner. The count of sentences and the
+        time of each stage are recorded by the planner, such that the stages
+        dropping the most sentences per second are run first."""
+        for stage in self.stage_planner.order(self._enabled_filter_stages()):
+            count = sum(len(pending.sentences) for pending in pending_files)
+            if count == 0:
+                break
+            print(f"Filter stage {stage} on {count} sentences from " +
+                  f"{len(pending_files)} files...")
+            start = time.time()
+            getattr(self, "_filter_stage_" + stage)(pending_files)
+            elapsed = time.time() - start
+            kept = sum(len(pending.sentences) for pending in pending_files)
+            self.stage_planner.record(stage, count, kept, elapsed)
+            print(f"  => {kept} sentences")
+        self.stage_planner.save()
+
+    @accepts(Any, List[str])
+    @returns(List[float])
+    def _predict_gsw(self, texts):
+        """Returns the Swiss-German prediction of each text"""
         predictions = []
-        # separate in batches to avoid cuda out of memory error
-        for i in tqdm(range(math.ceil(len(sentences_list)/100))):
-            left = i*100
-            right = (i+1)*100
-            batch = sentences_list[left:right]
-            if len(batch) > 0:
-                predictions.extend(self.lid.predict_label(batch))
-        if len(sentences_list) != len(predictions):
+        if lid_batches_itself(self.config):
+            # The service and the pool of workers build the batches
+            predictions = self.lid.predict_label(texts)
+        else:
+            # separate in batches to avoid cuda out of memory error
+            for i in tqdm(range(math.ceil(len(texts)/100))):
+                left = i*100
+                right = (i+1)*100
+                batch = texts[left:right]
+                if len(batch) > 0:
+                    predictions.extend(self.lid.predict_label(batch))
+        if len(texts) != len(predictions):
             raise Exception("predictions and sentences_list must have the " +
                             "same length")
+        predictions = [float(x) for x in predictions]
 
-        # Create the gsw_tweet object for each prediction that exceeds a
-        # threshold
+        if not lid_batches_itself(self.config):
+            gc.collect()
+            cuda.empty_cache()
+        return predictions
+
+    @accepts(Any, Sentences, List[float])
+    @returns(Sentences_pred)
+    def _keep_gsw_sentences(self, sentences, predictions):
+        """Create the gsw_tweet object for each prediction that exceeds a
+        threshold"""
         filtered = []
         for i in range(len(sentences)):
-            prediction = float(predictions[i])
+            prediction = predictions[i]
             if prediction >= self.config["lid_threshold"]:
                 filtered.append((sentences[i][0], sentences[i][1], prediction))
-
-        del(predictions)
-        gc.collect()
-        cuda.empty_cache()
         return filtered
 
+    @accepts(Any, Sentences)
+    @returns(Sentences_pred)
+    def _filter_gsw_sentences(self, sentences):
+        """Filter out all sentences that are not detected as Swiss-German
+        """
+        predictions = self._predict_gsw([sentence[1] for sentence in sentences])
+        return self._keep_gsw_sentences(sentences, predictions)
+
     @accepts(Any, GSW_tweets)
     @returns(GSW_tweets)
     def _remove_non_gsw_accent(self, gsw_tweets):
@@ -583,7 +946,10 @@ class TweetFilter:
         dir_path = self.config["out_dir_tweet_processing"]
         out_path = get_new_file_path(dir_path, ".pkl")
 
-        save_obj(gsw_tweets, out_path)
+        # Write to a temporary file first, such that a partially written
+        # pickle is never picked up by concat_out_process
+        save_obj(gsw_tweets, out_path + ".tmp")
+        os.replace(out_path + ".tmp", out_path)
 
         msg = "Writing " + str(len(gsw_tweets)) + " sentences to " + \
               str(out_path)
@@ -618,12 +984,156 @@ class TweetFilter:
     @accepts(Any)
     @returns(None)
     def _update_processed_tweets(self):
-        """Update the processed tweets ids."""
-        with open(self.config["processed_tweets_ids_path"], "a", encoding="utf8") as f:
-            for id in self.new_tweets_ids:
-                f.write(str(id) + "\n")
+        """Add the ids of the tweets of the committed file (new_tweets_ids)
+        to the processed ids, and write them on disk."""
+        self.processed_tweets_ids.add_many(self.new_tweets_ids)
+        self.processed_tweets_ids.flush()
+        self.uncommitted_tweets_ids -= self.new_tweets_ids
         self.new_tweets_ids = set()
 
+    @accepts(Any, str)
+    @returns(List[dict])
+    def _load_raw_tweets(self, path):
+        """Load the raw tweets of a file written by the streamer. Only the
+        fields used by the pipeline are kept, see raw_tweets.py"""
+        print("Loading " + path + "...")
+        return load_records(path, self.config["raw_tweets_read_chunk_size"])
+
+    @accepts(Any, str, str)
+    @returns(Any)
+    def _prepare_file(self, path, source):
+        """Apply the text stages of the pipeline to a raw tweets file, i.e.
+        everything before the language identification. Returns a PendingFile
+        holding the tweets, the sentences to classify and the ids of the new
+        tweets found in the file."""
+        self.tweets = self._load_raw_tweets(path)
+        print("Processing...")
+        print("  => " + str(len(self.tweets)) + " raw tweets")
+        self.tweets = TweetFilter._extract_sub_tweets(self.tweets)
+        print("  => " + str(len(self.tweets)) + " sub-tweets")
+        self.tweets = self._filter_out_duplicates(self.tweets)
+        print("  => " + str(len(self.tweets)) + " unique tweets " +
+            " not already processed")
+        # Extract the text for each tweet. At this point 'sentences'
+        # represents a list of tuple, each tuple containing the index of
+        # the tweet (i.e. index of self.tweets) and the corresponding
+        # text
+        print("Extract text from tweets")
+        # The text stages run on a columnar batch: the filters only clear
+        # bits of its keep mask, and the transforms rewrite its texts in place
+        batch = SentenceBatch.from_sentences(
+                            TweetFilter._extract_text_from_tweets(self.tweets))
+        print("Preprocessing text")
+        self._preprocess_batch(batch)
+
+        print("Normalizing text")
+        TweetFilter._normalize_batch(batch)
+
+        print("Splitting text")
+        batch = self._split_batch(batch)
+        print(f"=> {len(batch)} sentences")
+
+        print("Removing sentences that contain at least one very " +
+              "special character")
+        TweetFilter._remove_sentences_with_special_chars_batch(batch)
+        print(f"=> {len(batch)} sentences")
+
+        print("Removing words that are composed only of special " +
+              "chars")
+        TweetFilter._remove_groups_of_special_chars_batch(
+                                    batch, self.config["min_char_special_group"])
+
+        print("Removing sentences containing words with too much " +
+              "special characters")
+        TweetFilter._remove_sentences_with_special_words_batch(
+                                    batch, self.config["max_special_char_in_word"])
+        print(f"  => {len(batch)} sentences")
+
+        print("Removing duplication of special characters")
+        TweetFilter._remove_special_duplication_batch(batch)
+
+        print("Removing isolated special chars")
+        TweetFilter._remove_isolated_special_chars_batch(batch)
+
+        print("Filtering valid sentences")
+        self._filter_valid_sentences_batch(batch)
+        print(f"  => {len(batch)} well formed sentences")
+
+        sentences = batch.to_sentences()
+        pending = PendingFile(path, source, self.tweets, sentences,
+                              self.new_tweets_ids)
+        self.new_tweets_ids = set()
+        return pending
+
+    @accepts(Any, Any, Sentences_pred, dict)
+    @returns(None)
+    def _commit_file(self, pending, sentences_pred, cur_gsw_fetched):
+        """Apply the stages following the language identification to the
+        sentences of a single raw tweets file, then commit the file : write
+        the gsw tweets, update the users and the processed ids, and remove the
+        raw file."""
+        self.tweets = pending.tweets
+        self.new_tweets_ids = pending.new_tweets_ids
+        print(f"  => {len(sentences_pred)} gsw sentences found in " +
+              pending.path)
+        cur_gsw_fetched[pending.source] += len(sentences_pred)
+
+        print("Geocoding...")
+        indices = [x[0] for x in sentences_pred]
+        idx_to_location = self._geocode_tweets(
+                                    indices,
+                                    self._qualified_users(sentences_pred))
+        gsw_tweets = self._attach_gsw_location(
+                            sentences_pred,
+                            idx_to_location,
+                            self.config["keep_foreign_location"])
+        if not self.config["keep_foreign_location"]:
+            print(f"  => {len(gsw_tweets)} sentences " +
+                  "geolocalized in Switzerland")
+
+        print("Removing non gsw accents")
+        gsw_tweets = self._remove_non_gsw_accent(gsw_tweets)
+
+        # The output is written first, then the processed ids, and the raw
+        # file is removed last. If the process is interrupted in between,
+        # the raw file is processed again rather than lost. The language
+        # history is updated once the ids are processed, such that the
+        # sentences of a file processed again are not counted twice.
+        print("Writing gsw tweets on disk...")
+        self._write_gsw_tweets(gsw_tweets)
+
+        print("Writing Swiss-German twitter users...")
+        count = self._write_new_sg_users(gsw_tweets)
+        print(f"  => {count} new Swiss-German users found")
+
+        print("Updating processed tweets ids")
+        self._update_processed_tweets()
+
+        print("Updating the language history of the users")
+        self.user_prior.update_many(pending.scored)
+        os.remove(pending.path)
+        print("Done")
+
+        msg = "GSW sentences fetched from stream : " + \
+              str(cur_gsw_fetched["stream"])
+        print(msg)
+        logging.info(msg)
+        msg = "GSW sentences fetched from search : " + \
+              str(cur_gsw_fetched["search"])
+        print(msg)
+        logging.info(msg)
+
+    @accepts(Any, List[Any], dict)
+    @returns(None)
+    def _process_pending_files(self, pending_files, cur_gsw_fetched):
+        """Run the filter stages (e.g. the language identification) once on
+        the sentences of all the pending files, then commit each file
+        separately."""
+        self._run_filter_stages(pending_files)
+        for pending in pending_files:
+            self._commit_file(pending, pending.sentences_pred(),
+                              cur_gsw_fetched)
+
     def process(self, cur_gsw_fetched):
         """Process all tweets according to the pipeline :
         1. Extract sub-tweets
@@ -634,12 +1144,22 @@ class TweetFilter:
         6. Split text into sentences
         7. Remove special characters
         8. Keep well-formed sentences
-        9. Forward geocode
-        10. Attach Swiss-german location
-        11. Filter Swiss-german language
+        9. Filter stages : Swiss-german language, users with a strong
+           non Swiss-german history, and if 'keep_foreign_location' is
+           false, tweets known to be located outside of Switzerland (see
+           _run_filter_stages)
+        10. Forward geocode
+        11. Attach Swiss-german location
         12. Write the gsw tweets on disk
-        13. Update the Swiss-German twitter users
+        13. Update the Swiss-German twitter users and the language history
+            of the users
         14. Update the processed tweets ids
+
+        The filter stages of step 9 are run in the order set by 'stage_order'.
+        If 'lid_cross_file_batching' is set, steps 1 to 8 are applied to
+        several files until at least 'lid_min_batch_sentences' sentences are
+        gathered, such that the language identification receives full
+        batches. Steps 10 to 14 are still applied file by file.
         """
 
         msg = "GSW sentences fetched from stream : " + \
@@ -651,122 +1171,27 @@ class TweetFilter:
         print(msg)
         logging.info(msg)
 
+        if self.config["lid_cross_file_batching"]:
+            min_batch_sentences = self.config["lid_min_batch_sentences"]
+        else:
+            min_batch_sentences = 0
+
+        # The files left uncommitted by a previous call are processed again
+        self.uncommitted_tweets_ids = set()
         try:
-            paths_used = []
+            pending_files = []
+            pending_count = 0
             for path, source in self.raw_tweets_paths:
-                with open(path, "r", encoding="utf8") as f:
-            #for path, source in self.raw_tweets_paths:
-            #    with open(path, "r", encoding="utf8") as f:
-                    print("Loading " + path + "...")
-                    raw_tweets = f.readlines()
-                    raw_tweets = [x for x in raw_tweets if x != '\n']
-                    #self.tweets = [json.loads(x) for x in raw_tweets]
-                    tmp = []
-                    for x in raw_tweets:
-                        try:
-                            tmp.append(json.loads(x))
-                        except Exception:
-                            print("*********************")
-                            print(x)
-                            print("*********************")
-                    self.tweets = tmp
-                    print("Processing...")
-                    print("  => " + str(len(self.tweets)) + " raw tweets")
-                    self.tweets = TweetFilter._extract_sub_tweets(self.tweets)
-                    print("  => " + str(len(self.tweets)) + " sub-tweets")
-                    self.tweets = self._filter_out_duplicates(self.tweets)
-                    print("  => " + str(len(self.tweets)) + " unique tweets " +
-                        " not already processed")
-                    # Extract the text for each tweet. At this point 'sentences'
-                    # represents a list of tuple, each tuple containing the index of
-                    # the tweet (i.e. index of self.tweets) and the corresponding
-                    # text
-                    print("Extract text from tweets")
-                    sentences = TweetFilter._extract_text_from_tweets(
-                                                                    self.tweets)
-                    print("Preprocessing text")
-                    sentences = self._preprocess(sentences)
-
-                    print("Normalizing text")
-                    sentences = TweetFilter._normalize_texts(sentences)
-
-                    print("Splitting text")
-                    sentences = self._split_texts(sentences)
-                    print(f"=> {len(sentences)} sentences")
-
-                    print("Removing sentences that contain at least one very " +
-                          "special character")
-                    f = TweetFilter._remove_sentences_with_special_chars
-                    sentences = f(sentences)
-                    print(f"=> {len(sentences)} sentences")
-
-                    print("Removing words that are composed only of special " +
-                          "chars")
-                    f = TweetFilter._remove_groups_of_special_chars
-                    sentences = f(sentences,
-                                  self.config["min_char_special_group"])
-
-                    print("Removing sentences containing words with too much " +
-                          "special characters")
-                    f = self._remove_sentences_with_special_words
-                    max_char = self.config["max_special_char_in_word"]
-                    sentences = f(sentences, max_char)
-                    print(f"  => {len(sentences)} sentences")
-
-                    print("Removing duplication of special characters")
-                    f = TweetFilter._remove_special_duplication
-                    sentences = f(sentences)
-
-                    print("Removing isolated special chars")
-                    f = TweetFilter._remove_isolated_special_chars
-                    sentences = f(sentences)
-
-                    print("Filtering valid sentences")
-                    sentences = self._filter_valid_sentences(sentences)
-                    print(f"  => {len(sentences)} well formed sentences")
-
-                    print("Filtering gsw...")
-                    # sentences_pred: elements are (idx, sentence, prediction)
-                    sentences_pred = self._filter_gsw_sentences(sentences)
-                    print(f"  => {len(sentences_pred)} gsw sentences found")
-                    cur_gsw_fetched[source] += len(sentences_pred)
-
-                    print("Geocoding...")
-                    indices = [x[0] for x in sentences_pred]
-                    idx_to_location = self._geocode_tweets(indices)
-                    gsw_tweets = self._attach_gsw_location(
-                                        sentences_pred,
-                                        idx_to_location,
-                                        self.config["keep_foreign_location"])
-                    if not self.config["keep_foreign_location"]:
-                        print(f"  => {len(gsw_tweets)} sentences " +
-                              "geolocalized in Switzerland")
-
-                    print("Removing non gsw accents")
-                    gsw_tweets = self._remove_non_gsw_accent(gsw_tweets)
-
-                    print("Writing gsw tweets on disk...")
-                    self._write_gsw_tweets(gsw_tweets)
-
-                    print("Writing Swiss-German twitter users...")
-                    count = self._write_new_sg_users(gsw_tweets)
-                    print(f"  => {count} new Swiss-German users found")
-
-                    print("Updating processed tweets ids")
-                    self._update_processed_tweets()
-                    print("Done")
-
-
-                os.remove(path)
-
-                msg = "GSW sentences fetched from stream : " + \
-                      str(cur_gsw_fetched["stream"])
-                print(msg)
-                logging.info(msg)
-                msg = "GSW sentences fetched from search : " + \
-                      str(cur_gsw_fetched["search"])
-                print(msg)
-                logging.info(msg)
+                pending = self._prepare_file(path, source)
+                pending_files.append(pending)
+                pending_count += len(pending.sentences)
+                if pending_count >= min_batch_sentences:
+                    self._process_pending_files(pending_files,
+                                                cur_gsw_fetched)
+                    pending_files = []
+                    pending_count = 0
+            if len(pending_files) > 0:
+                self._process_pending_files(pending_files, cur_gsw_fetched)
         except Exception:
             traceback.print_exc()
             logging.error(traceback.format_exc())
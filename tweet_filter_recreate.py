@@ -12,9 +12,8 @@ from phrasal.mocy_splitter import MocySplitter
 from utils.utils import *
 from geocoder import *
 from typing import List, Dict, Tuple, Union, Any
-from bert_lid import BertLid
 import os
-from typechecker.typecheck import *
+from utils.typecheck import *
 from statistics import mean
 from torch import cuda
 import pandas as pd
@@ -57,6 +56,8 @@ class TweetFilterRecreate(TweetFilter):
         df = pd.DataFrame([], columns=["user_id", "gsw_tweet_count"])
         df.set_index("user_id", inplace=True)
         df.to_csv(self.config["sg_users_count_path"])
+        # Same for the language history of the users
+        self.user_prior.clear()
 
     @accepts(Any, List[dict])
     @returns(List[dict])
@@ -76,14 +77,10 @@ class TweetFilterRecreate(TweetFilter):
     @returns(None)
     def _update_processed_tweets(self):
         """Update the processed tweets ids."""
-        with open(self.config["processed_tweets_ids_path"], "w",
-                  encoding="utf8") as f:
-            new_ids = set(self.new_tweets_ids)
-            print(f"new ids: {len(new_ids)}")
-            merged_ids = self.processed_tweets_ids.union(new_ids)
-            print(f"merged ids: {len(merged_ids)}")
-            for id in merged_ids:
-                f.write(str(id) + "\n")
+        print(f"new ids: {len(self.new_tweets_ids)}")
+        self.processed_tweets_ids.add_many(self.new_tweets_ids)
+        self.processed_tweets_ids.compact()
+        print(f"merged ids: {len(self.processed_tweets_ids)}")
 
     def process(self, cur_gsw_fetched, path):
         """Process all tweets according to the pipeline :
@@ -95,11 +92,13 @@ class TweetFilterRecreate(TweetFilter):
         6. Split text into sentences
         7. Remove special characters
         8. Keep well-formed sentences
-        9. Forward geocode
-        10. Attach Swiss-german location
-        11. Filter Swiss-german language
+        9. Filter stages, in the order set by 'stage_order' (see
+           TweetFilter._run_filter_stages)
+        10. Forward geocode
+        11. Attach Swiss-german location
         12. Write the gsw tweets on disk
-        13. Update the Swiss-German twitter users
+        13. Update the Swiss-German twitter users and the language history
+            of the users
         14. Update the processed tweets ids
         """
 
@@ -153,22 +152,25 @@ class TweetFilterRecreate(TweetFilter):
         sentences = self._filter_valid_sentences(sentences)
         print(f"  => {len(sentences)} well formed sentences")
 
+        pending = PendingFile(path, "search", self.tweets, sentences,
+                              self.new_tweets_ids)
+        self._run_filter_stages([pending])
+        self.tweets = pending.tweets
+        sentences_pred = pending.sentences_pred()
+        print(f"  => {len(sentences_pred)} gsw sentences were found")
+
         print("Geocoding...")
-        indices = [x[0] for x in sentences]
+        indices = [x[0] for x in sentences_pred]
         idx_to_location = self._geocode_tweets(indices)
         print("Attach geographic information")
-        sentences_info = self._attach_gsw_location(
-                            sentences,
+        gsw_tweets = self._attach_gsw_location(
+                            sentences_pred,
                             idx_to_location,
                             self.config["keep_foreign_location"])
         if not self.config["keep_foreign_location"]:
-            print(f"  => {len(sentences_info)} sentences " +
+            print(f"  => {len(gsw_tweets)} sentences " +
                   "geolocalized in Switzerland")
 
-        print("Filtering gsw...")
-        gsw_tweets = self._filter_gsw_sentences(sentences_info)
-        print(f"  => {len(gsw_tweets)} gsw sentences were found")
-
         print("Removing non gsw accents")
         gsw_tweets = self._remove_non_gsw_accent(gsw_tweets)
 
@@ -181,5 +183,6 @@ class TweetFilterRecreate(TweetFilter):
 
         print("Updating processed tweets ids")
         self._update_processed_tweets()
+        self.user_prior.update_many(pending.scored)
 
         print("Done")
@@ -0,0 +1,199 @@
+import os
+import time
+import random
+import sqlite3
+from typing import Dict, Iterable, Optional, Tuple
+
+
+class UserPrior:
+    """The language history of a user : the count of its sentences scored by
+    the language identification, the count of them accepted as Swiss-German,
+    and the sums of the scores of all of them and of the accepted ones."""
+
+    def __init__(self, sentences=0, gsw_sentences=0, score_sum=0.,
+                 gsw_score_sum=0.):
+        self.sentences = sentences
+        self.gsw_sentences = gsw_sentences
+        self.score_sum = score_sum
+        self.gsw_score_sum = gsw_score_sum
+
+    def add(self, score: float, accepted: bool):
+        self.sentences += 1
+        self.score_sum += score
+        if accepted:
+            self.gsw_sentences += 1
+            self.gsw_score_sum += score
+
+    @property
+    def gsw_rate(self) -> float:
+        return self.gsw_sentences / self.sentences if self.sentences else 0.
+
+    @property
+    def mean_score(self) -> float:
+        return self.score_sum / self.sentences if self.sentences else 0.
+
+    @property
+    def mean_gsw_score(self) -> float:
+        return self.gsw_score_sum / self.gsw_sentences \
+               if self.gsw_sentences else 0.
+
+    def __repr__(self):
+        return "UserPrior(sentences=%d, gsw_sentences=%d, mean_score=%.3f)" % (
+                    self.sentences, self.gsw_sentences, self.mean_score)
+
+
+class UserPriorStore:
+    """The language history of the twitter users (see UserPrior), stored in a
+    sqlite database. Unlike the sg_users_count file, which only lists the
+    Swiss-German users, it holds every user whose sentences reached the
+    language identification.
+
+    Parameters
+        path | str
+            The path of the database
+    """
+
+    def __init__(self, path):
+        self.path = path
+        dir_path = os.path.dirname(path)
+        if dir_path:
+            os.makedirs(dir_path, exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        # WAL such that other processes can read while we write
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS users ("
+                                "user_id TEXT PRIMARY KEY, "
+                                "sentences INTEGER NOT NULL, "
+                                "gsw_sentences INTEGER NOT NULL, "
+                                "score_sum REAL NOT NULL, "
+                                "gsw_score_sum REAL NOT NULL, "
+                                "updated REAL NOT NULL)")
+        self.connection.commit()
+
+    def get(self, user_id: str) -> Optional[UserPrior]:
+        """Returns the history of a user, or None if it has none"""
+        return self.get_many([user_id]).get(user_id, None)
+
+    def get_many(self, user_ids: Iterable[str],
+                 chunk_size=500) -> Dict[str, UserPrior]:
+        """Returns the history of the users that have one"""
+        user_ids = list(dict.fromkeys(user_ids))
+        priors = dict()
+        for left in range(0, len(user_ids), chunk_size):
+            chunk = user_ids[left:left+chunk_size]
+            rows = self.connection.execute(
+                        "SELECT user_id, sentences, gsw_sentences, score_sum, "
+                        "gsw_score_sum FROM users WHERE user_id IN (" +
+                        ", ".join("?" * len(chunk)) + ")", chunk).fetchall()
+            for row in rows:
+                priors[row[0]] = UserPrior(*row[1:])
+        return priors
+
+    def update_many(self, scores: Iterable[Tuple[str, float, bool]]):
+        """Add scored sentences to the history of their users, given as
+        tuples (user_id, score, accepted). The changes are committed at
+        once."""
+        updates = dict()
+        for user_id, score, accepted in scores:
+            updates.setdefault(user_id, UserPrior()).add(score, accepted)
+        now = time.time()
+        self.connection.executemany(
+                    "INSERT INTO users VALUES (?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT(user_id) DO UPDATE SET "
+                    "sentences = sentences + excluded.sentences, "
+                    "gsw_sentences = gsw_sentences + excluded.gsw_sentences, "
+                    "score_sum = score_sum + excluded.score_sum, "
+                    "gsw_score_sum = gsw_score_sum + excluded.gsw_score_sum, "
+                    "updated = excluded.updated",
+                    [(user_id, x.sentences, x.gsw_sentences, x.score_sum,
+                      x.gsw_score_sum, now) for user_id, x in updates.items()])
+        self.connection.commit()
+
+    def clear(self):
+        """Remove the history of all the users"""
+        self.connection.execute("DELETE FROM users")
+        self.connection.commit()
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM users"
+                                       ).fetchone()[0]
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
+
+
+class UserPriorPolicy:
+    """Decides from the history of a user whether its sentences can avoid the
+    language identification model :
+
+        - skip : the user has a strong negative history, i.e. at least
+          'min_sentences' scored sentences and a rate of accepted ones of at
+          most 'negative_max_gsw_rate'. Its sentences are dropped without
+          being scored.
+        - fast track : 'fast_track' is set and the user has a strong positive
+          history, i.e. at least 'min_sentences' scored sentences and a rate
+          of accepted ones of at least 'positive_min_gsw_rate'. Its sentences
+          get a lighter check, e.g. the language identification on their
+          first words only.
+
+    A fraction 'audit_rate' of the sentences that would be skipped or fast
+    tracked are scored anyway, such that the history keeps following the user
+    (e.g. a user starting to write in Swiss-German).
+
+    Parameters
+        min_sentences | int
+            The count of scored sentences from which the history is used
+        negative_max_gsw_rate | float
+            See skip
+        positive_min_gsw_rate | float
+            See fast track
+        fast_track | bool
+            See fast track
+        audit_rate | float
+            The fraction of the sentences scored anyway
+        seed | int
+            The seed of the audit sampling, random if None
+    """
+
+    def __init__(self, min_sentences, negative_max_gsw_rate,
+                 positive_min_gsw_rate, fast_track=False, audit_rate=0.05,
+                 seed=None):
+        if not 0 <= audit_rate <= 1:
+            raise ValueError("The audit rate must be between 0 and 1")
+        self.min_sentences = min_sentences
+        self.negative_max_gsw_rate = negative_max_gsw_rate
+        self.positive_min_gsw_rate = positive_min_gsw_rate
+        self.fast_track = fast_track
+        self.audit_rate = audit_rate
+        self.random = random.Random(seed)
+
+    @staticmethod
+    def from_config(config: dict) -> "UserPriorPolicy":
+        return UserPriorPolicy(config["user_prior_min_sentences"],
+                               config["user_prior_negative_max_gsw_rate"],
+                               config["user_prior_positive_min_gsw_rate"],
+                               fast_track=config["user_prior_fast_track"],
+                               audit_rate=config["user_prior_audit_rate"])
+
+    def is_negative(self, prior: Optional[UserPrior]) -> bool:
+        return prior is not None and prior.sentences >= self.min_sentences \
+               and prior.gsw_rate <= self.negative_max_gsw_rate
+
+    def is_positive(self, prior: Optional[UserPrior]) -> bool:
+        return prior is not None and prior.sentences >= self.min_sentences \
+               and prior.gsw_rate >= self.positive_min_gsw_rate
+
+    def _audited(self) -> bool:
+        return self.random.random() < self.audit_rate
+
+    def skip(self, prior: Optional[UserPrior]) -> bool:
+        """Returns true if a sentence of a user with the given history (None
+        if it has none) can be dropped without being scored"""
+        return self.is_negative(prior) and not self._audited()
+
+    def fast_tracked(self, prior: Optional[UserPrior]) -> bool:
+        """Returns true if a sentence of a user with the given history (None
+        if it has none) only needs a lighter check"""
+        return self.fast_track and self.is_positive(prior) \
+               and not self._audited()
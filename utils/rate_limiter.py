@@ -0,0 +1,90 @@
+import os
+import json
+import time
+import fcntl
+
+
+class TokenBucket:
+    """A token bucket shared by all the processes using the same state file,
+    e.g. to respect the rate limit of an API from several scripts at once.
+
+    The bucket holds at most 'burst' tokens and is refilled at 'rate' tokens
+    per minute. Each request takes a token, and waits for one if the bucket is
+    empty. The state (tokens, time of the last refill and time until which the
+    requests are blocked) is stored in a small json file, read and written
+    under an exclusive lock.
+
+    Parameters
+        path | str
+            The path of the state file
+        rate | float
+            The count of tokens added per minute
+        burst | int
+            The maximum count of tokens in the bucket
+    """
+
+    def __init__(self, path, rate, burst=1):
+        if rate <= 0 or burst < 1:
+            raise ValueError("'rate' must be positive and 'burst' at least 1")
+        self.path = path
+        self.rate = rate
+        self.burst = burst
+        dir_path = os.path.dirname(path)
+        if dir_path:
+            os.makedirs(dir_path, exist_ok=True)
+
+    def _update(self, update):
+        """Apply 'update' to the state under the lock. 'update' takes the
+        refilled state and the current time, modifies the state and returns a
+        value, which is returned."""
+        with open(self.path, "a+", encoding="utf8") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                content = f.read()
+                now = time.time()
+                state = {"tokens": self.burst, "last": now, "blocked_until": 0}
+                if content:
+                    state = json.loads(content)
+                # Refill
+                elapsed = max(0.0, now - state["last"])
+                state["tokens"] = min(self.burst,
+                                      state["tokens"] + elapsed*self.rate/60)
+                state["last"] = now
+                result = update(state, now)
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps(state))
+                f.flush()
+                return result
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def try_acquire(self) -> float:
+        """Take a token if available. Returns 0 if taken, otherwise the time
+        (s) to wait before trying again."""
+        def update(state, now):
+            if now < state["blocked_until"]:
+                return state["blocked_until"] - now
+            if state["tokens"] >= 1:
+                state["tokens"] -= 1
+                return 0.0
+            return (1 - state["tokens"]) * 60 / self.rate
+        return self._update(update)
+
+    def acquire(self):
+        """Take a token, waiting for one if needed"""
+        while True:
+            wait = self.try_acquire()
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    def block(self, seconds):
+        """Empty the bucket and block all the requests for 'seconds', e.g.
+        when the API answered with a Retry-After header"""
+        def update(state, now):
+            state["tokens"] = 0
+            state["blocked_until"] = max(state["blocked_until"],
+                                         now + seconds)
+        self._update(update)
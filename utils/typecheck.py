@@ -0,0 +1,82 @@
+# Switchable version of the typechecker decorators (accepts and returns).
+# Checking the types walks whole arguments (e.g. every tweet of a list), which
+# costs as much as the work of some stages, so the checks can be turned off:
+#
+#   - TYPECHECK_MODE=off : the decorators return the functions unchanged at
+#     import time. There is no overhead at all, and the typechecker package is
+#     not needed.
+#   - TYPECHECK_MODE=on (default) : every call is checked.
+#   - TYPECHECK_MODE=sample : 1 call in TYPECHECK_SAMPLE_RATE (default 100)
+#     of each decorated function is checked, e.g. for canary deployments.
+#
+# With "on" or "sample" at import time, the mode and the rate can still be
+# changed afterwards with set_typecheck_mode or configure_typecheck (keys
+# typecheck_mode and typecheck_sample_rate of the config), at the cost of a
+# test per call.
+
+import os as _os
+import functools as _functools
+import itertools as _itertools
+from typing import *
+
+_modes = ("off", "on", "sample")
+
+
+def _check_mode(mode):
+    if mode not in _modes:
+        raise ValueError("Unknown typecheck mode '" + str(mode) + "', " +
+                         "expected one of " + ", ".join(_modes))
+    return mode
+
+
+_import_mode = _check_mode(_os.environ.get("TYPECHECK_MODE", "on").lower())
+_mode = _import_mode
+_sample_rate = int(_os.environ.get("TYPECHECK_SAMPLE_RATE", "100"))
+
+if _import_mode != "off":
+    from typechecker import typecheck as _typecheck
+
+
+def set_typecheck_mode(mode: str, sample_rate: Optional[int] = None):
+    """Change the mode of the decorators applied since the import. The
+    decorators applied while the import mode was "off" are not checked
+    anyway."""
+    global _mode, _sample_rate
+    if sample_rate is not None and sample_rate < 1:
+        raise ValueError("The typecheck sample rate must be at least 1")
+    _mode = _check_mode(mode)
+    if sample_rate is not None:
+        _sample_rate = sample_rate
+
+
+def configure_typecheck(config: dict):
+    """Apply the typecheck_mode and typecheck_sample_rate of a config"""
+    set_typecheck_mode(config["typecheck_mode"],
+                       config["typecheck_sample_rate"])
+
+
+def get_typecheck_mode() -> str:
+    return _mode
+
+
+def _switchable(name):
+    def factory(*types, **kwtypes):
+        if _import_mode == "off":
+            return lambda f: f
+        decorator = getattr(_typecheck, name)(*types, **kwtypes)
+        def decorate(f):
+            checked = decorator(f)
+            calls = _itertools.count(1)
+            @_functools.wraps(f)
+            def wrapper(*args, **kwargs):
+                if _mode == "on" \
+                or (_mode == "sample" and next(calls) % _sample_rate == 0):
+                    return checked(*args, **kwargs)
+                return f(*args, **kwargs)
+            return wrapper
+        return decorate
+    return factory
+
+
+accepts = _switchable("accepts")
+returns = _switchable("returns")
@@ -8,6 +8,10 @@ import os
 from unidecode import unidecode
 import re
 import logging
+from collections import OrderedDict
+from contextlib import contextmanager
+import fcntl
+import csv
 
 def save_obj(obj, path):
     with open(path, 'wb') as f:
@@ -127,3 +131,60 @@ def create_logging_config(path):
                         filemode='w',
                         level=logging.INFO,
                         format='%(asctime)s - %(levelname)s - %(message)s')
+
+class LRUCache:
+    """A dict bounded to 'max_size' elements, the least recently used element
+    is dropped when the size is exceeded.
+
+    Parameters
+        max_size | int
+            The maximum count of elements
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.data = OrderedDict()
+
+    def __len__(self):
+        return len(self.data)
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def get(self, key, default=None):
+        if key not in self.data:
+            return default
+        self.data.move_to_end(key)
+        return self.data[key]
+
+    def put(self, key, value):
+        self.data[key] = value
+        self.data.move_to_end(key)
+        if len(self.data) > self.max_size:
+            self.data.popitem(last=False)
+
+@contextmanager
+def file_lock(path):
+    """Hold an exclusive lock on the file 'path' (created if needed), shared
+    by all the processes using the same path"""
+    dir_path = os.path.dirname(path)
+    if dir_path:
+        os.makedirs(dir_path, exist_ok=True)
+    with open(path, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+def load_users_counts(path):
+    """Returns a dict mapping each user id to its count of gsw sentences, read
+    from the sg_users_count file (empty if the file does not exist)"""
+    counts = dict()
+    if not os.path.exists(path):
+        return counts
+    with open(path, "r", encoding="utf8", newline="") as f:
+        for row in csv.DictReader(f):
+            if row["gsw_tweet_count"]:
+                counts[row["user_id"]] = int(float(row["gsw_tweet_count"]))
+    return counts